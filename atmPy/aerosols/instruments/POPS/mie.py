@@ -21,6 +21,7 @@ import types
 import matplotlib.cm as mplcm
 import matplotlib.colors as colors
 import numpy as np
+import pandas as pd
 import pylab as plt
 from scipy.interpolate import interp1d
 
@@ -114,15 +115,10 @@ def makeMie_diameter(radiusRangeInMikroMeter = [0.05,1.5],
         singleLine = True
         
     output = np.zeros((exWavelengthInUm.shape[0]+1,dRange.shape[0]))
+    diameter = np.array(2 * np.array(dRange))
     for e,i in enumerate(exWavelengthInUm):
         event.set_wavelength(i)
-        perpInt = []
-        for i in dRange:
-            event.set_r(i)
-            intensity =  event.get_detectableIntensity(geometry)
-            perpInt.append(intensity)
-        diameter = np.array(2 * np.array(dRange))
-        scatteringEfficiency = np.array(perpInt)
+        scatteringEfficiency = event.get_detectableIntensities(diameter, polarization = geometry).values[:, 0]
 #         if broadened:     
         output[0]+= normalizer[e] * scatteringEfficiency/normalizer.sum()
         if len(exWavelengthInUm) == 1:
@@ -137,6 +133,39 @@ def makeMie_diameter(radiusRangeInMikroMeter = [0.05,1.5],
     else:
         return diameter, output
     
+def makeMie_calibration_table(diameters,
+                              IOR,
+                              noOfAngles = 100,
+                              POPSdesign = 'POPS 2',
+                              WavelengthInUm = .405,
+                              geometry = "perpendicular",
+                              mirrorJetDist = 10.):
+    """
+    Intensity scattered onto the detector as a function of particle diameter for a number of refractive indices,
+    e.g. to generate calibration curves for different materials. The mirror geometry is calculated only once and
+    the Mie calculations are vectorized over the diameters.
+
+    Arguments
+    ---------
+    diameters: array-like
+        particle diameters in um
+    IOR: complex or array-like
+        refractive indices
+    geometry: "perpendicular", "parallel" or "natural"
+
+    Returns
+    -------
+    pandas.DataFrame with the diameters as index and the refractive indices as columns
+    """
+    event = Mie(silent = True, design = POPSdesign, indexOfRef = 1.5, diameter = 'dynamic', wavelength = WavelengthInUm)
+    event.set_nang(noOfAngles)
+    event.POPSdimensions['mirror(top)-jet distance (mm)'] = float(mirrorJetDist)
+    return event.get_detectableIntensities(diameters, indexOfRef = IOR, polarization = geometry)
+
+# The mirror grid only depends on the POPS dimensions and the number of angles, it is therefore shared between all
+# instances of Mie, see Mie.get_mirror_grid.
+_mirror_grid_cache = {}
+
 ###########################################################    
 class Mie():
     """ Creates a Mie object
@@ -179,6 +208,7 @@ class Mie():
             
         self.upToDate = False
         self.upToDate_geometry = False
+        self._mirror_grid_key = None
         self.dontAskAgain = False
             
     def set_dimensions(self, design):
@@ -267,6 +297,7 @@ class Mie():
         """set the number of angles between 0 and 90 degries"""
         self.nang = nang
         self.upToDate = False
+        self.upToDate_geometry = False
         
     def set_SizeParameter(self): #r, wavelength):
         self.x = 2*np.pi/self.wavelength * self.r
@@ -323,9 +354,10 @@ class Mie():
                 print('no update needed')
                 
     def update_geometry(self):
-        if not self.upToDate_geometry:
+        # POPSdimensions can be changed directly (e.g. in makeMie_diameter), therefore the key is checked as well
+        if not self.upToDate_geometry or self._mirror_grid_key != self._get_mirror_grid_key():
             self.get_mirror_grid()
-            self.upToDate = True
+            self.upToDate_geometry = True
         
                    
     def set_xAxis(self):
@@ -361,11 +393,29 @@ class Mie():
         for i in self.xAxis:
             print(i, ' , ', self.YNatural[i])
             
+    def _get_mirror_grid_key(self):
+        return int(self.nang), tuple(sorted(self.POPSdimensions.items()))
+
     def get_mirror_grid(self):
-        np.set_printoptions(threshold=np.nan)
-        np.set_printoptions(precision=2)
-        
-        
+        """ Sets angleIndexArray, ArcLengthMatrix and offAngleMatrix, as well as the sin**2 and cos**2 weight matrices
+        of the off angles (sin2Matrix, cos2Matrix; zero outside the mirror). Since these only depend on the POPS
+        dimensions and the number of angles, they are calculated only once and shared between all instances.
+        """
+        self.set_xAxis()
+        key = self._get_mirror_grid_key()
+        if key not in _mirror_grid_cache:
+            _mirror_grid_cache[key] = self._calc_mirror_grid()
+        grid = _mirror_grid_cache[key]
+
+        self.angleIndexArray = grid['angleIndexArray']
+        self.ArcLengthMatrix = grid['ArcLengthMatrix']
+        self.offAngleMatrix = grid['offAngleMatrix']
+        self.sin2Matrix = grid['sin2Matrix']
+        self.cos2Matrix = grid['cos2Matrix']
+        self._mirror_weights = grid['weights']
+        self._mirror_grid_key = key
+
+    def _calc_mirror_grid(self):
         dm = self.POPSdimensions['mirror diameter (mm)']
         h = self.POPSdimensions['mirror(top)-jet distance (mm)']
 #         print 'h', h
@@ -378,7 +428,6 @@ class Mie():
         angleRangeArray, angleIndexArray = tools.find_angleRange(self.POPSdimensions['angle: jet-mirrorNormal (rad)'], alphMax, self.xAxis)
         stepWidth = sSphere/len(angleRangeArray)
         
-        self.angleIndexArray = angleIndexArray
         
         nn = len(angleIndexArray)
         indexMatrix = np.ones((nn,nn), dtype = int) * angleIndexArray
@@ -412,12 +461,27 @@ class Mie():
 #         print "ArcLengthMatrix"
 #         raw_input(ArcLengthMatrix.astype(int))
         
-        self.offAngleMatrix = .5 * tools.segment_angle(rs, ArcLengthMatrix)
-        
+        offAngleMatrix = .5 * tools.segment_angle(rs, ArcLengthMatrix)
 
+        onMirror = ~ np.isnan(offAngleMatrix)
+        sin2Matrix = np.where(onMirror, np.sin(offAngleMatrix) ** 2, 0)
+        cos2Matrix = np.where(onMirror, np.cos(offAngleMatrix) ** 2, 0)
+        weights = {'sin2': sin2Matrix.sum(axis = 0),
+                   'cos2': cos2Matrix.sum(axis = 0),
+                   'natural': onMirror.sum(axis = 0) * .5}
+
+        grid = {'angleIndexArray': angleIndexArray,
+                'ArcLengthMatrix': ArcLengthMatrix,
+                'offAngleMatrix': offAngleMatrix,
+                'sin2Matrix': sin2Matrix,
+                'cos2Matrix': cos2Matrix,
+                'weights': weights}
+        # the arrays are shared between instances
+        for value in list(grid.values()) + list(weights.values()):
+            if isinstance(value, np.ndarray):
+                value.setflags(write = False)
+        return grid
 
-                	
-            
     def get_detectableIntensity(self, polarization = "perpendicular"):
         """ In this function I want to calculate a solid angle which is defined by the mirror and then all the light which is scattered into that angle.
             Parameters:
@@ -447,41 +511,85 @@ class Mie():
 #         mirror_grid = self.get_mirror_grid()
 #         raw_input('watewatte')
         
-        whatList = ('natural', 'parallel', 'perpendicular')
-        if polarization not in whatList:
-            raise ValueError('Geometry has to be one of the following: "%s", "%s", or "%s"? %s is not an option' % (
-            whatList[0], whatList[1], whatList[2], polarization))
+        weights_s1, weights_s2 = self.get_mirror_weights(polarization)
         fIdx = self.angleIndexArray[0]
         lIdx = self.angleIndexArray[-1]
         s1Selection = self.s1[fIdx:lIdx+1]
         s2Selection = self.s2[fIdx:lIdx+1]
         
         nn = len(self.angleIndexArray)
-        
-        s1Matrix = (abs(np.ones((nn,nn)) * s1Selection))**2
-        s2Matrix = (abs(np.ones((nn,nn)) * s2Selection))**2
-        naturalMatrix = (.5 * s1Matrix) + (.5 * s2Matrix)
-#         print 's1Matrix'
-#         raw_input(s1Matrix)
-        
         if len(s1Selection) != nn:
             raise ValueError('not possible %s %s'%(len(s1Selection),len(self.angleIndexArray)))
 
-        
+        # Sum over the mirror grid of the intensities weighted by sin**2 and cos**2 of the off angle, see
+        # get_mirror_weights
+        integratedIntensity = (abs(s1Selection) ** 2).dot(weights_s1) + (abs(s2Selection) ** 2).dot(weights_s2)
+
+        return integratedIntensity# * stepWidth**2
+
+    def get_mirror_weights(self, polarization = "perpendicular"):
+        """ Weights of |s1|**2 and |s2|**2 for each scattering angle collected by the mirror, i.e. the sum of the
+        sin**2 and cos**2 weight matrices over the mirror grid. The dot product of these weights with the intensities
+        at the angles in self.angleIndexArray gives the detectable intensity.
+
+        Returns
+        -------
+        weights_s1, weights_s2: arrays of length len(self.angleIndexArray)
+        """
+        whatList = ('natural', 'parallel', 'perpendicular')
+        if polarization not in whatList:
+            raise ValueError('Geometry has to be one of the following: "%s", "%s", or "%s"? %s is not an option' % (
+            whatList[0], whatList[1], whatList[2], polarization))
+
+        self.update_geometry()
+        sin2 = self._mirror_weights['sin2']
+        cos2 = self._mirror_weights['cos2']
+
         if polarization == "parallel":
-            IntMatrix = ((np.cos(self.offAngleMatrix))**2 * s2Matrix) + ((np.sin(self.offAngleMatrix))**2 * s1Matrix)  
-        
+            return sin2, cos2
         elif polarization == "perpendicular":
-            IntMatrix = ((np.sin(self.offAngleMatrix))**2 * s2Matrix) + ((np.cos(self.offAngleMatrix))**2 * s1Matrix)  
-        
+            return cos2, sin2
         elif polarization == "natural":
-            naturalMatrix[np.isnan(self.offAngleMatrix)] = 0
-            IntMatrix = naturalMatrix 
-        
-        IntMatrix[np.isnan(IntMatrix)] = 0
-        integratedIntensity = IntMatrix.sum() 
+            return self._mirror_weights['natural'], self._mirror_weights['natural']
 
-        return integratedIntensity# * stepWidth**2
+    def get_detectableIntensities(self, diameters, indexOfRef = None, polarization = "perpendicular"):
+        """ Same as get_detectableIntensity but for many particles at once. The Mie calculations are performed for all diameters in a single vectorized call per refractive
+        index.
+
+        Parameters
+        ----------
+        diameters: array-like
+            particle diameters in um
+        indexOfRef: complex or array-like, optional
+            refractive indices. If None, the refractive index of the instance is used.
+        polarization: str
+            "perpendicular", "parallel" or "natural"
+
+        Returns
+        -------
+        pandas.DataFrame with the diameters as index and the refractive indices as columns
+        """
+        diameters = np.atleast_1d(np.asarray(diameters, dtype = float))
+        if indexOfRef is None:
+            if self.material:
+                self.set_n()
+            indexOfRef = self.n
+        indexOfRef = np.atleast_1d(indexOfRef)
+
+        weights_s1, weights_s2 = self.get_mirror_weights(polarization)
+        fIdx = self.angleIndexArray[0]
+        lIdx = self.angleIndexArray[-1]
+
+        x = 2 * np.pi / self.wavelength * diameters / 2.
+        out = pd.DataFrame(index = diameters, columns = indexOfRef, dtype = float)
+        out.index.name = 'diameter (um)'
+        for e, n in enumerate(indexOfRef):
+            mie = bhmie.bhmie_hagen_vectorized(x, n, self.nang)
+            # see do_bhmie_hagen
+            s1 = np.concatenate((mie['s1'], mie['s1'][:, ::-1]), axis = 1)[:, fIdx:lIdx + 1]
+            s2 = np.concatenate((mie['s2'], mie['s2'][:, ::-1]), axis = 1)[:, fIdx:lIdx + 1]
+            out.iloc[:, e] = (np.abs(s1) ** 2).dot(weights_s1) + (np.abs(s2) ** 2).dot(weights_s2)
+        return out
 
 def plot_polar(dataList, log = False):
 
@@ -0,0 +1,56 @@
+import numpy as np
+
+from atmPy.aerosols.instruments.POPS import mie
+
+
+def _mirror_sum(event, polarization):
+    """detectable intensity as summed over the mirror grid by the original get_detectableIntensity"""
+    event.update_hagen()
+    event.update_geometry()
+    s1 = event.s1[event.angleIndexArray[0]:event.angleIndexArray[-1] + 1]
+    s2 = event.s2[event.angleIndexArray[0]:event.angleIndexArray[-1] + 1]
+    nn = len(event.angleIndexArray)
+    s1_matrix = abs(np.ones((nn, nn)) * s1) ** 2
+    s2_matrix = abs(np.ones((nn, nn)) * s2) ** 2
+    with np.errstate(invalid='ignore'):
+        if polarization == 'parallel':
+            intensity = np.cos(event.offAngleMatrix) ** 2 * s2_matrix + np.sin(event.offAngleMatrix) ** 2 * s1_matrix
+        elif polarization == 'perpendicular':
+            intensity = np.sin(event.offAngleMatrix) ** 2 * s2_matrix + np.cos(event.offAngleMatrix) ** 2 * s1_matrix
+        else:
+            intensity = .5 * s1_matrix + .5 * s2_matrix
+            intensity[np.isnan(event.offAngleMatrix)] = 0
+    intensity[np.isnan(intensity)] = 0
+    return intensity.sum()
+
+
+def test_detectable_intensities_equal_mirror_sum():
+    diameters = np.array([0.15, 0.4, 1.2])
+    for polarization in ('perpendicular', 'parallel', 'natural'):
+        event = mie.Mie(diameter=0.15, wavelength=.405, indexOfRef=1.5, nang=100)
+        batch = event.get_detectableIntensities(diameters, indexOfRef=[1.5, 1.6 + 0.01j], polarization=polarization)
+        assert batch.shape == (3, 2)
+        for d in diameters:
+            for n in (1.5, 1.6 + 0.01j):
+                single = mie.Mie(diameter=d, wavelength=.405, indexOfRef=n, nang=100)
+                expected = _mirror_sum(single, polarization)
+                np.testing.assert_allclose(single.get_detectableIntensity(polarization), expected, rtol=1e-8)
+                np.testing.assert_allclose(batch.loc[d].values[[1.5, 1.6 + 0.01j].index(n)], expected, rtol=1e-8)
+
+
+def test_mirror_grid_cache():
+    event = mie.Mie(diameter=0.3, wavelength=.405, indexOfRef=1.5)
+    event.update_geometry()
+    other = mie.Mie(diameter=0.5, wavelength=.405, indexOfRef=1.5)
+    other.update_geometry()
+    assert other.offAngleMatrix is event.offAngleMatrix
+    assert not event.offAngleMatrix.flags.writeable
+
+    # changing the geometry directly (as done in makeMie_diameter) gives a new grid
+    intensity = event.get_detectableIntensity()
+    event.POPSdimensions['mirror(top)-jet distance (mm)'] = 11.
+    assert event.get_detectableIntensity() != intensity
+    assert event.offAngleMatrix is not other.offAngleMatrix
+    fresh = mie.Mie(diameter=0.3, wavelength=.405, indexOfRef=1.5)
+    fresh.POPSdimensions['mirror(top)-jet distance (mm)'] = 11.
+    np.testing.assert_allclose(fresh.get_detectableIntensity(), _mirror_sum(fresh, 'perpendicular'), rtol=1e-8)
@@ -9,13 +9,25 @@ from atmPy.aerosols.size_distribution import \
 from atmPy.general import timeseries
 from atmPy.general import vertical_profile
 from atmPy.radiation.mie_scattering import bhmie
+from atmPy.radiation.mie_scattering import mie_aux as _mie_aux
+from atmPy.radiation.mie_scattering import mie_coeffs as _mie_coeffs
+from atmPy.radiation.mie_scattering import mie_lookup as _mie_lookup
+from atmPy.radiation.mie_scattering import mie_props as _mie_props
+from collections import namedtuple as _namedtuple
 import warnings as _warnings
 
+# Mie results of coated spheres for the most recently used (core n, shell n, core volume fraction) combinations
+_coated_kernel_cache = _mie_aux.Cache(size=100)
+
+# container for the vectorized Mie coefficients as expected by mie_props
+_MieCoefficients = _namedtuple('_MieCoefficients', ['an', 'bn'])
+
 
 # Todo: Docstring is wrong
 # todo: This function can be sped up by breaking it apart. Then have OpticalProperties
 #       have properties that call the subfunction on demand
-def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100):
+def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100, n_interpolation_tolerance=None,
+                                 angles=None, core_n=None, core_volume_fraction=None, core_fraction_resolution=0.01):
     """
     !!!Tis Docstring need fixn
     Calculates the extinction crossection, AOD, phase function, and asymmetry Parameter for each layer.
@@ -31,6 +43,23 @@ def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100):
     noOfAngles: int, optional.
         Number of scattering angles to be calculated. This mostly effects calculations which depend on the phase
         function.
+    n_interpolation_tolerance: float, optional.
+        Only used if n is a DataFrame (index of refraction changes for each row). If set, the Mie calculations are
+        performed on a grid of refractive indices which is refined until the relative interpolation error is
+        below this value (see MieKernelGrid). Results for each row are interpolated from this grid instead of
+        performing the Mie calculations for each row.
+    angles: array-like, optional.
+        Scattering angles (radians, between 0 and pi) at which the angular scattering function is calculated,
+        e.g. dense near forward and backward direction. If given, noOfAngles is ignored.
+    core_n: complex or DataFrame, optional.
+        Index of refraction of the particle core. If given, particles are treated as coated spheres (core-shell) and
+        n is the index of refraction of the shell. Like n, this can change for each row (DataFrame).
+    core_volume_fraction: float, Series, DataFrame or array, optional.
+        Fraction of the particle volume taken by the core (between 0 and 1). Required if core_n is given. Either
+        constant or one value per row (e.g. per timestamp).
+    core_fraction_resolution: float, optional.
+        The core volume fraction is rounded to multiples of this value. Rows with the same rounded core volume
+        fraction (and the same indices of refraction) share the same Mie calculations.
 
     Returns
     -------
@@ -45,53 +74,94 @@ def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100):
     if dist_class not in ['SizeDist','SizeDist_TS']:
         raise TypeError('this distribution class (%s) can not be converted into optical property yet!'%dist_class)
 
+    diam = np.array(sdls.bincenters / 1000.)
+    numberconc = sdls.data.values
+    # nans are ignored when summing over the diameters
+    numberconc_nonan = np.nan_to_num(numberconc)
+
     # determin if index of refraction changes or if it is constant
     if isinstance(n, pd.DataFrame):
         n_multi = True
     else:
         n_multi = False
-    if not n_multi:
-        mie, angular_scatt_func = _perform_Miecalculations(np.array(sdls.bincenters / 1000.), wavelength / 1000., n,
-                                                       noOfAngles=noOfAngles)
+
+    coated = core_n is not None
+    if coated:
+        if core_volume_fraction is None:
+            raise ValueError('core_volume_fraction has to be given for coated particles (core_n is set).')
+        if n_interpolation_tolerance:
+            raise ValueError('n_interpolation_tolerance is not supported for coated particles.')
+
+    # Rows are grouped by their index of refraction (and core index of refraction and core volume fraction for
+    # coated particles). All rows of a group share the same Mie results so that the optical properties of the group
+    # can be calculated via matrix products. For constant parameters there is only one group.
+    if not (n_multi or coated):
+        n_groups = [n]
+        n_group_idx = np.zeros(numberconc.shape[0], dtype=int)
+    else:
+        n_values = _get_row_values(n, numberconc.shape[0])
+        row_params = [n_values]
+        if coated:
+            core_fraction = _get_row_values(core_volume_fraction, numberconc.shape[0]).real
+            if np.any(np.nan_to_num(core_fraction) < 0) or np.any(np.nan_to_num(core_fraction) > 1):
+                raise ValueError('core_volume_fraction has to be between 0 and 1.')
+            core_fraction = np.round(core_fraction / core_fraction_resolution) * core_fraction_resolution
+            row_params += [_get_row_values(core_n, numberconc.shape[0]), core_fraction]
+        row_params = np.column_stack(row_params)
+        n_valid = ~ np.isnan(row_params).any(axis=1)
+        if not n_valid.any():
+            raise ValueError('Index of refraction (or core volume fraction) is nan for all rows.')
+        n_groups, n_group_idx_valid = np.unique(row_params[n_valid], axis=0, return_inverse=True)
+        n_group_idx = np.full(numberconc.shape[0], -1, dtype=int)  # -1 -> n is nan
+        n_group_idx[n_valid] = n_group_idx_valid.ravel()
+        if not coated:
+            n_groups = n_groups[:, 0]
+        if n_interpolation_tolerance:
+            mie_kernel = MieKernelGrid(diam, wavelength / 1000., n_values,
+                                       noOfAngles=noOfAngles, tolerance=n_interpolation_tolerance, angles=angles)
+
+    extinction_crossection = np.full(numberconc.shape, np.nan)
+    scattering_crossection_eff = np.full(numberconc.shape[0], np.nan)
+    pfe = None  # sum of all angular_scattering_intensities
+
+    for e, n_group in enumerate(n_groups):
+        if n_multi and n_interpolation_tolerance:
+            mie, angular_scatt_func = mie_kernel.get_Miecalculations(n_group)
+        elif coated:
+            n_shell, n_core, core_fraction = n_group
+            mie, angular_scatt_func = _perform_coated_Miecalculations(diam, wavelength / 1000., n_core, n_shell,
+                                                                      core_fraction.real, noOfAngles=noOfAngles,
+                                                                      angles=angles)
+        else:
+            mie, angular_scatt_func = _perform_Miecalculations(diam, wavelength / 1000., n_group,
+                                                               noOfAngles=noOfAngles, angles=angles)
+        if pfe is None:
+            angles_out = angular_scatt_func.index.values
+            pfe = np.full((numberconc.shape[0], angles_out.shape[0]), np.nan)
+
+        rows = n_group_idx == e
+        extinction_crossection[rows] = mie.extinction_crossection.values
+        scattering_crossection_eff[rows] = numberconc_nonan[rows].dot(mie.scattering_crossection.values)
+        pfe[rows] = numberconc_nonan[rows].dot(angular_scatt_func.values.transpose())
+
+    extCoeffPerLayer = _get_coefficients(extinction_crossection, numberconc)
 
     if aod:
         #todo: use function that does a the interpolation instead of the sum?!? I guess this can lead to errors when layers are very thick, since centers are used instea dof edges?
-        AOD_layer = np.zeros((len(sdls.layercenters)))
-
-    extCoeffPerLayer = np.zeros((len(sdls.data.index.values), len(sdls.bincenters)))
-    angular_scatt_func_effective = pd.DataFrame()
-    asymmetry_parameter_LS = np.zeros((len(sdls.data.index.values)))
-
-    for i, lc in enumerate(sdls.data.index.values):
-        laydata = sdls.data.iloc[i].values # picking a size distribution (either a layer or a point in time)
+        layerThickness = np.diff(np.array(sdls.layerbounderies), axis=1)[:, 0]
+        AOD_layer = extCoeffPerLayer.sum(axis=1) * layerThickness
 
-        if n_multi:
-            mie, angular_scatt_func = _perform_Miecalculations(np.array(sdls.bincenters / 1000.), wavelength / 1000., n.iloc[i].values[0],
-                                                       noOfAngles=noOfAngles)
-        extinction_coefficient = _get_coefficients(mie.extinction_crossection, laydata)
+    # limit to [0,pi]
+    x_1p = angles_out[angles_out < np.pi]
+    y_1p = pfe[:, angles_out < np.pi]
 
-        if aod:
-            layerThickness = sdls.layerbounderies[i][1] - sdls.layerbounderies[i][0]
-            AOD_perBin = extinction_coefficient * layerThickness
-            AOD_layer[i] = AOD_perBin.values.sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y_phase_func = y_1p * 4 * np.pi / scattering_crossection_eff[:, np.newaxis]
+    asymmetry_parameter_LS = .5 * integrate.simps(np.cos(x_1p) * y_phase_func * np.sin(x_1p), x_1p, axis=1)
 
-        extCoeffPerLayer[i] = extinction_coefficient
-
-        scattering_cross_eff = laydata * mie.scattering_crossection
-
-        pfe = (laydata * angular_scatt_func).sum(axis=1)  # sum of all angular_scattering_intensities
-
-        x_2p = pfe.index.values
-        y_2p = pfe.values
-
-        # limit to [0,pi]
-        y_1p = y_2p[x_2p < np.pi]
-        x_1p = x_2p[x_2p < np.pi]
-
-        y_phase_func = y_1p * 4 * np.pi / scattering_cross_eff.sum()
-        asymmetry_parameter_LS[i] = .5 * integrate.simps(np.cos(x_1p) * y_phase_func * np.sin(x_1p), x_1p)
-        angular_scatt_func_effective[
-            lc] = pfe * 1e-12 * 1e6  # equivalent to extCoeffPerLayer # similar to  _get_coefficients (converts everthing to meter)
+    # equivalent to extCoeffPerLayer # similar to  _get_coefficients (converts everthing to meter)
+    angular_scatt_func_effective = pd.DataFrame(pfe.transpose() * 1e-12 * 1e6, index=angles_out, columns=index.rename(None))
+    angular_scatt_func_effective.index.name = 'angle'
 
     if aod:
         out['AOD'] = AOD_layer[~ np.isnan(AOD_layer)].sum()
@@ -119,6 +189,9 @@ def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100):
     # out['OptPropInstance']= OpticalProperties(out, self.bins)
     out['wavelength'] = wavelength
     out['index_of_refraction'] = n
+    if coated:
+        out['core_index_of_refraction'] = core_n
+        out['core_volume_fraction'] = core_volume_fraction
     out['bin_centers'] = sdls.bincenters
     out['bins'] = sdls.bins
     out['binwidth'] = sdls.binwidth
@@ -136,6 +209,28 @@ def size_dist2optical_properties(sd, wavelength, n, aod=False, noOfAngles=100):
     return out
 
 
+def _hemispheric_integral(osf_df, start, end):
+    """2 pi times the integral of the angular scattering intensity times sin(angle) from the angle start to end
+    (radians) for each row of osf_df. If start and end are not among the angles, the angular scattering intensity
+    is linearly interpolated at these angles, so the integration limits do not depend on the angle grid."""
+    angles = np.asarray(osf_df.columns, dtype=float)
+    values = osf_df.values
+    # my phase function goes all the way to two py
+    within = angles <= np.pi
+    angles = angles[within]
+    values = values[:, within]
+
+    def interpolate(angle):
+        idx = np.clip(np.searchsorted(angles, angle), 1, angles.shape[0] - 1)
+        weight = np.clip((angle - angles[idx - 1]) / (angles[idx] - angles[idx - 1]), 0, 1)
+        return values[:, idx - 1] * (1 - weight) + values[:, idx] * weight
+
+    inside = np.logical_and(angles > start, angles < end)
+    x = np.concatenate(([start], angles[inside], [end]))
+    f = np.column_stack((interpolate(start), values[:, inside], interpolate(end)))
+    return 2 * np.pi * integrate.simps(f * np.sin(x), x, axis=1)
+
+
 def hemispheric_backscattering(osf_df):
     """scattering into backwards hemisphere from angulare scattering intensity
 
@@ -150,23 +245,7 @@ def hemispheric_backscattering(osf_df):
     -------
     pandas data frame with the scattering intensities
     """
-    def ang_scat_funk2bs(index,ol):
-        x = index
-        f = ol
-        # my phase function goes all the way to two py
-        f = f[ x < np.pi]
-        x = x[ x < np.pi]
-        f_b = f[x >= np.pi/2.]
-        x_b = x[x >= np.pi/2.]
-
-        res_b = 2* np.pi * integrate.simps(f_b * np.sin(x_b),x_b)
-        return res_b
-
-    bs = np.zeros(osf_df.shape[0])
-    index = osf_df.columns
-    for i in range(osf_df.shape[0]):
-        ol = osf_df.iloc[i,:].values
-        bs[i] = ang_scat_funk2bs(index,ol)
+    bs = _hemispheric_integral(osf_df, np.pi / 2., np.pi)
     bs = pd.DataFrame(bs, index = osf_df.index)
     return bs
 
@@ -183,25 +262,7 @@ def hemispheric_forwardscattering(osf_df):
     -------
     pandas data frame with the scattering intensities
     """
-
-    def ang_scat_funk2fs(index,ol):
-        x = index #ol.index.values
-        f = ol
-
-        # my phase function goes all the way to two py
-        f = f[ x < np.pi]
-        x = x[ x < np.pi]
-        f_f = f[x < np.pi/2.]
-        x_f = x[x < np.pi/2.]
-
-        res_f = 2* np.pi * integrate.simps(f_f * np.sin(x_f),x_f)
-        return res_f
-
-    fs = np.zeros(osf_df.shape[0])
-    index = osf_df.columns
-    for i in range(osf_df.shape[0]):
-        ol = osf_df.iloc[i,:].values
-        fs[i] = ang_scat_funk2fs(index,ol)
+    fs = _hemispheric_integral(osf_df, 0., np.pi / 2.)
     fs = pd.DataFrame(fs, index = osf_df.index)
     return fs
 
@@ -471,7 +532,7 @@ class ExtinctionCoeffVerticlProfile(vertical_profile.VerticalProfile):
         return a
 
 
-def _perform_Miecalculations(diam, wavelength, n, noOfAngles=100.):
+def _perform_Miecalculations(diam, wavelength, n, noOfAngles=100., angles=None):
     """
     Performs Mie calculations
 
@@ -483,63 +544,66 @@ def _perform_Miecalculations(diam, wavelength, n, noOfAngles=100.):
                 Wavelength of light in um for which to perform calculations
     n:          complex
                 Ensemble complex index of refraction
+    angles:     NumPy array of floats, optional
+                Scattering angles in radians (between 0 and pi). If not given, noOfAngles evenly spaced angles
+                between 0 and pi/2 are mirrored to the range from 0 to 2pi.
 
     Returns
         panda DataTable with the diameters as the index and the mie_scattering results in the different collumns
         total_extinction_coefficient: this takes the sum of all particles crossections of the particular diameter in a qubic
                                       meter. This is in principle the AOD of an L
 
+    Notes
+    -----
+    If the Mie lookup table is enabled (atmPy.radiation.mie_scattering.mie_lookup.enable) results are taken from
+    and stored in the lookup table.
+
     """
 
 
     diam = np.asarray(diam)
 
-    extinction_efficiency = np.zeros(diam.shape)
-    scattering_efficiency = np.zeros(diam.shape)
-    absorption_efficiency = np.zeros(diam.shape)
-
-    extinction_crossection = np.zeros(diam.shape)
-    scattering_crossection = np.zeros(diam.shape)
-    absorption_crossection = np.zeros(diam.shape)
-
-    # phase_function_natural = pd.DataFrame()
-    angular_scattering_natural = pd.DataFrame()
-    # extinction_coefficient = np.zeros(diam.shape)
-    # scattering_coefficient = np.zeros(diam.shape)
-    # absorption_coefficient = np.zeros(diam.shape)
-
-
-
-    # Function for calculating the size parameter for wavelength l and radius r
-    sp = lambda r, l: 2. * np.pi * r / l
-    for e, d in enumerate(diam):
-        radius = d / 2.
-
-        # print('sp(radius, wavelength)', sp(radius, wavelength))
-        # print('n', n)
-        # print('d', d)
-
-        mie = bhmie.bhmie_hagen(sp(radius, wavelength), n, noOfAngles, diameter=d)
-        values = mie.return_Values_as_dict()
-        extinction_efficiency[e] = values['extinction_efficiency']
+    lookup_table = _mie_lookup.default_table
+    if lookup_table:
+        if angles is None:
+            key = lookup_table.get_key(diam.astype(float), float(wavelength), complex(n), int(noOfAngles))
+        else:
+            key = lookup_table.get_key(diam.astype(float), float(wavelength), complex(n),
+                                       np.asarray(angles, dtype=float))
+        values = lookup_table.get(key)
+    else:
+        values = None
 
-        # print("values['extinction_crosssection']",values['extinction_crosssection'])
+    if not values:
+        # Function for calculating the size parameter for wavelength l and radius r
+        sp = lambda r, l: 2. * np.pi * r / l
+        size_parameter = sp(diam / 2., wavelength)
 
+        values = bhmie.bhmie_hagen_vectorized(size_parameter, n, noOfAngles, diameter=diam, angles=angles)
+        values['angles'], values['angular_scattering_natural'] = bhmie.angular_scatt_func_vectorized(values.pop('s1'),
+                                                                                                     values.pop('s2'),
+                                                                                                     size_parameter,
+                                                                                                     diam,
+                                                                                                     angles=angles)
+        if lookup_table:
+            lookup_table.put(key, values)
 
-        scattering_efficiency[e] = values['scattering_efficiency']
-        absorption_efficiency[e] = values['extinction_efficiency'] - values['scattering_efficiency']
+    return _mie_values2frames(values, diam)
 
-        extinction_crossection[e] = values['extinction_crosssection']
-        scattering_crossection[e] = values['scattering_crosssection']
-        absorption_crossection[e] = values['extinction_crosssection'] - values['scattering_crosssection']
 
-        # phase_function_natural[d] = values['phaseFct_natural']['Phase_function_natural'].values
-        angular_scattering_natural[d] = mie.get_angular_scatt_func().natural.values
+def _mie_values2frames(values, diam):
+    """Converts the output of the Mie calculations (dict of arrays) into the DataFrames returned by
+    _perform_Miecalculations and _perform_coated_Miecalculations"""
+    extinction_efficiency = values['extinction_efficiency']
+    scattering_efficiency = values['scattering_efficiency']
+    absorption_efficiency = values['extinction_efficiency'] - values['scattering_efficiency']
 
-        # print('\n')
+    extinction_crossection = values['extinction_crosssection']
+    scattering_crossection = values['scattering_crosssection']
+    absorption_crossection = values['extinction_crosssection'] - values['scattering_crosssection']
 
-    # phase_function_natural.index = values['phaseFct_natural'].index
-    angular_scattering_natural.index = mie.get_angular_scatt_func().index
+    angular_scattering_natural = pd.DataFrame(values['angular_scattering_natural'], index=values['angles'], columns=diam)
+    angular_scattering_natural.index.name = 'angle'
 
     out = pd.DataFrame(index=diam)
     out['extinction_efficiency'] = pd.Series(extinction_efficiency, index=diam)
@@ -552,6 +616,271 @@ def _perform_Miecalculations(diam, wavelength, n, noOfAngles=100.):
     return out, angular_scattering_natural
 
 
+def _perform_coated_Miecalculations(diam, wavelength, n_core, n_shell, core_volume_fraction, noOfAngles=100.,
+                                    angles=None):
+    """
+    Performs Mie calculations for coated spheres (core-shell particles). All diameters are calculated in a single
+    call of the vectorized coefficient function (mie_coeffs.coated_mie_coeff_vectorized).
+
+    Parameters
+    ----------
+    diam:       NumPy array of floats
+                Array of (outer) diameters over which to perform Mie calculations; units are um
+    wavelength: float
+                Wavelength of light in um for which to perform calculations
+    n_core:     complex
+                Complex index of refraction of the core
+    n_shell:    complex
+                Complex index of refraction of the shell
+    core_volume_fraction: float
+                Fraction of the particle volume taken by the core (between 0 and 1)
+    noOfAngles, angles:
+                see _perform_Miecalculations
+
+    Returns
+    -------
+    Same as _perform_Miecalculations
+
+    Notes
+    -----
+    Results are kept in an in-memory LRU cache (_coated_kernel_cache) and, if enabled, in the Mie lookup table.
+
+    """
+    diam = np.asarray(diam, dtype=float)
+    if angles is None:
+        angles_key = int(noOfAngles)
+    else:
+        angles_key = tuple(np.asarray(angles, dtype=float))
+    key = (diam.tobytes(), float(wavelength), complex(n_core), complex(n_shell), float(core_volume_fraction),
+           angles_key)
+    values = _coated_kernel_cache.get(key)
+
+    lookup_table = _mie_lookup.default_table
+    if values is None and lookup_table:
+        table_key = lookup_table.get_key('coated', diam, float(wavelength), complex(n_core), complex(n_shell),
+                                         float(core_volume_fraction), np.asarray(angles_key, dtype=float))
+        values = lookup_table.get(table_key)
+
+    if values is None:
+        size_parameter = 2. * np.pi * (diam / 2.) / wavelength
+        size_parameter_core = size_parameter * core_volume_fraction ** (1. / 3.)
+        an, bn, nmax = _mie_coeffs.coated_mie_coeff_vectorized(complex(n_core) ** 2, complex(n_shell) ** 2,
+                                                                size_parameter_core, size_parameter)
+        coeffs = _MieCoefficients(an, bn)
+        props = _mie_props.mie_props(coeffs, size_parameter)
+
+        if angles is None:
+            # same angles as in bhmie_hagen_vectorized, pi/2 is mirrored later on
+            noOfAngles = max(int(noOfAngles), 2)
+            dang = .5 * np.pi / (noOfAngles - 1)
+            theta = np.arange(0.0, 2 * noOfAngles - 1, 1) * dang
+        else:
+            theta = np.asarray(angles, dtype=float)
+        s1, s2 = _mie_props.mie_S12(coeffs, np.cos(theta))
+
+        geometric_crosssection = diam ** 2 * np.pi * 0.5 ** 2
+        values = {'extinction_efficiency': props['qext'],
+                  'scattering_efficiency': props['qsca'],
+                  'extinction_crosssection': props['qext'] * geometric_crosssection,
+                  'scattering_crosssection': props['qsca'] * geometric_crosssection}
+        values['angles'], values['angular_scattering_natural'] = bhmie.angular_scatt_func_vectorized(s1, s2,
+                                                                                                     size_parameter,
+                                                                                                     diam,
+                                                                                                     angles=angles)
+        if lookup_table:
+            lookup_table.put(table_key, values)
+
+    _coated_kernel_cache[key] = values
+    return _mie_values2frames(values, diam)
+
+
+class MieKernelGrid(object):
+    """Mie calculations on a grid of complex refractive indices (real part x imaginary part) for a fixed diameter
+    grid and wavelength. Results for arbitrary refractive indices within the range of the grid are bilinearly
+    interpolated. This is useful when the refractive index changes for each row of a size distribution time series
+    (e.g. after apply_hygro_growth), since the Mie calculations only have to be done for the grid points.
+
+    The grid is refined (number of intervals doubled) along the real and the imaginary axis independently until
+    the interpolation error at the midpoints between grid points along both axes and at the centers of the grid
+    cells is smaller than tolerance. If only the cell centers exceed the tolerance both axes are refined. The
+    error is evaluated for the extinction and scattering cross sections and the angular scattering function summed
+    over all diameters (the angular scattering function relative to its maximum). Note, for weakly absorbing, large particles the
+    cross sections of individual diameters show narrow resonances as a function of the refractive index, which are
+    not resolved by the grid. These average out when integrating over the size distribution.
+
+    Parameters
+    ----------
+    diam: array
+        diameters in um
+    wavelength: float
+        wavelength in um
+    n_values: array of complex
+        refractive indices the grid has to cover (nan values are ignored)
+    noOfAngles: int, optional
+    angles: array-like, optional
+        see _perform_Miecalculations
+    tolerance: float, optional
+        maximum relative interpolation error
+    max_refinements: int, optional
+        maximum number of refinements of the grid. A warning is raised if the tolerance is not reached.
+    """
+    def __init__(self, diam, wavelength, n_values, noOfAngles=100, tolerance=1e-3, max_refinements=5, angles=None):
+        self.diam = np.asarray(diam)
+        self.wavelength = wavelength
+        self.noOfAngles = noOfAngles
+        self.angles = angles
+        self.tolerance = tolerance
+        self._exact = {}
+
+        n_values = np.asarray(n_values, dtype=np.complex128)
+        n_values = n_values[~np.isnan(n_values)]
+        if n_values.shape[0] == 0:
+            raise ValueError('all refractive indices are nan')
+
+        self.n_real = self._get_axis(n_values.real, 2)
+        self.n_imag = self._get_axis(n_values.imag, 2)
+        self._calculate_grid()
+
+        for i in range(max_refinements + 1):
+            error_real = self._get_interpolation_error('real')
+            error_imag = self._get_interpolation_error('imag')
+            error_center = self._get_interpolation_error('center')
+            self.error = max(error_real, error_imag, error_center)
+            if self.error <= tolerance or i == max_refinements:
+                break
+            refine_real = error_real > tolerance
+            refine_imag = error_imag > tolerance
+            if not (refine_real or refine_imag):
+                # only the centers of the cells exceed the tolerance
+                refine_real = refine_imag = True
+            if refine_real:
+                self.n_real = self._refine_axis(self.n_real)
+            if refine_imag:
+                self.n_imag = self._refine_axis(self.n_imag)
+            self._calculate_grid()
+
+        if self.error > tolerance:
+            _warnings.warn('Interpolation error of Mie kernel grid (%s) is larger than the tolerance (%s).' % (
+                            self.error, tolerance))
+
+    @staticmethod
+    def _get_axis(values, no_of_intervals):
+        if values.min() == values.max():
+            return np.array([values.min()])
+        return np.linspace(values.min(), values.max(), no_of_intervals + 1)
+
+    @staticmethod
+    def _refine_axis(axis):
+        if axis.shape[0] == 1:
+            return axis
+        return np.linspace(axis[0], axis[-1], 2 * (axis.shape[0] - 1) + 1)
+
+    def _get_exact(self, n):
+        """Mie results for a single refractive index. Results are kept so they can be reused after refinement."""
+        if n not in self._exact:
+            mie, angular_scatt_func = _perform_Miecalculations(self.diam, self.wavelength, n,
+                                                               noOfAngles=self.noOfAngles, angles=self.angles)
+            self._columns = mie.columns
+            self._angles = angular_scatt_func.index.values
+            self._exact[n] = (mie.values, angular_scatt_func.values)
+        return self._exact[n]
+
+    def _calculate_grid(self):
+        mie = []
+        ang = []
+        for nr in self.n_real:
+            mie_row = []
+            ang_row = []
+            for ni in self.n_imag:
+                mie_values, ang_values = self._get_exact(complex(nr, ni))
+                mie_row.append(mie_values)
+                ang_row.append(ang_values)
+            mie.append(mie_row)
+            ang.append(ang_row)
+        self._grid_mie = np.array(mie)
+        self._grid_angular = np.array(ang)
+
+    @staticmethod
+    def _get_weights(axis, value):
+        """index of the lower grid point and the weight of the upper one"""
+        if axis.shape[0] == 1:
+            return 0, 0.
+        idx = np.clip(np.searchsorted(axis, value) - 1, 0, axis.shape[0] - 2)
+        weight = (value - axis[idx]) / (axis[idx + 1] - axis[idx])
+        return idx, weight
+
+    def _interpolate(self, grid, n):
+        ir, wr = self._get_weights(self.n_real, n.real)
+        ii, wi = self._get_weights(self.n_imag, n.imag)
+        ir1 = min(ir + 1, self.n_real.shape[0] - 1)
+        ii1 = min(ii + 1, self.n_imag.shape[0] - 1)
+        out = (grid[ir, ii] * (1 - wr) * (1 - wi) +
+               grid[ir1, ii] * wr * (1 - wi) +
+               grid[ir, ii1] * (1 - wr) * wi +
+               grid[ir1, ii1] * wr * wi)
+        return out
+
+    def _get_interpolation_error(self, axis):
+        """maximum relative interpolation error at the midpoints between grid points along axis ('real' or 'imag')
+        or at the centers of the grid cells (axis = 'center')"""
+        mid_real = (self.n_real[1:] + self.n_real[:-1]) / 2.
+        mid_imag = (self.n_imag[1:] + self.n_imag[:-1]) / 2.
+        if axis == 'real':
+            points = [complex(nr, ni) for nr in mid_real for ni in self.n_imag]
+        elif axis == 'imag':
+            points = [complex(nr, ni) for nr in self.n_real for ni in mid_imag]
+        else:
+            points = [complex(nr, ni) for nr in mid_real for ni in mid_imag]
+
+        crossections = [list(self._columns).index(i) for i in ('extinction_crossection', 'scattering_crossection')]
+        error = 0.
+        for n in points:
+            mie_values, ang_values = self._get_exact(n)
+            # extinction and scattering cross sections summed over all diameters
+            mie_exact = mie_values[:, crossections].sum(axis=0)
+            mie_interp = self._interpolate(self._grid_mie, n)[:, crossections].sum(axis=0)
+            mie_error = np.abs(mie_interp - mie_exact) / np.abs(mie_exact)
+            # angular scattering function summed over all diameters relative to its maximum
+            ang_exact = ang_values.sum(axis=1)
+            ang_interp = self._interpolate(self._grid_angular, n).sum(axis=1)
+            ang_error = np.abs(ang_interp - ang_exact) / np.abs(ang_exact).max()
+            error = max(error, mie_error.max(), ang_error.max())
+        return error
+
+    def get_Miecalculations(self, n):
+        """Interpolated results for refractive index n. Output is equivalent to that of _perform_Miecalculations"""
+        n = complex(n)
+        if np.isnan(n):
+            mie_values = np.full(self._grid_mie.shape[2:], np.nan)
+            ang_values = np.full(self._grid_angular.shape[2:], np.nan)
+        else:
+            mie_values = self._interpolate(self._grid_mie, n)
+            ang_values = self._interpolate(self._grid_angular, n)
+        mie = pd.DataFrame(mie_values, index=self.diam, columns=self._columns)
+        angular_scatt_func = pd.DataFrame(ang_values, index=self._angles, columns=self.diam)
+        angular_scatt_func.index.name = 'angle'
+        return mie, angular_scatt_func
+
+
+def _get_row_values(value, no_of_rows):
+    """Returns a parameter that is either constant or given per row (DataFrame, Series or array) as complex array
+    with one value per row"""
+    if isinstance(value, timeseries.TimeSeries):
+        value = value.data
+    if isinstance(value, pd.DataFrame):
+        value = value.iloc[:, 0].values
+    elif isinstance(value, pd.Series):
+        value = value.values
+    value = np.asarray(value, dtype=complex)
+    if value.ndim == 0:
+        return np.full(no_of_rows, value)
+    value = value.ravel()
+    if value.shape[0] != no_of_rows:
+        raise ValueError('Number of values (%i) does not match the number of rows of the size distribution (%i).' % (
+                         value.shape[0], no_of_rows))
+    return value
+
+
 def _get_coefficients(crossection, cn):
     """
     Calculates the extinction, scattering or absorbtion coefficient
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import integrate
+
+from atmPy.aerosols.physics import optical_properties
+from atmPy.aerosols.size_distribution import sizedistribution
+from atmPy.radiation.mie_scattering import bhmie
+
+
+def test_perform_Miecalculations_equals_bhmie_hagen():
+    diam = np.array([0.05, 0.2, 0.8, 2.])
+    wavelength = 0.55
+    n = 1.5 + 0.01j
+    out, angular = optical_properties._perform_Miecalculations(diam, wavelength, n, noOfAngles=20)
+    for d in diam:
+        mie = bhmie.bhmie_hagen(np.pi * d / wavelength, n, 20, diameter=d)
+        values = mie.return_Values_as_dict()
+        np.testing.assert_allclose(out.loc[d, 'extinction_crossection'], values['extinction_crosssection'],
+                                   rtol=1e-10)
+        np.testing.assert_allclose(out.loc[d, 'scattering_crossection'], values['scattering_crosssection'],
+                                   rtol=1e-10)
+        np.testing.assert_allclose(out.loc[d, 'absorption_efficiency'],
+                                   values['extinction_efficiency'] - values['scattering_efficiency'], rtol=1e-10)
+        np.testing.assert_allclose(angular[d].values, mie.get_angular_scatt_func().natural.values, rtol=1e-10)
+
+
+def _relative_error(grid, n):
+    exact, exact_angular = optical_properties._perform_Miecalculations(grid.diam, grid.wavelength, n,
+                                                                       noOfAngles=grid.noOfAngles)
+    interp, interp_angular = grid.get_Miecalculations(n)
+    ext = exact.extinction_crossection.sum()
+    return max(abs(interp.extinction_crossection.sum() - ext) / ext,
+               (abs(interp_angular.sum(axis=1) - exact_angular.sum(axis=1)) / exact_angular.sum(axis=1).max()).max())
+
+
+def test_mie_kernel_grid():
+    diam = np.logspace(-1.5, 0, 15)
+    n_values = np.array([1.4 + 0.j, 1.6 + 0.05j, 1.45 + 0.02j, np.nan])
+    grid = optical_properties.MieKernelGrid(diam, 0.55, n_values, noOfAngles=20, tolerance=1e-3)
+    assert grid.error <= 1e-3
+
+    # grid points are exact
+    exact = optical_properties._perform_Miecalculations(diam, 0.55, complex(grid.n_real[1], grid.n_imag[0]),
+                                                        noOfAngles=20)[0]
+    interp = grid.get_Miecalculations(complex(grid.n_real[1], grid.n_imag[0]))[0]
+    np.testing.assert_allclose(interp.values, exact.values)
+
+    # centers of the grid cells are within the tolerance
+    if grid.n_real.shape[0] > 1 and grid.n_imag.shape[0] > 1:
+        for nr in (grid.n_real[1:] + grid.n_real[:-1]) / 2.:
+            for ni in (grid.n_imag[1:] + grid.n_imag[:-1]) / 2.:
+                assert _relative_error(grid, complex(nr, ni)) <= 1e-3
+
+    mie, angular = grid.get_Miecalculations(np.nan)
+    assert np.all(np.isnan(mie.values))
+
+
+def test_size_dist2optical_properties_per_row(make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=6, no_of_bins=10)
+    dist.data.iloc[2, 3] = np.nan
+    n = pd.DataFrame([1.5, 1.5, 1.45 + 0.01j, 1.6, 1.45 + 0.01j, 1.5], index=dist.data.index)
+    opt = optical_properties.size_dist2optical_properties(dist, 550., n, noOfAngles=30)
+
+    numberconc = dist.convert2numberconcentration().data.values
+    diam = dist.bincenters / 1000.
+    for row in range(numberconc.shape[0]):
+        mie, angular = optical_properties._perform_Miecalculations(diam, 0.55, complex(n.iloc[row, 0]), noOfAngles=30)
+        ext = mie.extinction_crossection.values * 1e-12 * numberconc[row] * 1e6
+        np.testing.assert_allclose(opt.extinction_coeff_per_bin.data.values[row], ext, rtol=1e-10)
+        nc = np.nan_to_num(numberconc[row])
+        pfe = (angular.values * nc).sum(axis=1)
+        np.testing.assert_allclose(opt.angular_scatt_func.data.values[row], pfe * 1e-6, rtol=1e-10)
+
+        angles = angular.index.values
+        csca = (mie.scattering_crossection.values * nc).sum()
+        phase_func = pfe[angles < np.pi] * 4 * np.pi / csca
+        x = angles[angles < np.pi]
+        g = .5 * integrate.simps(np.cos(x) * phase_func * np.sin(x), x)
+        np.testing.assert_allclose(opt.data_orig['asymmetry_param'].values[row, 0], g, rtol=1e-10)
+
+
+def test_size_dist2optical_properties_interpolated_n(make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=6, no_of_bins=10)
+    n = pd.DataFrame(np.linspace(1.45, 1.55, 6) + 0.005j, index=dist.data.index)
+    exact = optical_properties.size_dist2optical_properties(dist, 550., n, noOfAngles=30)
+    interp = optical_properties.size_dist2optical_properties(dist, 550., n, noOfAngles=30,
+                                                             n_interpolation_tolerance=1e-3)
+    ext_exact = np.nansum(exact.extinction_coeff_per_bin.data.values, axis=1)
+    ext_interp = np.nansum(interp.extinction_coeff_per_bin.data.values, axis=1)
+    np.testing.assert_allclose(ext_interp, ext_exact, rtol=2e-3)
+
+
+def test_hemispheric_scattering_angle_grids():
+    diam = np.array([0.3])
+    dense = np.linspace(0, np.pi, 2001)
+    mie, angular = optical_properties._perform_Miecalculations(diam, 0.55, 1.5, angles=dense)
+    osf = pd.DataFrame(angular.values.transpose(), columns=angular.index)
+    bs_ref = optical_properties.hemispheric_backscattering(osf).values[0, 0]
+    fs_ref = optical_properties.hemispheric_forwardscattering(osf).values[0, 0]
+    np.testing.assert_allclose(bs_ref + fs_ref, mie.scattering_crossection.values[0], rtol=1e-6)
+
+    grids = [np.linspace(0, np.pi, 180),
+             np.concatenate((np.linspace(0, 0.3, 30), np.linspace(0.5, 2.8, 8), np.linspace(2.9, np.pi, 30)))]
+    for angles, rtol in zip(grids, [1e-6, 0.02]):
+        assert not np.any(np.isclose(angles, np.pi / 2))
+        mie, angular = optical_properties._perform_Miecalculations(diam, 0.55, 1.5, angles=angles)
+        osf = pd.DataFrame(angular.values.transpose(), columns=angular.index)
+        np.testing.assert_allclose(optical_properties.hemispheric_backscattering(osf).values[0, 0], bs_ref,
+                                   rtol=rtol)
+        np.testing.assert_allclose(optical_properties.hemispheric_forwardscattering(osf).values[0, 0], fs_ref,
+                                   rtol=rtol)
+
+    # default grid (mirrored to 2 pi)
+    mie, angular = optical_properties._perform_Miecalculations(diam, 0.55, 1.5, noOfAngles=100)
+    osf = pd.DataFrame(angular.values.transpose(), columns=angular.index)
+    np.testing.assert_allclose(optical_properties.hemispheric_backscattering(osf).values[0, 0], bs_ref, rtol=1e-4)
+    np.testing.assert_allclose(optical_properties.hemispheric_forwardscattering(osf).values[0, 0], fs_ref, rtol=1e-4)
+
+
+def test_coated_equals_homogeneous_for_equal_materials(make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=6, no_of_bins=10)
+    homogeneous = optical_properties.size_dist2optical_properties(dist, 550., 1.5 + 0.01j, noOfAngles=30)
+    coated = optical_properties.size_dist2optical_properties(dist, 550., 1.5 + 0.01j, noOfAngles=30,
+                                                             core_n=1.5 + 0.01j, core_volume_fraction=0.5)
+    np.testing.assert_allclose(coated.extinction_coeff_per_bin.data.values,
+                               homogeneous.extinction_coeff_per_bin.data.values, rtol=1e-8)
+    np.testing.assert_allclose(coated.angular_scatt_func.data.values, homogeneous.angular_scatt_func.data.values,
+                               rtol=1e-8)
+
+    with pytest.raises(ValueError):
+        optical_properties.size_dist2optical_properties(dist, 550., 1.5, core_n=1.7)
+
+
+def test_aod_keeps_nan_layers():
+    bins = np.logspace(np.log10(100), np.log10(2000), 11)
+    bounds = np.array([[0., 100.], [100., 200.], [200., 400.], [400., 500.]])
+    data = np.random.RandomState(2).rand(4, bins.shape[0] - 1) * 10
+    data[1] = np.nan  # empty layer
+    data[2, 4] = np.nan  # partly missing layer
+    # SizeDist_LS is not accepted by size_dist2optical_properties, the layers are attached to a SizeDist instead
+    dist = sizedistribution.SizeDist(pd.DataFrame(data, index=bounds.mean(axis=1)), bins, 'dNdlogDp')
+    dist.layerbounderies = bounds
+    dist.layercenters = bounds.mean(axis=1)
+    opt = optical_properties.size_dist2optical_properties(dist, 550., 1.5 + 0.01j, aod=True, noOfAngles=30)
+
+    aod_layer = opt['AOD_layer'].values[:, 0]
+    assert np.isnan(aod_layer[1])
+    assert np.isnan(aod_layer[2])
+    ext = opt['extCoeff_perrow_perbin'].data.values
+    np.testing.assert_allclose(aod_layer[[0, 3]], ext[[0, 3]].sum(axis=1) * np.array([100., 100.]), rtol=1e-10)
+    np.testing.assert_allclose(opt['AOD'], aod_layer[[0, 3]].sum(), rtol=1e-10)
@@ -1,5 +1,6 @@
 import warnings as _warnings
 import numpy as _np
+from atmPy.radiation.mie_scattering import mie_aux as _mie_aux
 
 moments = {'log normal': ['dNdlogDp', 'dSdlogDp', 'dVdlogDp'],
              'natural': ['dNdDp', 'dSdDp', 'dVdDp'],
@@ -7,103 +8,189 @@ moments = {'log normal': ['dNdlogDp', 'dSdlogDp', 'dVdlogDp'],
              'surface': ['dSdlogDp', 'dSdDp'],
              'volume': ['dVdlogDp', 'dVdDp']}
 
+# bin geometries keyed by the bin edges, distributions with the same bins share one instance (least recently used
+# are dropped)
+_bin_geometry_cache = _mie_aux.Cache(size=100)
+
+
+class BinGeometry(object):
+    """Quantities which only depend on the bin edges: bin centers, widths, and the per-bin factors of the moment
+    conversions. They are computed once per set of bins (see get_bin_geometry), conversion factors are computed
+    when first requested and kept in the private cache _conversion_factors (see get_conversion_factor).
+    Instances are shared between distributions, therefore all arrays are read-only.
+
+    Parameters
+    ----------
+    bins: array
+        bin edges
+    """
+    def __init__(self, bins):
+        self.bins = _read_only(_np.array(bins, dtype=float))
+        self.bincenters = _read_only((self.bins[1:] + self.bins[:-1]) / 2.)
+        self.binwidth = _read_only(self.bins[1:] - self.bins[:-1])
+        self.binwidth_log = _read_only(_np.log10(self.bins[1:]) - _np.log10(self.bins[:-1]))
+        self.normal2log = _read_only(self.bincenters * _np.log(10.))
+        self.surface = _read_only(4. * _np.pi * (self.bincenters / 2.) ** 2)
+        self.volume = _read_only(4. / 3. * _np.pi * (self.bincenters / 2.) ** 3)
+        # number, surface, and volume of a particle of the bin center diameter, see SizeDist.integrate_moments
+        self.moment_weights = _read_only(_np.array([_np.ones(self.bincenters.shape),
+                                                    _np.pi * self.bincenters ** 2,
+                                                    _np.pi / 6. * self.bincenters ** 3]).transpose())
+        self._conversion_factors = {}
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # immutable, copies of a distribution share the geometry
+        return self
+
+
+def get_bin_geometry(bins):
+    """Returns the (cached) BinGeometry instance for the bin edges bins"""
+    bins = _np.asarray(bins, dtype=float)
+    key = bins.tobytes()
+    geometry = _bin_geometry_cache.get(key)
+    if geometry is None:
+        geometry = BinGeometry(bins)
+        _bin_geometry_cache[key] = geometry
+    return geometry
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
 def convert(dist, to_type, verbose=False):
+    """Converts the distribution into another distribution type (moment).
+
+    The data of the returned distribution is a lazy view: the conversion is a per-bin scale factor which is only
+    applied when the data is read for the first time. The data of dist is not copied (copy-on-write, see
+    SizeDist.data), so chained conversions (e.g. dist.convert2dNdDp().convert2dVdDp()) only allocate memory for
+    the final data.
 
-    dist = dist.copy()
+    Parameters
+    ----------
+    dist: SizeDist instance
+    to_type: str
+        e.g. 'dNdlogDp', 'dVdDp', or 'numberConcentration'
+
+    Returns
+    -------
+    Distribution of the same type as dist
+    """
     from_type = dist.distributionType
     if from_type == to_type:
         if verbose:
             _warnings.warn(
                 'Distribution type is already %s. Output is an unchanged copy of the distribution' % to_type)
-        return dist
-
-    if from_type == 'numberConcentration':
-        pass
-    elif to_type == 'numberConcentration':
-        pass
-    elif from_type in moments['log normal']:
-        if to_type in moments['log normal']:
-            if verbose:
-                print('both log normal')
-        else:
-            dist.data = dist.data / _normal2log(dist)
+        return dist.copy()
+
+    factor = get_conversion_factor(dist, to_type)
 
+    if hasattr(dist, '_set_data_view'):
+        out = dist._copy_without_data()
+        out._set_data_view(dist, factor)
+    else:
+        out = dist.copy()
+        out.data = out.data * factor
+
+    out.distributionType = to_type
+    if verbose:
+        print('converted from %s to %s' % (from_type, to_type))
+    return out
+
+def get_conversion_factor(dist, to_type, from_type=None):
+    """Per-bin factor which converts the data of dist from from_type into to_type.
+
+    Parameters
+    ----------
+    dist: SizeDist instance
+        only the bins are used
+    to_type: str
+    from_type: str, optional
+        If None, dist.distributionType is used.
+
+    Returns
+    -------
+    1D array (one value per bin)
+    """
+    if from_type is None:
+        from_type = dist.distributionType
+
+    geometry = getattr(dist, 'bin_geometry', None)
+    if geometry is None:
+        return _get_conversion_factor(dist, to_type, from_type)
+    key = (from_type, to_type)
+    if key not in geometry._conversion_factors:
+        geometry._conversion_factors[key] = _read_only(_get_conversion_factor(dist, to_type, from_type))
+    return geometry._conversion_factors[key]
+
+def _get_conversion_factor(dist, to_type, from_type):
+    if from_type == to_type:
+        return _np.ones(dist.bincenters.shape)
+
+    if to_type == 'numberConcentration':
+        return get_conversion_factor(dist, 'dNdDp', from_type=from_type) * dist.binwidth
+    elif from_type == 'numberConcentration':
+        return get_conversion_factor(dist, to_type, from_type='dNdDp') / dist.binwidth
+
+    factor = _np.ones(dist.bincenters.shape)
+    if from_type in moments['log normal']:
+        if to_type not in moments['log normal']:
+            factor = factor / _normal2log(dist)
     elif from_type in moments['natural']:
-        if to_type in moments['natural']:
-            if verbose:
-                print('both natural')
-        else:
-            dist.data = dist.data * _normal2log(dist)
+        if to_type not in moments['natural']:
+            factor = factor * _normal2log(dist)
     else:
         raise ValueError('%s is not an option' % to_type)
 
-    if from_type == 'numberConcentration':
-        pass
-
-    elif to_type == 'numberConcentration':
-        pass
-    elif from_type in moments['number']:
-        if to_type in moments['number']:
-            if verbose:
-                print('both number')
-        else:
+    if from_type in moments['number']:
+        if to_type not in moments['number']:
             if to_type in moments['surface']:
-                dist.data *= _2Surface(dist)
+                factor = factor * _2Surface(dist)
             elif to_type in moments['volume']:
-                dist.data *= _2Volume(dist)
+                factor = factor * _2Volume(dist)
             else:
                 raise ValueError('%s is not an option' % to_type)
 
     elif from_type in moments['surface']:
-        if to_type in moments['surface']:
-            if verbose:
-                print('both surface')
-        else:
+        if to_type not in moments['surface']:
             if to_type in moments['number']:
-                dist.data /= _2Surface(dist)
+                factor = factor / _2Surface(dist)
             elif to_type in moments['volume']:
-                dist.data *= _2Volume(dist) / _2Surface(dist)
+                factor = factor * _2Volume(dist) / _2Surface(dist)
             else:
                 raise ValueError('%s is not an option' % to_type)
 
     elif from_type in moments['volume']:
-        if to_type in moments['volume']:
-            if verbose:
-                print('both volume')
-        else:
+        if to_type not in moments['volume']:
             if to_type in moments['number']:
-                dist.data /= _2Volume(dist)
+                factor = factor / _2Volume(dist)
             elif to_type in moments['surface']:
-                dist.data *= _2Surface(dist) / _2Volume(dist)
+                factor = factor * _2Surface(dist) / _2Volume(dist)
             else:
                 raise ValueError('%s is not an option' % to_type)
     else:
         raise ValueError('%s is not an option' % to_type)
 
-    if to_type == 'numberConcentration':
-        dist = convert(dist,'dNdDp')
-        # dist = dist.convert2dNdDp()
-        dist.data *= dist.binwidth
-
-    elif from_type == 'numberConcentration':
-        dist.data = dist.data / dist.binwidth
-        dist.distributionType = 'dNdDp'
-        dist = convert(dist,to_type)
-        # dist = dist._convert2otherDistribution(to_type)
-
-    dist.distributionType = to_type
-    if verbose:
-        print('converted from %s to %s' % (from_type, to_type))
-    return dist
+    return factor
 
 def _normal2log(dist):
+    if hasattr(dist, 'bin_geometry'):
+        return dist.bin_geometry.normal2log
     trans = (dist.bincenters * _np.log(10.))
     return trans
 
 def _2Surface(dist):
+    if hasattr(dist, 'bin_geometry'):
+        return dist.bin_geometry.surface
     trans = 4. * _np.pi * (dist.bincenters / 2.) ** 2
     return trans
 
 def _2Volume(dist):
+    if hasattr(dist, 'bin_geometry'):
+        return dist.bin_geometry.volume
     trans = 4. / 3. * _np.pi * (dist.bincenters / 2.) ** 3
     return trans
\ No newline at end of file
@@ -11,14 +11,20 @@ from atmPy.general import vertical_profile as _vertical_profile
 import pandas as pd
 import warnings as _warnings
 import datetime
+import os as _os
+import tempfile as _tempfile
+import weakref as _weakref
+from netCDF4 import Dataset as _Dataset
 import scipy.optimize as optimization
 from scipy import stats
+from scipy import sparse as _sparse
 from atmPy.general import vertical_profile
 from atmPy.aerosols.physics import hygroscopic_growth as hg, optical_properties
 from atmPy.tools import pandas_tools
 from atmPy.aerosols.physics import optical_properties
 from atmPy.aerosols.size_distribution import sizedist_moment_conversion
 from atmPy.gases import physics as _gas_physics
+from atmPy.radiation.mie_scattering import mie_aux as _mie_aux
 
 import pdb as _pdb
 
@@ -33,6 +39,108 @@ import pdb as _pdb
 
 _axes_types = ('AxesSubplot', 'AxesHostAxes')
 
+# overlap matrices used by SizeDist.rebin, keyed by the old and the new bins (least recently used are dropped)
+_rebin_matrix_cache = _mie_aux.Cache(size=50)
+
+
+def _get_rebin_matrix(bins, new_bins):
+    """Sparse matrix (len(bins) - 1 x len(new_bins) - 1) with the fraction of each old bin that falls into each
+    of the new bins. The distribution within a bin is assumed to be constant in log(Dp). Matrices are cached for
+    each combination of old and new bins (LRU cache, see _rebin_matrix_cache).
+
+    Parameters
+    ----------
+    bins: array
+        old bin edges
+    new_bins: array
+        new bin edges
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+    """
+    bins = _np.asarray(bins, dtype=float)
+    new_bins = _np.asarray(new_bins, dtype=float)
+    key = (bins.tobytes(), new_bins.tobytes())
+    matrix = _rebin_matrix_cache.get(key)
+    if matrix is not None:
+        return matrix
+
+    log_bins = _np.log10(bins)
+    log_new_bins = _np.log10(new_bins)
+    # each segment between two edges of the combined grid lies in at most one old and one new bin
+    edges = _np.unique(_np.concatenate((log_bins, log_new_bins)))
+    centers = (edges[1:] + edges[:-1]) / 2.
+    idx_old = _np.searchsorted(log_bins, centers) - 1
+    idx_new = _np.searchsorted(log_new_bins, centers) - 1
+    valid = (idx_old >= 0) & (idx_old < bins.shape[0] - 1) & (idx_new >= 0) & (idx_new < new_bins.shape[0] - 1)
+    idx_old = idx_old[valid]
+    idx_new = idx_new[valid]
+    weights = _np.diff(edges)[valid] / _np.diff(log_bins)[idx_old]
+
+    matrix = _sparse.coo_matrix((weights, (idx_old, idx_new)),
+                                shape=(bins.shape[0] - 1, new_bins.shape[0] - 1)).tocsr()
+    _rebin_matrix_cache[key] = matrix
+    return matrix
+
+def _open_memmap(directory, shape):
+    """Creates a new, zero-filled float memmap (.npy file) in directory. The file is removed as soon as the array
+    (and all views on it) are garbage collected."""
+    fd, fname = _tempfile.mkstemp(dir=directory, prefix='atmPy_', suffix='.npy')
+    _os.close(fd)
+    values = _np.lib.format.open_memmap(fname, mode='w+', dtype=_np.float64, shape=shape)
+    _weakref.finalize(values, _remove_file, fname)
+    return values
+
+
+def _remove_file(fname):
+    try:
+        _os.remove(fname)
+    except OSError:
+        pass
+
+
+def _get_memmap_directory(values):
+    """Returns the directory of the memmap file backing the array values or None if values is held in memory"""
+    while values is not None:
+        if isinstance(values, _np.memmap):
+            return _os.path.dirname(values.filename)
+        values = getattr(values, 'base', None)
+    return None
+
+
+def _scale_blockwise(values, factor, out, block_size=10000):
+    """out = values * factor, computed in blocks of rows so no full size temporary array is created"""
+    for start in range(0, values.shape[0], block_size):
+        out[start: start + block_size] = values[start: start + block_size] * factor
+    return out
+
+
+def _scale_frame(df, factor):
+    """New DataFrame with the values of df times factor. If df is memory-mapped the result is written into a new
+    memmap in the same directory."""
+    directory = _get_memmap_directory(df.values)
+    if directory is None:
+        values = df.values * factor
+    else:
+        values = _scale_blockwise(df.values, factor, _open_memmap(directory, df.shape))
+    return pd.DataFrame(values, index=df.index, columns=df.columns)
+
+
+def _copy_frame(df):
+    """Copy of df, memory-mapped data is copied into a new memmap in the same directory"""
+    if _get_memmap_directory(df.values) is None:
+        return df.copy()
+    return _scale_frame(df, 1.)
+
+
+def _read_only_view(array):
+    """Read-only view on array, e.g. to hand out storage which must not be modified through the view"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
 def fit_normal_dist(x, y, log=True, p0=[10, 180, 0.2]):
     """Fits a normal distribution to a """
     param = p0[:]
@@ -61,6 +169,135 @@ def fit_normal_dist(x, y, log=True, p0=[10, 180, 0.2]):
     return [amp, pos, sigma, sigma_high, sigma_low]
 
 
+def _multi_gauss(x, *params):
+    """Sum of normal distributions, params are (amp, pos, sigma) of each mode"""
+    y = _np.zeros(x.shape)
+    for i in range(0, len(params), 3):
+        y += math_functions.gauss(x, *params[i:i + 3])
+    return y
+
+
+def _multi_gauss_jac(x, *params):
+    """Jacobian of _multi_gauss with respect to params"""
+    jac = _np.zeros((x.shape[0], len(params)))
+    for i in range(0, len(params), 3):
+        amp, pos, sigma = params[i:i + 3]
+        exp = _np.exp(-(x - pos) ** 2 / (2. * sigma ** 2))
+        jac[:, i] = exp
+        jac[:, i + 1] = amp * exp * (x - pos) / sigma ** 2
+        jac[:, i + 2] = amp * exp * (x - pos) ** 2 / sigma ** 3
+    return jac
+
+
+def _fit_normal_rows(args):
+    """Fits the rows of data one after the other. If warm_start, the fit of each row starts from the result of the
+    previous row; p0 is used if that fails. Module level function so it can be used by a process pool."""
+    x, data, p0, warm_start = args
+    no_par = len(p0)
+    params = _np.full((data.shape[0], no_par), _np.nan)
+    covariance = _np.full((data.shape[0], no_par, no_par), _np.nan)
+    converged = _np.zeros(data.shape[0], dtype=bool)
+
+    last = None
+    for e, y in enumerate(data):
+        valid = ~ _np.isnan(y)
+        if valid.sum() < no_par:
+            last = None
+            continue
+        starts = [p0] if (last is None or not warm_start) else [last, p0]
+        for start in starts:
+            try:
+                with _warnings.catch_warnings():
+                    _warnings.simplefilter('ignore', optimization.OptimizeWarning)
+                    popt, pcov = optimization.curve_fit(_multi_gauss, x[valid], y[valid], p0=start,
+                                                        jac=_multi_gauss_jac)
+            except (ValueError, RuntimeError):
+                continue
+            if not _np.all(_np.isfinite(popt)):
+                continue
+            params[e] = popt
+            covariance[e] = pcov
+            converged[e] = _np.all(_np.isfinite(_np.diag(pcov)))
+            if converged[e]:
+                break
+        last = params[e] if converged[e] else None
+    return params, covariance, converged
+
+
+def fit_normal_dist_batch(x, data, log=True, p0=[10, 180, 0.2], no_of_modes=1, warm_start=True, processes=None):
+    """Fits one or more normal distributions to each row of data. Unlike calling fit_normal_dist for each row, the
+    fit of each row is started from the result of the previous row (warm start), which for time series of slowly
+    changing distributions reduces the number of iterations considerably. Rows can be distributed over a process
+    pool, in which case each process fits a contiguous block of rows.
+
+    Parameters
+    ----------
+    x: array
+        bin centers
+    data: 2D array
+        one distribution per row, nan values are ignored
+    log: bool
+        If True the normal distributions are fit in log10(x).
+    p0: list
+        Initial guess [amp, pos, sigma] for each mode (pos in units of x, sigma in units of the fit, i.e. log10 if
+        log). If only one set is given for several modes, the positions are spread around pos.
+    no_of_modes: int
+        number of modes (normal distributions), e.g. 1 to 3
+    warm_start: bool
+        Start the fit of each row from the result of the previous row.
+    processes: int, optional
+        Number of processes. If None, the fitting is done in the current process.
+
+    Returns
+    -------
+    dict with
+        'params': array (rows x modes x 3) with amp, pos, sigma (positive) of each mode, modes are sorted by
+            position
+        'covariance': array (rows x 3 * modes x 3 * modes) covariance of the parameters as fitted (pos in log10
+            if log), same order as params
+        'converged': bool array (rows), False if the fit failed or the covariance could not be estimated
+    """
+    x = _np.asarray(x, dtype=float)
+    data = _np.atleast_2d(_np.asarray(data, dtype=float))
+    p0 = list(p0)
+    if len(p0) == 3 and no_of_modes > 1:
+        spread = _np.logspace(-.5, .5, no_of_modes) if log else _np.linspace(.5, 1.5, no_of_modes)
+        p0 = [val for pos in spread for val in (p0[0], p0[1] * pos, p0[2])]
+    if len(p0) != 3 * no_of_modes:
+        raise ValueError('p0 has to have 3 or 3 * no_of_modes (%i) elements.' % (3 * no_of_modes))
+
+    if log:
+        x = _np.log10(x)
+        p0[1::3] = _np.log10(p0[1::3])
+
+    if processes and processes > 1 and data.shape[0] > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        chunks = _np.array_split(_np.arange(data.shape[0]), min(processes, data.shape[0]))
+        # forked workers can dead-lock if the parent already runs threads (e.g. the parallel numba Mie code)
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+            results = list(executor.map(_fit_normal_rows, [(x, data[chunk], p0, warm_start) for chunk in chunks]))
+        params, covariance, converged = [_np.concatenate(i) for i in zip(*results)]
+    else:
+        params, covariance, converged = _fit_normal_rows((x, data, p0, warm_start))
+
+    params = params.reshape(data.shape[0], no_of_modes, 3)
+    # the normal distribution is symmetric in sigma
+    params[:, :, 2] = _np.abs(params[:, :, 2])
+    if no_of_modes > 1:
+        # sort the modes by position
+        order = _np.argsort(_np.nan_to_num(params[:, :, 1], nan=_np.inf), axis=1)
+        params = _np.take_along_axis(params, order[:, :, _np.newaxis], axis=1)
+        par_order = (order[:, :, _np.newaxis] * 3 + _np.arange(3)).reshape(data.shape[0], -1)
+        covariance = _np.take_along_axis(covariance, par_order[:, :, _np.newaxis], axis=1)
+        covariance = _np.take_along_axis(covariance, par_order[:, _np.newaxis, :], axis=2)
+    if log:
+        params[:, :, 1] = 10 ** params[:, :, 1]
+
+    return {'params': params, 'covariance': covariance, 'converged': converged}
+
+
 def read_csv(fname, fixGaps=True):
     headerNo = 50
     rein = open(fname, 'r')
@@ -129,6 +366,194 @@ def read_hdf(f_name, keep_open = False, populate_namespace = False):
         hdf.close()
         return out
 
+def save_netCDF(dist, fname, chunk_size=1440, complevel=4, append=False):
+    """Saves a SizeDist_TS instance to a netCDF4 (HDF5) archive. The data is stored in chunks along the time axis
+    (compressed with zlib), so load_netCDF can read a time range without loading the entire file. Bins,
+    distribution type, data period, and the index of refraction are stored as metadata, the housekeeping (numeric
+    columns) in the group 'housekeeping'.
+
+    Parameters
+    ----------
+    dist: SizeDist_TS instance
+    fname: str
+    chunk_size: int
+        Number of time stamps per chunk, e.g. 1440 is one day of 1-minute data. Only used when the file is created.
+    complevel: int
+        zlib compression level (1-9)
+    append: bool
+        If True and fname exists, the data is appended to the archive. Bins and distribution type have to be the
+        same and the data has to start after the last time stamp in the archive.
+    """
+    data = dist.data
+    if not data.index.is_monotonic_increasing:
+        data = data.sort_index()
+    times = data.index.values.astype('datetime64[ns]').astype(_np.int64)
+    n = dist.index_of_refraction
+    if isinstance(n, pd.DataFrame):
+        n = n.reindex(data.index).iloc[:, 0].values.astype(complex)
+    hk = dist.housekeeping
+    if hk is not None:
+        hk = hk.data.reindex(data.index).select_dtypes(include=[_np.number])
+
+    if append and _os.path.isfile(fname):
+        ni = _Dataset(fname, 'a')
+        try:
+            if not _np.array_equal(ni.variables['bins'][:], dist.bins):
+                raise ValueError('The bins of the distribution differ from those in the archive.')
+            if ni.distributionType != dist.distributionType:
+                raise ValueError('The distribution type (%s) differs from that in the archive (%s).' % (
+                                 dist.distributionType, ni.distributionType))
+            time_var = ni.variables['time']
+            start = time_var.shape[0]
+            if start and times.shape[0] and times[0] <= time_var[start - 1]:
+                raise ValueError('Appended data has to start after the last time stamp in the archive.')
+            _write_netCDF_rows(ni, start, times, data.values, n, hk)
+        finally:
+            ni.close()
+        return
+
+    ni = _Dataset(fname, 'w', format='NETCDF4')
+    try:
+        ni.createDimension('time', None)
+        ni.createDimension('bincenters', dist.bincenters.shape[0])
+        ni.createDimension('bins', dist.bins.shape[0])
+
+        bins_var = ni.createVariable('bins', _np.float64, ('bins',))
+        bins_var[:] = dist.bins
+        bins_var.units = 'nm'
+
+        time_var = ni.createVariable('time', _np.int64, ('time',), chunksizes=(chunk_size,))
+        time_var.units = 'nanoseconds since 1970-01-01 00:00:00'
+
+        ni.createVariable('data', _np.float64, ('time', 'bincenters'), zlib=True, complevel=complevel,
+                          chunksizes=(chunk_size, dist.bincenters.shape[0]))
+
+        ni.objectType = type(dist).__name__
+        ni.distributionType = dist.distributionType
+        ni._data_period = _timeseries.none2nan(getattr(dist, '_data_period', None))
+
+        if isinstance(n, _np.ndarray):
+            ni.index_of_refraction = 'variable'
+            for part in ('real', 'imag'):
+                ni.createVariable('index_of_refraction_' + part, _np.float64, ('time',), zlib=True,
+                                  complevel=complevel, chunksizes=(chunk_size,))
+        elif n is not None:
+            ni.index_of_refraction = 'constant'
+            ni.index_of_refraction_real = float(_np.real(n))
+            ni.index_of_refraction_imag = float(_np.imag(n))
+
+        if hk is not None:
+            grp = ni.createGroup('housekeeping')
+            # column names are not necessarily valid variable names, they are stored as attribute
+            for e, col in enumerate(hk.columns):
+                var = grp.createVariable('column_%i' % e, _np.float64, ('time',), zlib=True, complevel=complevel,
+                                         chunksizes=(chunk_size,))
+                var.name_of_column = str(col)
+
+        _write_netCDF_rows(ni, 0, times, data.values, n, hk)
+    finally:
+        ni.close()
+
+
+def _write_netCDF_rows(ni, start, times, values, n, hk):
+    """Writes rows to an archive created by save_netCDF, starting at row start"""
+    end = start + times.shape[0]
+    ni.variables['time'][start:end] = times
+    ni.variables['data'][start:end] = values
+    if 'index_of_refraction_real' in ni.variables:
+        n = _np.broadcast_to(_np.asarray(n if n is not None else _np.nan, dtype=complex), times.shape)
+        ni.variables['index_of_refraction_real'][start:end] = n.real
+        ni.variables['index_of_refraction_imag'][start:end] = n.imag
+    if 'housekeeping' in ni.groups:
+        grp = ni.groups['housekeeping']
+        hk_columns = [] if hk is None else list(hk.columns.astype(str))
+        for var in grp.variables.values():
+            if var.name_of_column in hk_columns:
+                col_values = hk.iloc[:, hk_columns.index(var.name_of_column)].values
+            else:
+                col_values = _np.full(times.shape, _np.nan)
+            var[start:end] = col_values
+
+
+def _searchsorted_variable(var, value, side='left', low=0):
+    """Like numpy.searchsorted for the sorted 1D netCDF variable var, but only single elements are read (binary
+    search), so the variable is not loaded entirely."""
+    high = var.shape[0]
+    while low < high:
+        mid = (low + high) // 2
+        element = var[mid]
+        if element < value or (side == 'right' and element == value):
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def load_netCDF(fname, start=None, end=None, memmap_directory=None):
+    """Loads a SizeDist_TS archive written by save_netCDF. Only the chunks within the requested time range are read.
+
+    Parameters
+    ----------
+    fname: str
+    start, end: str, datetime, or pandas.Timestamp, optional
+        First and last time stamp to be loaded (inclusive). If None, the archive is read from the beginning or to
+        the end, respectively.
+    memmap_directory: str, optional
+        If given, the data is read chunk by chunk into a memory-mapped file in this directory instead of into
+        memory (see SizeDist.to_memmap).
+
+    Returns
+    -------
+    SizeDist_TS instance
+    """
+    ni = _Dataset(fname, 'r')
+    try:
+        ni.set_auto_mask(False)
+        time_var = ni.variables['time']
+        first = 0 if start is None else _searchsorted_variable(time_var, pd.Timestamp(start).value, side='left')
+        last = time_var.shape[0]
+        if end is not None:
+            last = _searchsorted_variable(time_var, pd.Timestamp(end).value, side='right', low=first)
+        index = pd.DatetimeIndex(time_var[first:last].astype('datetime64[ns]'))
+
+        bins = ni.variables['bins'][:]
+        data_var = ni.variables['data']
+        if memmap_directory is None:
+            values = data_var[first:last]
+        else:
+            values = _open_memmap(memmap_directory, (last - first, data_var.shape[1]))
+            block_size = data_var.chunking()[0] if data_var.chunking() != 'contiguous' else 10000
+            for row in range(first, last, block_size):
+                values[row - first: row - first + block_size] = data_var[row: min(row + block_size, last)]
+        data = pd.DataFrame(values, index=index)
+        dist = SizeDist_TS(data, bins, ni.distributionType, fixGaps=False)
+
+        data_period = ni._data_period
+        dist._data_period = None if _np.isnan(data_period) else float(data_period)
+
+        if 'index_of_refraction' in ni.ncattrs():
+            if ni.index_of_refraction == 'variable':
+                n = (ni.variables['index_of_refraction_real'][first:last] +
+                     1j * ni.variables['index_of_refraction_imag'][first:last])
+                dist.index_of_refraction = pd.DataFrame(n, index=index, columns=['index_of_refraction'])
+            else:
+                n = complex(ni.index_of_refraction_real, ni.index_of_refraction_imag)
+                dist.index_of_refraction = n.real if n.imag == 0 else n
+
+        if 'housekeeping' in ni.groups:
+            grp = ni.groups['housekeeping']
+            grp.set_auto_mask(False)
+            columns = [var.name_of_column for var in grp.variables.values()]
+            hk = pd.DataFrame({var.name_of_column: var[first:last] for var in grp.variables.values()},
+                              index=index, columns=columns)
+            hk = _timeseries.TimeSeries(hk)
+            hk._data_period = dist._data_period
+            dist._SizeDist__housekeeping = hk
+    finally:
+        ni.close()
+    return dist
+
+
 def get_label(distType):
     """ Return the appropriate label for a particular distribution type
     """
@@ -228,6 +653,98 @@ class SizeDist(object):
         elif type(value).__name__ not in ['int', 'float']:
             raise ValueError('%s is not an excepted type'%(type(value).__name__))
         self.__physical_property_density = value
+        self._data_changed()
+
+    @property
+    def data(self):
+        """Moment conversions (convert2*), copies, and slices (zoom_time, zoom_altitude) share the data with the
+        instance they were created from until it is accessed through this attribute (copy-on-write). A DataFrame
+        which has been handed out (by this attribute or its setter) can be modified in place at any time, it is
+        therefore never shared but copied right away."""
+        data = self._peek_data()
+        if self._data_shared:
+            self._data = data = _copy_frame(data)
+            self._data_shared = False
+        self._data_exposed = True
+        return data
+
+    @data.setter
+    def data(self, df):
+        self._data_view = None
+        self._data = df
+        self._data_shared = False
+        # the caller keeps a reference to df
+        self._data_exposed = True
+        self._data_changed()
+
+    def _peek_data(self):
+        """Returns the data without copying it or marking it as handed out (see data), lazy views are
+        materialized. Only for reading, the returned DataFrame must not be modified."""
+        if self._data_view is not None:
+            source, factor = self._data_view
+            self._data_view = None
+            self._data = _scale_frame(source, factor)
+        return self._data
+
+    def _get_data_source(self):
+        """(DataFrame, factor), the data is the DataFrame times factor (see _set_data_view)"""
+        if self._data_view is not None:
+            return self._data_view
+        return self._data, 1.
+
+    def _data_changed(self):
+        """Invalidates the cached integrated moments, which are tied to the data version"""
+        self._data_version = getattr(self, '_data_version', 0) + 1
+
+    def _share_data(self, dist, data, factor):
+        """Sets the data to a lazy view of data (the data of dist or a part of it) scaled by factor. dist is
+        marked as shared, so its data is copied before it is handed out (see data). If the data of dist has
+        already been handed out, the scaled data is computed right away."""
+        if dist._data_exposed:
+            self._data_view = None
+            self._data = _scale_frame(data, factor)
+        else:
+            dist._data_shared = True
+            self._data_view = (data, factor)
+            self._data = None
+        self._data_shared = False
+        self._data_exposed = False
+
+    def _set_data_view(self, dist, factor):
+        """Sets the data to a lazy view of the data of dist scaled by factor (one value per bin). The product is
+        only computed when the data is read for the first time. Used by the moment conversions."""
+        # for a chained conversion the factors are combined instead of materializing the intermediate data
+        source, source_factor = dist._get_data_source()
+        self._share_data(dist, source, source_factor * factor)
+        self._update()
+
+    def _copy_without_data(self, exclude=()):
+        """Deep copy of the instance without the data and the IndexSlicer. The attributes in exclude (names as in
+        __dict__) are not copied either, they are None in the copy."""
+        dist = self.__class__.__new__(self.__class__)
+        memo = {id(self): dist}
+        exclude = ('_data_view', '_data', '_index_slicer') + tuple(exclude)
+        for key, value in self.__dict__.items():
+            dist.__dict__[key] = None if key in exclude else deepcopy(value, memo)
+        return dist
+
+    def _get_index_slicer(self):
+        """IndexSlicer (binary search) of the index of the data, cached as long as the index does not change"""
+        source = self._get_data_source()[0]
+        self._index_slicer = _panda_tools.get_index_slicer(source.index, getattr(self, '_index_slicer', None))
+        return self._index_slicer
+
+    def _zoom_index(self, start=None, end=None, exclude=()):
+        """Returns a copy which only contains the data between the index values start and end (both included).
+        The data of the copy is a lazy view (see _share_data) on that part of the data, it is only copied when
+        it is read for the first time. For exclude see _copy_without_data."""
+        source, factor = self._get_data_source()
+        data, index_slicer = self._get_index_slicer().slice(source, start=start, end=end)
+        dist = self._copy_without_data(exclude=exclude)
+        dist._share_data(self, data, factor)
+        dist._index_slicer = index_slicer
+        dist._update()
+        return dist
 
     @property
     def housekeeping(self):
@@ -236,6 +753,7 @@ class SizeDist(object):
     @housekeeping.setter
     def housekeeping(self, value):
         self.__housekeeping = value.align_to(self)
+        self._data_changed()
 
     @property
     def bins(self):
@@ -253,18 +771,24 @@ class SizeDist(object):
 
 
         self.__bins = array
-        self.__bincenters = (array[1:] + array[:-1]) / 2.
-        self.__binwidth = (array[1:] - array[:-1])
+        # centers, widths, and conversion factors are shared by all distributions with the same bins
+        self.__bin_geometry = sizedist_moment_conversion.get_bin_geometry(array)
+        self._data_changed()
         self.data.columns = self.bincenters
         self.data.columns.name = 'bincenters_(nm)'
 
     @property
     def bincenters(self):
-        return self.__bincenters
+        return self.__bin_geometry.bincenters
 
     @property
     def binwidth(self):
-        return self.__binwidth
+        return self.__bin_geometry.binwidth
+
+    @property
+    def bin_geometry(self):
+        """BinGeometry instance (see sizedist_moment_conversion), changes only when the bins are set"""
+        return self.__bin_geometry
 
     @property
     def index_of_refraction(self):
@@ -445,22 +969,13 @@ sizedistribution.align to align the index of the new array."""
                 txt = 'Make sure type of growthfactor is int,float,TimeSeries, Series or ndarray. It currently is: %s.'%(type(growth_factor).__name__)
                 raise TypeError(txt)
 
-            test = dist_g._hygro_growht_shift_data(dist_g.data.values[0], dist_g.bins, float(_np.nanmax(growth_factor.data)), ignore_data_nan = True)
-            bin_num = test['data'].shape[0]
-            data_new = _np.zeros((dist_g.data.shape[0],bin_num))
-            #todo: it would be nicer to have _hygro_growht_shift_data take the TimeSeries directly
             gf = growth_factor.data.values.transpose()[0]
-            for e,i in enumerate(dist_g.data.values):
-                out = dist_g._hygro_growht_shift_data(i, dist_g.bins, gf[e])
-                dt = out['data']
-                diff = bin_num - dt.shape[0]
-
-                dt = _np.append(dt, _np.zeros(diff))
-                data_new[e] = dt
-            df = pd.DataFrame(data_new)
+            out = dist_g._hygro_growht_shift_data_vectorized(dist_g.data.values, dist_g.bins, gf,
+                                                             directory=_get_memmap_directory(dist_g.data.values))
+            df = pd.DataFrame(out['data'])
             df.index = dist_g.data.index
             dp = dist_g._data_period
-            dist_g = SizeDist(df, test['bins'], dist_g.distributionType)
+            dist_g = SizeDist(df, out['bins'], dist_g.distributionType)
             dist_g._data_period = dp
 
         else:
@@ -498,13 +1013,22 @@ sizedistribution.align to align the index of the new array."""
     #     return out
 
     # todo: this function appears multiple times, can easily be inherited
-    def calculate_optical_properties(self, wavelength, n = None, AOD = False, noOfAngles=100):
+    def calculate_optical_properties(self, wavelength, n = None, AOD = False, noOfAngles=100, n_interpolation_tolerance = None,
+                                     angles = None, core_n = None, core_volume_fraction = None,
+                                     core_fraction_resolution = 0.01):
+        """See optical_properties.size_dist2optical_properties for a description of the parameters. If core_n and
+        core_volume_fraction are given the particles are treated as coated spheres with n being the index of
+        refraction of the shell."""
         if not _np.any(n):
             n = self.index_of_refraction
         if not _np.any(n):
             txt = 'Refractive index is not specified. Either set self.index_of_refraction or set optional parameter n.'
             raise ValueError(txt)
-        out = optical_properties.size_dist2optical_properties(self, wavelength, n, aod = AOD, noOfAngles=noOfAngles)
+        out = optical_properties.size_dist2optical_properties(self, wavelength, n, aod = AOD, noOfAngles=noOfAngles,
+                                                              n_interpolation_tolerance = n_interpolation_tolerance,
+                                                              angles = angles, core_n = core_n,
+                                                              core_volume_fraction = core_volume_fraction,
+                                                              core_fraction_resolution = core_fraction_resolution)
         opt_properties = optical_properties.OpticalProperties(out, parent = self)
         # opt_properties.wavelength = wavelength #should be set in OpticalProperty class
         # opt_properties.index_of_refractio = n
@@ -539,15 +1063,31 @@ sizedistribution.align to align the index of the new array."""
             self.data = self.data.sort_index()
         return
 
-    def fit_normal(self, log=True, p0=[10, 180, 0.2]):
-        """ Fits a single normal distribution to each line in the data frame.
+    def fit_normal(self, log=True, p0=[10, 180, 0.2], no_of_modes=1, warm_start=True, processes=None):
+        """ Fits a single (or multiple) normal distribution(s) to each line in the data frame.
+
+        Parameters
+        ----------
+        log: bool
+            fit in log10(Dp)
+        p0: list
+            initial guess [amp, pos, sigma] (for each mode), see fit_normal_dist_batch
+        no_of_modes: int
+            number of normal distributions fitted to each line
+        warm_start: bool
+            start the fit of each line from the result of the previous line
+        processes: int, optional
+            number of processes used for the fitting
 
         Returns
         -------
-        pandas DataFrame instance (also added to namespace as data_fit_normal)
+        pandas DataFrame instance (also added to namespace as data_fit_normal). For more than one mode the column
+        names get the mode number appended (e.g. Pos_1, Pos_2, sorted by position). The parameters, their
+        covariance, and whether the fit converged are added to the namespace as data_fit_normal_result (see
+        fit_normal_dist_batch).
 
         """
-        sd = self.copy()
+        sd = self
 
         if sd.distributionType != 'dNdlogDp':
             if sd.distributionType == 'calibration':
@@ -557,31 +1097,27 @@ sizedistribution.align to align the index of the new array."""
                     "Size distribution is not in 'dNdlogDp'. I temporarily converted the distribution to conduct the fitting. If that is not what you want, change the code!")
                 sd = sd.convert2dNdlogDp()
 
-        n_lines = sd.data.shape[0]
-        amp = _np.zeros(n_lines)
-        pos = _np.zeros(n_lines)
-        sigma = _np.zeros(n_lines)
-        sigma_high = _np.zeros(n_lines)
-        sigma_low = _np.zeros(n_lines)
-        for e, lay in enumerate(sd.data.values):
-            try:
-                fit_res = fit_normal_dist(sd.bincenters, lay, log=log, p0=p0)
-            except (ValueError, RuntimeError):
-                fit_res = [_np.nan, _np.nan, _np.nan, _np.nan, _np.nan]
-            amp[e] = fit_res[0]
-            pos[e] = fit_res[1]
-            sigma[e] = fit_res[2]
-            sigma_high[e] = fit_res[3]
-            sigma_low[e] = fit_res[4]
+        result = fit_normal_dist_batch(sd.bincenters, sd.data.values, log=log, p0=p0, no_of_modes=no_of_modes,
+                                       warm_start=warm_start, processes=processes)
 
         df = pd.DataFrame()
-        df['Amp'] = pd.Series(amp)
-        df['Pos'] = pd.Series(pos)
-        df['Sigma'] = pd.Series(sigma)
-        df['Sigma_high'] = pd.Series(sigma_high)
-        df['Sigma_low'] = pd.Series(sigma_low)
+        for mode in range(no_of_modes):
+            amp, pos, sigma = result['params'][:, mode].transpose()
+            if log:
+                sigma_high = 10 ** (_np.log10(pos) + sigma)
+                sigma_low = 10 ** (_np.log10(pos) - sigma)
+            else:
+                sigma_high = pos + sigma
+                sigma_low = pos - sigma
+            suffix = '' if no_of_modes == 1 else '_%i' % (mode + 1)
+            df['Amp' + suffix] = pd.Series(amp)
+            df['Pos' + suffix] = pd.Series(pos)
+            df['Sigma' + suffix] = pd.Series(sigma)
+            df['Sigma_high' + suffix] = pd.Series(sigma_high)
+            df['Sigma_low' + suffix] = pd.Series(sigma_low)
         # df.index = self.layercenters
         self.data_fit_normal = df
+        self.data_fit_normal_result = result
         return self.data_fit_normal
 
 
@@ -669,7 +1205,30 @@ sizedistribution.align to align the index of the new array."""
         return self._convert2otherDistribution('numberConcentration')
 
     def copy(self):
-        return deepcopy(self)
+        """Returns a copy of the instance. The data is shared until it is accessed (see data)."""
+        dist = self._copy_without_data()
+        source, factor = self._get_data_source()
+        dist._share_data(self, source, factor)
+        return dist
+
+    def to_memmap(self, directory=None):
+        """Moves the data into a memory-mapped file (numpy.memmap) for out-of-core processing of records which
+        do not fit into memory. Moment conversions (convert2*), copy, apply_growth (how = 'shift_data'), and the
+        integrated moments (e.g. particle_number_concentration) of a memory-mapped distribution process the data
+        in blocks of time stamps and write their results into new memory-mapped files in the same directory.
+        Other operations (e.g. plotting or arithmetic on self.data) still load the data into memory. The files are
+        removed when they are no longer referenced; use save_netCDF to store the data permanently.
+
+        Parameters
+        ----------
+        directory: str, optional
+            Directory in which the files are created. If None, the default directory for temporary files is used.
+        """
+        if directory is None:
+            directory = _tempfile.gettempdir()
+        data = self.data
+        values = _scale_blockwise(data.values, 1., _open_memmap(directory, data.shape))
+        self.data = pd.DataFrame(values, index=data.index, columns=data.columns)
 
     def save_csv(self, fname, header=True):
         if header:
@@ -740,15 +1299,113 @@ sizedistribution.align to align the index of the new array."""
         self._update()
         return sd
 
+    def rebin(self, new_bins, conserve='number'):
+        """Puts the size distribution on a new set of bins (e.g. to merge distributions of different instruments).
+        The distribution within each bin is assumed to be constant in log(Dp) and particles are distributed to the
+        new bins according to the overlap of old and new bins. The overlap matrix is cached for each combination of
+        bins and applied to all rows at once.
+
+        Parameters
+        ----------
+        new_bins: array-like
+            bin edges in nm, have to be monotonically increasing.
+        conserve: str ['number', 'volume']
+            Quantity which is conserved. For 'number' ('volume') the number (volume) concentration in each bin is
+            distributed to the new bins.
+
+        Returns
+        -------
+        Copy of the size distribution in the original distribution type. New bins outside of the range of the old
+        bins are nan, new bins partially outside the range only contain the particles from the overlapping part.
+        """
+        new_bins = _np.asarray(new_bins, dtype=float)
+        if new_bins.ndim != 1 or new_bins.shape[0] < 2 or _np.any(_np.diff(new_bins) <= 0):
+            raise ValueError('new_bins has to be a monotonically increasing array with at least two elements.')
+
+        if conserve == 'number':
+            moment = 'dNdDp'
+        elif conserve == 'volume':
+            moment = 'dVdDp'
+        else:
+            raise ValueError('conserve has to be either "number" or "volume" (is %s).' % conserve)
+
+        dist = self._convert2otherDistribution(moment)
+        matrix = _get_rebin_matrix(dist.bins, new_bins)
+
+        # the matrix acts on the concentration per bin, so convert from and to dXdDp
+        data = matrix.transpose().dot((dist.data.values * dist.binwidth).transpose()).transpose() / _np.diff(new_bins)
+        no_overlap = _np.asarray(matrix.sum(axis=0)).ravel() == 0
+        data[:, no_overlap] = _np.nan
+
+        dist.data = pd.DataFrame(data, index=dist.data.index)
+        dist.bins = new_bins
+        dist._update()
+        return dist._convert2otherDistribution(self.distributionType)
+
     def _convert2otherDistribution(self, distType, verbose=False):
         return sizedist_moment_conversion.convert(self, distType, verbose = verbose)
 
+    def integrate_moments(self, moments=('number', 'surface', 'volume')):
+        """Integrated parameters (moments) of the size distribution for each row of data, computed in a single pass:
+        the number concentration matrix is multiplied with a (bins x moments) weight matrix. Results are cached
+        until the data changes (see _data_changed).
+
+        Parameters
+        ----------
+        moments: list of str
+            Any of 'number', 'surface', 'volume', 'mass' (requires physical_property_density),
+            'number_mixing_ratio', and 'mass_mixing_ratio' (both require housekeeping with temperature and
+            pressure). Units are the same as for the corresponding particle_*_concentration and
+            particle_*_mixing_ratio properties.
+
+        Returns
+        -------
+        pandas.DataFrame with one column per moment
+        """
+        if isinstance(moments, str):
+            moments = [moments]
+        options = ('number', 'surface', 'volume', 'mass', 'number_mixing_ratio', 'mass_mixing_ratio')
+        for moment in moments:
+            if moment not in options:
+                raise ValueError('%s is not a valid moment. Choose from %s.' % (moment, options))
+
+        cache = getattr(self, '_moments_cache', None)
+        if cache is None or cache['version'] != self._data_version:
+            cache = {'version': self._data_version}
+            self._moments_cache = cache
+
+        if 'number' not in cache:
+            weights = self.bin_geometry.moment_weights
+            # blocks of rows, so no full size converted data is created (e.g. for memory-mapped data)
+            factor = sizedist_moment_conversion.get_conversion_factor(self, 'numberConcentration')
+            values = self._peek_data().values
+            integrated = _np.zeros((values.shape[0], weights.shape[1]))
+            block_size = 10000
+            for start in range(0, values.shape[0], block_size):
+                block = _np.nan_to_num(values[start: start + block_size] * factor)
+                integrated[start: start + block_size] = block.dot(weights)
+            index = self._peek_data().index
+            cache['number'] = pd.Series(integrated[:, 0], index=index)  # #/cm^3
+            cache['surface'] = pd.Series(integrated[:, 1] * 1e-15, index=index)
+            cache['volume'] = pd.Series(integrated[:, 2] * 1e-18, index=index)
+
+        for moment in moments:
+            if moment in cache:
+                continue
+            if moment == 'mass':
+                cache['mass'] = self._get_mass_concentration()
+            elif moment == 'number_mixing_ratio':
+                cache['number_mixing_ratio'] = self._get_number_mixing_ratio()
+            elif moment == 'mass_mixing_ratio':
+                cache['mass_mixing_ratio'] = self._get_mass_mixing_ratio()
+
+        out = pd.DataFrame(_np.array([_np.asarray(cache[moment]) for moment in moments]).transpose(),
+                           index=self._peek_data().index, columns=list(moments))
+        return out
+
     def _get_mass_concentration(self):
         """'Mass concentration ($\mu g/m^{3}$)'"""
-        dist = self.convert2dVdDp()
-        volume_conc = dist.data * dist.binwidth
-
-        vlc_all = volume_conc.sum(axis = 1) # nm^3/cm^3
+        vlc_all = self.integrate_moments(['volume'])['volume'].rename(None) * 1e18 # nm^3/cm^3
 
         if not self.physical_property_density:
             raise ValueError('Please set the physical_property_density variable in g/cm^3')
@@ -809,16 +1466,14 @@ sizedistribution.align to align the index of the new array."""
         -------
         int: if data has only one line
         pandas.DataFrame: else """
-        sd = self.convert2numberconcentration()
-
-        particles = sd.data.sum(axis = 1)
+        particles = self.integrate_moments(['number'])['number'].rename(None)
 
         # The code below is old and lead to problems when df contained NaNs
         # particles = _np.zeros(sd.data.shape[0])
         # for e, line in enumerate(sd.data.values):
         #     particles[e] = line.sum()
-        if sd.data.shape[0] == 1:
-            return particles[0]
+        if particles.shape[0] == 1:
+            return particles.iloc[0]
         else:
             df = pd.DataFrame(particles,
                               # index=sd.data.index,
@@ -832,14 +1487,9 @@ sizedistribution.align to align the index of the new array."""
     def _get_surface_concentration(self):
         """ volume of particles per volume air"""
 
-        sd = self.convert2dSdDp()
-
-        surface_conc = sd.data * sd.binwidth
-
-        sfc_all = surface_conc.sum(axis = 1) # nm^2/cm^3
-        sfc_all = sfc_all * 1e-6 # um^2/cm^3
+        sfc_all = self.integrate_moments(['surface'])['surface'].rename(None)
         label = 'Surface concentration $\mu m^2 / cm^{-3}$'
-        sfc_df = pd.DataFrame(sfc_all * 1e-9, columns = [label])
+        sfc_df = pd.DataFrame(sfc_all, columns = [label])
         if type(self).__name__ == 'SizeDist':
             return sfc_df
         elif type(self).__name__ == 'SizeDist_TS':
@@ -855,13 +1505,8 @@ sizedistribution.align to align the index of the new array."""
     def _get_volume_concentration(self):
         """ volume of particles per volume air"""
 
-        sd = self.convert2dVdDp()
-
-        volume_conc = sd.data * sd.binwidth
-
-        vlc_all = volume_conc.sum(axis = 1) # nm^3/cm^3
-        vlc_all = vlc_all * 1e-9 # um^3/cm^3
-        vlc_df = pd.DataFrame(vlc_all * 1e-9, columns = ['volume concentration $\mu m^3 / cm^{-3}$'])
+        vlc_all = self.integrate_moments(['volume'])['volume'].rename(None)
+        vlc_df = pd.DataFrame(vlc_all, columns = ['volume concentration $\mu m^3 / cm^{-3}$'])
         if type(self).__name__ == 'SizeDist':
             return  vlc_df
         elif type(self).__name__ == 'SizeDist_TS':
@@ -966,8 +1611,112 @@ sizedistribution.align to align the index of the new array."""
         return out
 
 
+    def _hygro_growht_shift_data_vectorized(self, data, bins, gf, chunk_size=10000, directory=None):
+        """Vectorized version of _hygro_growht_shift_data for a (time x bins) matrix and one growth factor per
+        row. Particles are assumed to be evenly distributed (in diameter) within each bin, as in
+        _hygro_growht_shift_data. The grown bins (bins * gf) of each row are remapped onto a common set of bins,
+        which are the original bins extended by enough bins (same logarithmic width as the last bin) to hold the
+        largest growth factor. For all rows at once, the cumulative distribution over the grown bins is linearly
+        interpolated at the edges of the common bins and differentiated again. This is equivalent to applying the
+        (banded) matrix of fractional overlaps between grown and common bins to each row.
+
+        Parameters
+        ----------
+        data: 2D array
+            number concentrations, one row per time stamp
+        bins: 1D array
+            bin edges
+        gf: 1D array
+            growth factor for each row. Values smaller than 1 are set to 1, rows with nan growth factor are nan.
+        chunk_size: int, optional
+            number of rows processed at once, this limits the memory usage
+        directory: str, optional
+            If given, the result is written to a memory-mapped file in this directory (see to_memmap)
+
+        Returns
+        -------
+        dict with 'bins', 'data', and 'num_extr_bins'
+        """
+        # no copy of data is made, so it can be a memmap
+        data = _np.atleast_2d(_np.asarray(data, dtype=float))
+        bins = _np.asarray(bins, dtype=float)
+        gf = _np.asarray(gf, dtype=float).copy()
+        if gf.shape[0] != data.shape[0]:
+            raise ValueError('Number of growth factors (%i) does not match number of rows (%i).' % (gf.shape[0],
+                                                                                                      data.shape[0]))
+
+        if _np.any(gf < 1):
+            txt = 'Growth facotor smaller than 1 (min is %s). Values adjusted to 1!!' % _np.nanmin(gf)
+            _warnings.warn(txt)
+            gf[gf < 1] = 1.
+
+        gf_nan = _np.isnan(gf)
+        data_all_nan = _np.zeros(data.shape[0], dtype=bool)
+        for start in range(0, data.shape[0], chunk_size):
+            data_all_nan[start: start + chunk_size] = _np.isnan(data[start: start + chunk_size]).all(axis=1)
+        # rows which are not shifted: no growth, gf is nan, or all data is nan
+        no_shift = (gf == 1) | gf_nan | data_all_nan
+        gf[no_shift] = 1.
+
+        ######### Ad bins to shift data into
+        gf_max = gf.max() if gf.shape[0] else 1.
+        if gf_max > 1:
+            step_width = _np.log10(bins[-1]) - _np.log10(bins[-2])
+            no_extra_bins = max(int((bins * gf_max >= bins[-1]).sum()),
+                                int(_np.ceil(_np.log10(gf_max) / step_width)))
+            newbins = 10 ** (_np.log10(bins[-1]) + (_np.arange(no_extra_bins) + 1) * step_width)
+            bins_new = _np.append(bins, newbins)
+        else:
+            no_extra_bins = 0
+            bins_new = bins.copy()
+
+        shape_new = (data.shape[0], bins_new.shape[0] - 1)
+        if directory is None:
+            data_new = _np.zeros(shape_new)
+        else:
+            data_new = _open_memmap(directory, shape_new)
+
+        binwidth = bins[1:] - bins[:-1]
+        for start in range(0, data.shape[0], chunk_size):
+            block = _np.array(data[start: start + chunk_size])
+            block[gf_nan[start: start + chunk_size]] = _np.nan
+            block_no_shift = no_shift[start: start + chunk_size]
+            block_new = _np.zeros((block.shape[0], shape_new[1]))
+            block_new[block_no_shift, :data.shape[1]] = block[block_no_shift]
+
+            rows = _np.where(~ block_no_shift)[0]
+            values = block[rows]
+            isnan = _np.isnan(values)
+            values[isnan] = 0
+            # cumulative number of particles and of nan-bins at the (grown) bin edges
+            cum = _np.zeros((rows.shape[0], bins.shape[0]))
+            cum[:, 1:] = values.cumsum(axis=1)
+            cum_nan = _np.zeros((rows.shape[0], bins.shape[0]))
+            cum_nan[:, 1:] = isnan.cumsum(axis=1)
+
+            # position of the new bin edges in the grown bins, scaling by gf is equivalent to shrinking the new bins
+            edges = bins_new[_np.newaxis, :] / gf[start + rows, _np.newaxis]
+            idx = _np.clip(_np.searchsorted(bins, edges) - 1, 0, bins.shape[0] - 2)
+            frac = _np.clip((edges - bins[idx]) / binwidth[idx], 0, 1)
+            row_idx = _np.arange(rows.shape[0])[:, _np.newaxis]
+            cum_edges = cum[row_idx, idx] + frac * values[row_idx, idx]
+            cum_nan_edges = cum_nan[row_idx, idx] + frac * isnan[row_idx, idx]
+
+            values_new = _np.diff(cum_edges, axis=1)
+            values_new[_np.diff(cum_nan_edges, axis=1) > 0] = _np.nan
+            block_new[rows] = values_new
+            data_new[start: start + chunk_size] = block_new
+
+        out = {}
+        out['bins'] = bins_new
+        out['data'] = data_new
+        out['num_extr_bins'] = no_extra_bins
+        return out
+
+
 
     def _update(self):
+        self._data_changed()
         self._uptodate_particle_number_concentration = False
         self._uptodate_particle_mass_concentration = False
         self._uptodate_particle_surface_concentration = False
@@ -1006,15 +1755,18 @@ class SizeDist_TS(SizeDist):
             self.data.index.name = 'Time'
 
     close_gaps = _timeseries.close_gaps
+    save_netCDF = save_netCDF
 
     def _update(self):
+        self._data_changed()
         self._uptodate_particle_number_concentration = False
         self._uptodate_particle_mass_concentration = False
         self._uptodate_particle_mass_mixing_ratio = False
         self._uptodate_particle_number_mixing_ratio = False
 
-    def fit_normal(self, log=True, p0=[10, 180, 0.2]):
-        """ Fits a single normal distribution to each line in the data frame.
+    def fit_normal(self, log=True, p0=[10, 180, 0.2], no_of_modes=1, warm_start=True, processes=None):
+        """ Fits a single (or multiple) normal distribution(s) to each line in the data frame. See
+        SizeDist.fit_normal for the parameters.
 
         Returns
         -------
@@ -1022,7 +1774,8 @@ class SizeDist_TS(SizeDist):
 
         """
 
-        super(SizeDist_TS, self).fit_normal(log=log, p0=p0)
+        super(SizeDist_TS, self).fit_normal(log=log, p0=p0, no_of_modes=no_of_modes, warm_start=warm_start,
+                                            processes=processes)
         self.data_fit_normal.index = self.data.index
         return self.data_fit_normal
 
@@ -1066,7 +1819,33 @@ class SizeDist_TS(SizeDist):
         # out['size_distribution'] = sd_LS
         return sd_TS
 
-    def calculate_optical_properties(self, wavelength, n = None, noOfAngles=100):
+    def calculate_optical_properties(self, wavelength, n = None, noOfAngles=100, n_interpolation_tolerance = None,
+                                     angles = None, core_n = None, core_volume_fraction = None,
+                                     core_fraction_resolution = 0.01):
+        """
+        Parameters
+        ----------
+        wavelength: float
+            in nm
+        n: float, complex, or DataFrame, optional
+            Index of refraction. If None self.index_of_refraction is used.
+        noOfAngles: int, optional
+        n_interpolation_tolerance: float, optional
+            If the index of refraction changes with time, the Mie calculations are performed on a grid of refractive
+            indices and interpolated for each timestamp with this relative tolerance. See
+            optical_properties.size_dist2optical_properties.
+        angles: array-like, optional
+            Scattering angles (radians, between 0 and pi) at which the angular scattering function is calculated.
+            If given, noOfAngles is ignored.
+        core_n: complex or DataFrame, optional
+            Index of refraction of the particle core. If given, the particles are treated as coated spheres and n is
+            the index of refraction of the shell.
+        core_volume_fraction: float, Series, DataFrame, or TimeSeries, optional
+            Fraction of the particle volume taken by the core, constant or one value per timestamp.
+        core_fraction_resolution: float, optional
+            Core volume fractions are rounded to multiples of this value, so timestamps with similar core volume
+            fractions share the same Mie calculations.
+        """
         # opt = super(SizeDist_TS,self).calculate_optical_properties(wavelength, n = None, AOD = False, noOfAngles=100)
         if not _np.any(n):
             n = self.index_of_refraction
@@ -1076,7 +1855,12 @@ class SizeDist_TS(SizeDist):
 
         out = optical_properties.size_dist2optical_properties(self, wavelength, n,
                                                               aod=False,
-                                                              noOfAngles=noOfAngles)
+                                                              noOfAngles=noOfAngles,
+                                                              n_interpolation_tolerance=n_interpolation_tolerance,
+                                                              angles=angles,
+                                                              core_n=core_n,
+                                                              core_volume_fraction=core_volume_fraction,
+                                                              core_fraction_resolution=core_fraction_resolution)
         # opt_properties = optical_properties.OpticalProperties(out, self.bins)
         # opt._data_period = self._data_period
         return out
@@ -1092,7 +1876,7 @@ class SizeDist_TS(SizeDist):
         return timeArray, binArray, Z
 
     def get_timespan(self):
-        return self.data.index.min(), self.data.index.max()
+        return self._get_index_slicer().get_span()
 
     # TODO: Fix plot options such as showMinorTickLabels
     def plot(self,
@@ -1241,15 +2025,13 @@ class SizeDist_TS(SizeDist):
     #     return ax
 
     def zoom_time(self, start=None, end=None):
+        """Returns a copy which only contains the time between start and end (e.g. '2014-11-24 16:02:30'). The
+        time stamps are found by binary search and the data is only copied when it is accessed.
         """
-        2014-11-24 16:02:30
-        """
-        dist = self.copy()
-        dist.data = dist.data.truncate(before=start, after=end)
-        if dist.housekeeping:
+        # the housekeeping is sliced separately, so it is not copied along with the other attributes
+        dist = self._zoom_index(start=start, end=end, exclude=('_SizeDist__housekeeping',))
+        if self.housekeeping:
             dist.housekeeping = self.housekeeping.zoom_time(start=start, end=end)
-
-        dist._update()
         return dist
 
 
@@ -1270,11 +2052,12 @@ class SizeDist_TS(SizeDist):
 
         dist = self.copy()
         window = window
-        dist.data = dist.data.resample(window, closed='right', label='right')
+        dist.data = dist.data.resample(window, closed='right', label='right').mean()
         if dist.distributionType == 'calibration':
             dist.data.values[_np.where(_np.isnan(self.data.values))] = 0
 
-        dist.housekeeping = self.housekeeping.average_overTime(window = window)
+        if self.housekeeping:
+            dist.housekeeping = self.housekeeping.average_overTime(window = window)
 
 
         dist._update()
@@ -1295,50 +2078,114 @@ class SizeDist_TS(SizeDist):
         self._update()
         return avgDist
 
-    def convert2layerseries(self, hk, layer_thickness=10, force=False):
+    def convert2layerseries(self, hk, layer_thickness=10, force=False, weights=None, direction=None):
         """convertes the time series to a layer series.
 
+        The altitude is interpolated onto the time stamps of the size distribution, the records are sorted by
+        altitude once, and the (weighted) average of each layer is calculated for all layers at once
+        (np.searchsorted and np.add.reduceat).
+
         Note
         ----
         nan values are excluded when an average is taken over a the time that corresponds to the particular layer
         (altitude). If there are only nan values nan is returned and there is a gap in the Layerseries.
 
         The the housekeeping instance has to have a column called "Altitude" and which is monotonicly in- or decreasing
+        (unless force is True or direction is given).
 
         Arguments
         ---------
         hk: housekeeping instance
-        layer_thickness (optional): [10] thickness of each generated layer in meter"""
+        layer_thickness (optional): [10] thickness of each generated layer in meter
+        force (optional): [False] allow altitudes which are not monotonic, e.g. a flight with several profiles.
+        weights (optional): [None] str or array-like
+            Weights for the average of each layer. Either the name of a column in hk or one value per record of
+            the size distribution. Records with nan weight are ignored.
+        direction (optional): [None] 'ascent' or 'descent'
+            If given, only records during which the altitude is increasing or decreasing, respectively, are used.
+
+        Returns
+        -------
+        SizeDist_LS instance. The number of records that fall into each layer is stored in no_of_records.
+        """
         if any(_np.isnan(hk.data.Altitude)):
             txt = """The Altitude contains nan values. Either fix this first, eg. with pandas interpolate function"""
             raise ValueError(txt)
 
-        if ((hk.data.Altitude.values[1:] - hk.data.Altitude.values[:-1]).min() < 0) and (
-                    (hk.data.Altitude.values[1:] - hk.data.Altitude.values[:-1]).max() > 0):
-            if force:
-                hk.data = hk.data.sort(columns='Altitude')
-            else:
-                txt = '''Given altitude data is not monotonic. This is not possible (yet). Use force if you
-know what you are doing'''
-                raise ValueError(txt)
+        altitude_diff = _np.diff(hk.data.Altitude.values)
+        if direction is None and not force and (altitude_diff.min() < 0) and (altitude_diff.max() > 0):
+            txt = '''Given altitude data is not monotonic. Use force if you know what you are doing or select ascent
+or descent with direction.'''
+            raise ValueError(txt)
 
-        start_h = round(hk.data.Altitude.values.min() / layer_thickness) * layer_thickness
-        end_h = round(hk.data.Altitude.values.max() / layer_thickness) * layer_thickness
+        # altitude at the time stamps of the size distribution, records outside the housekeeping are ignored
+        times = self.data.index.values.astype('datetime64[ns]').astype(_np.int64)
+        hk_times = hk.data.index.values.astype('datetime64[ns]').astype(_np.int64)
+        if _np.array_equal(times, hk_times):
+            altitude = hk.data.Altitude.values.astype(float)
+        else:
+            altitude = _np.interp(times, hk_times, hk.data.Altitude.values, left=_np.nan, right=_np.nan)
 
+        if weights is None:
+            weights = _np.ones(altitude.shape)
+        elif isinstance(weights, str):
+            weights = _np.interp(times, hk_times, hk.data[weights].values, left=_np.nan, right=_np.nan)
+        else:
+            weights = _np.asarray(weights, dtype=float)
+            if weights.shape != altitude.shape:
+                raise ValueError('Number of weights (%i) does not match the number of records (%i).' % (
+                                 weights.shape[0], altitude.shape[0]))
+
+        select = ~ _np.isnan(altitude) & ~ _np.isnan(weights)
+        if direction is not None:
+            if altitude.shape[0] < 2:
+                raise ValueError('At least two records are needed to determine the direction.')
+            slope = _np.gradient(altitude)
+            if direction == 'ascent':
+                select &= slope > 0
+            elif direction == 'descent':
+                select &= slope < 0
+            else:
+                raise ValueError("direction has to be 'ascent', 'descent', or None (is %s)." % direction)
+
+        altitude = altitude[select]
+        if altitude.shape[0] == 0:
+            txt = 'No records left to average. Check that the altitude is within the time of the size distribution'
+            if direction is not None:
+                txt += ' and that there is a %s' % direction
+            raise ValueError(txt + '.')
+        start_h = round(altitude.min() / layer_thickness) * layer_thickness
+        end_h = round(altitude.max() / layer_thickness) * layer_thickness
         layer_edges = _np.arange(start_h, end_h, layer_thickness)
-        empty_frame = pd.DataFrame(columns=self.data.columns)
-        lays = SizeDist_LS(empty_frame, self.bins, self.distributionType, None)
-
-        for e, end_h_l in enumerate(layer_edges[1:]):
-            start_h_l = layer_edges[e]
-            layer = hk.data.Altitude.iloc[
-                _np.where(_np.logical_and(start_h_l < hk.data.Altitude.values, hk.data.Altitude.values < end_h_l))]
-            start_t = layer.index.min()
-            end_t = layer.index.max()
-            dist_tmp = self.zoom_time(start=start_t, end=end_t)
-            avrg = dist_tmp.average_overAllTime()
-            # return avrg,lays
-            lays.add_layer(avrg, (start_h_l, end_h_l))
+        no_of_layers = max(layer_edges.shape[0] - 1, 0)
+
+        # sort once by altitude, each layer is then a contiguous block of rows
+        order = _np.argsort(altitude, kind='mergesort')
+        altitude = altitude[order]
+        rows = _np.where(select)[0][order]
+        values = self.data.values[rows]
+        weights = weights[rows][:, _np.newaxis] * ~ _np.isnan(values)
+        values = _np.nan_to_num(values) * weights
+
+        layer_starts = _np.searchsorted(altitude, layer_edges, side='left')
+        no_of_records = _np.diff(layer_starts)
+        # a zero row is appended so every layer edge is a valid index for reduceat, the last segment (above the
+        # top edge) is dropped
+        padding = _np.zeros((1, values.shape[1]))
+        layer_sums = _np.add.reduceat(_np.append(values, padding, axis=0), layer_starts, axis=0)[:-1]
+        weight_sums = _np.add.reduceat(_np.append(weights, padding, axis=0), layer_starts, axis=0)[:-1]
+        # reduceat returns the value at the start index for empty layers
+        layer_sums[no_of_records == 0] = 0
+        weight_sums[no_of_records == 0] = 0
+
+        with _np.errstate(invalid='ignore', divide='ignore'):
+            layer_means = layer_sums / weight_sums
+        layer_means[weight_sums == 0] = _np.nan
+
+        layerbounderies = _np.array([layer_edges[:-1], layer_edges[1:]]).transpose().reshape(no_of_layers, 2)
+        lays = SizeDist_LS(pd.DataFrame(layer_means, columns=self.data.columns), self.bins, self.distributionType,
+                           layerbounderies, fixGaps=False)
+        lays.no_of_records = pd.Series(no_of_records, index=lays.layercenters)
         lays.parent_dist_TS = self
         lays.parent_timeseries = hk
 
@@ -1352,7 +2199,8 @@ know what you are doing'''
 
         # lays.housekeeping = data
         data = data.reindex(lays.layercenters,method = 'nearest')
-        lays.housekeeping = vertical_profile.VerticalProfile(data)
+        # already aligned to the layers, the housekeeping setter would try to interpolate the time column
+        lays._SizeDist__housekeeping = vertical_profile.VerticalProfile(data)
         return lays
 
     @property
@@ -1412,6 +2260,183 @@ know what you are doing'''
         # pdb.set_trace()
         return self.__particle_number_mixing_ratio
 
+class SizeDist_TS_Builder(object):
+    """Append-optimized builder of SizeDist_TS instances, e.g. for live instrument feeds (POPS, UHSAS). Records are
+    stored in preallocated arrays whose capacity is doubled when full, so appending a record is O(1) on average.
+    The integrated moments (number, surface, and volume concentration) are computed once per record when it is
+    appended. Distributions returned by get_size_distribution and window_view are views on the stored records
+    with the integrated moments already in place, so e.g. particle_number_concentration is available without
+    touching the data again.
+
+    Parameters
+    ----------
+    bins: array-like
+        bin edges in nm
+    distType: str
+        distribution type of the appended data, e.g. 'dNdlogDp'
+    data_period: float, optional
+        time between records in seconds
+    capacity: int, optional
+        initial number of records that fit into the storage
+    max_records: int, optional
+        If given, only (at least) the last max_records records are kept, older records are discarded when the
+        storage is full.
+
+    Example
+    -------
+    >>> builder = SizeDist_TS_Builder(bins, 'dNdlogDp', data_period=1)
+    >>> for time, record in feed:
+    >>>     builder.append(record, time)
+    >>>     dist = builder.window_view('60s')
+    >>>     conc = dist.particle_number_concentration
+    >>>     avg = dist.average_overTime('10s')
+    """
+    def __init__(self, bins, distType, data_period=None, capacity=1024, max_records=None):
+        self.bins = _np.asarray(bins, dtype=float)
+        self.distributionType = distType
+        self.data_period = data_period
+        self.max_records = max_records
+        self.index_of_refraction = None
+
+        # per-bin weights which integrate the data into number, surface, and volume concentration (same units as
+        # SizeDist.integrate_moments)
+        dist = SizeDist(pd.DataFrame(_np.zeros((1, self.bins.shape[0] - 1))), self.bins, distType)
+        self._number_factor = sizedist_moment_conversion.get_conversion_factor(dist, 'numberConcentration')
+        self._moment_weights = dist.bin_geometry.moment_weights * _np.array([1., 1e-15, 1e-18])
+
+        self._length = 0
+        self._allocate(max(int(capacity), 1))
+
+    def __len__(self):
+        return self._length
+
+    def _allocate(self, capacity, keep=None):
+        """Allocates new storage and copies the last keep records into it. The old arrays are not modified, so
+        views created earlier stay valid."""
+        if keep is None:
+            keep = self._length
+        times = _np.zeros(capacity, dtype=_np.int64)
+        values = _np.zeros((capacity, self.bins.shape[0] - 1))
+        moments = _np.zeros((capacity, self._moment_weights.shape[1]))
+        if keep:
+            times[:keep] = self._times[self._length - keep: self._length]
+            values[:keep] = self._values[self._length - keep: self._length]
+            moments[:keep] = self._moments[self._length - keep: self._length]
+        self._times, self._values, self._moments = times, values, moments
+        self._length = keep
+
+    def append(self, data, time=None):
+        """Appends one or more records.
+
+        Parameters
+        ----------
+        data: 1D array-like, 2D array, pandas.Series, or pandas.DataFrame
+            One record (1D) or several records (one per row). If data is a DataFrame (or Series with a time
+            stamp as name) and time is None, the time stamps are taken from the index (name).
+        time: timestamp or array-like of timestamps, optional
+            If None and not given by data, the current time is used.
+        """
+        if time is None:
+            if isinstance(data, pd.DataFrame):
+                time = data.index
+            elif isinstance(data, pd.Series) and data.name is not None:
+                time = data.name
+            else:
+                time = pd.Timestamp.now()
+        values = _np.atleast_2d(_np.asarray(data, dtype=float))
+        times = pd.DatetimeIndex(_np.atleast_1d(pd.to_datetime(time))).values.astype('datetime64[ns]')
+        times = times.astype(_np.int64)
+
+        if values.shape[1] != self.bins.shape[0] - 1:
+            raise ValueError('Number of values per record (%i) does not match the number of bins (%i).' % (
+                             values.shape[1], self.bins.shape[0] - 1))
+        if times.shape[0] != values.shape[0]:
+            raise ValueError('Number of time stamps (%i) does not match the number of records (%i).' % (
+                             times.shape[0], values.shape[0]))
+        if _np.any(_np.diff(times) <= 0) or (self._length and times[0] <= self._times[self._length - 1]):
+            raise ValueError('Time stamps have to be increasing.')
+
+        no_new = values.shape[0]
+        if self._length + no_new > self._times.shape[0]:
+            if self.max_records is None:
+                keep = self._length
+            else:
+                keep = min(self._length, max(self.max_records - no_new, 0))
+            capacity = max(2 * self._times.shape[0], 2 * (keep + no_new))
+            if self.max_records is not None:
+                capacity = min(capacity, max(2 * self.max_records, keep + no_new))
+            self._allocate(capacity, keep=keep)
+
+        new = slice(self._length, self._length + no_new)
+        self._times[new] = times
+        self._values[new] = values
+        self._moments[new] = _np.nan_to_num(values * self._number_factor).dot(self._moment_weights)
+        self._length += no_new
+
+    @property
+    def moments(self):
+        """Integrated moments of all stored records as pandas.DataFrame (columns: number, surface, volume)"""
+        return pd.DataFrame(_read_only_view(self._moments[:self._length]),
+                            index=self._get_index(0, self._length), columns=['number', 'surface', 'volume'])
+
+    def _get_index(self, start, end):
+        return pd.DatetimeIndex(self._times[start:end].astype('datetime64[ns]'), name='Time')
+
+    def _get_size_distribution(self, start, end):
+        index = self._get_index(start, end)
+        # the data is a view on the storage, it is read-only so the stored records can not be modified through it
+        dist = SizeDist_TS(pd.DataFrame(_read_only_view(self._values[start:end]), index=index), self.bins,
+                           self.distributionType, fixGaps=False)
+        dist._data_period = self.data_period
+        if self.index_of_refraction is not None:
+            dist.index_of_refraction = self.index_of_refraction
+        dist._moments_cache = {'version': dist._data_version}
+        for e, moment in enumerate(['number', 'surface', 'volume']):
+            dist._moments_cache[moment] = pd.Series(_read_only_view(self._moments[start:end, e]), index=index)
+        return dist
+
+    def get_size_distribution(self, start=None, end=None):
+        """Returns a SizeDist_TS of the stored records between start and end (inclusive), the data is a read-only
+        view on the storage (no copy), use copy() to get a modifiable distribution.
+
+        Parameters
+        ----------
+        start, end: str, datetime, or pandas.Timestamp, optional
+
+        Returns
+        -------
+        SizeDist_TS instance
+        """
+        times = self._times[:self._length]
+        first = 0 if start is None else _np.searchsorted(times, pd.Timestamp(start).value, side='left')
+        last = self._length if end is None else _np.searchsorted(times, pd.Timestamp(end).value, side='right')
+        return self._get_size_distribution(first, last)
+
+    def window_view(self, window):
+        """Returns a SizeDist_TS of the most recent records, the data is a read-only view on the storage (no
+        copy). The returned instance can be used like any other SizeDist_TS, e.g. average_overTime or
+        calculate_optical_properties.
+
+        Parameters
+        ----------
+        window: int, str, or pandas.Timedelta
+            If int, the number of records. Otherwise the time span (e.g. '60s') before the last record; records
+            with time stamps within (last - window, last] are included.
+
+        Returns
+        -------
+        SizeDist_TS instance
+        """
+        if isinstance(window, (int, _np.integer)):
+            first = max(self._length - window, 0)
+        elif not self._length:
+            first = 0
+        else:
+            start = self._times[self._length - 1] - pd.Timedelta(window).value
+            first = _np.searchsorted(self._times[:self._length], start, side='right')
+        return self._get_size_distribution(first, self._length)
+
+
 class SizeDist_LS(SizeDist):
     """
     Parameters
@@ -1439,7 +2464,7 @@ class SizeDist_LS(SizeDist):
     """
 
     def __init__(self, data, bins, distributionType, layerbounderies, fixGaps=True):
-        super(SizeDist_LS, self).__init__(data, bins, distributionType, fixGaps=True)
+        super(SizeDist_LS, self).__init__(data, bins, distributionType, fixGaps=fixGaps)
         if type(layerbounderies).__name__ == 'NoneType':
             self.layerbounderies = _np.empty((0, 2))
             # self.layercenters = _np.array([])
@@ -1453,6 +2478,7 @@ class SizeDist_LS(SizeDist):
         self._update()
 
     def _update(self):
+        self._data_changed()
         self._uptodate_particle_number_concentration = False
         self._uptodate_particle_mass_concentration = False
         self._uptodate_particle_mass_mixing_ratio = False
@@ -1934,9 +2960,9 @@ class SizeDist_LS(SizeDist):
         return a
 
     def zoom_altitude(self, bottom, top):
-        """'2014-11-24 16:02:30'"""
-        dist = self.copy()
-        dist.data = dist.data.truncate(before=bottom, after=top)
+        """Returns a copy which only contains the layers between bottom and top. The layers are found by binary
+        search and the data is only copied when it is accessed."""
+        dist = self._zoom_index(start=bottom, end=top)
         where = _np.where(_np.logical_and(dist.layercenters < top, dist.layercenters > bottom))
         # dist.layercenters = dist.layercenters[where]
         dist.layerbounderies = dist.layerbounderies[where]
@@ -1971,8 +2997,9 @@ class SizeDist_LS(SizeDist):
         return SizeDist(out, self.bins, self.distributionType)
 
 
-    def fit_normal(self):
-        """ Fits a single normal distribution to each line in the data frame.
+    def fit_normal(self, log=True, p0=[10, 180, 0.2], no_of_modes=1, warm_start=True, processes=None):
+        """ Fits a single (or multiple) normal distribution(s) to each line in the data frame. See
+        SizeDist.fit_normal for the parameters.
 
         Returns
         -------
@@ -1980,7 +3007,8 @@ class SizeDist_LS(SizeDist):
 
         """
 
-        super(SizeDist_LS, self).fit_normal()
+        super(SizeDist_LS, self).fit_normal(log=log, p0=p0, no_of_modes=no_of_modes, warm_start=warm_start,
+                                            processes=processes)
         self.data_fit_normal.index = self.layercenters
         return self.data_fit_normal
 
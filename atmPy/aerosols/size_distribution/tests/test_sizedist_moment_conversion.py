@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atmPy.aerosols.size_distribution import sizedist_moment_conversion, sizedistribution
+
+
+def test_bin_geometry_is_shared():
+    bins = np.logspace(2, 3, 11)
+    geometry = sizedist_moment_conversion.get_bin_geometry(bins)
+    assert sizedist_moment_conversion.get_bin_geometry(bins.copy()) is geometry
+    np.testing.assert_allclose(geometry.bincenters, (bins[1:] + bins[:-1]) / 2.)
+    with pytest.raises(ValueError):
+        geometry.bincenters[0] = 0
+
+
+def test_bin_geometry_cache_is_bounded():
+    cache = sizedist_moment_conversion._bin_geometry_cache
+    for i in range(cache.size + 10):
+        sizedist_moment_conversion.get_bin_geometry(np.logspace(2, 3, 5 + i))
+    assert len(cache) == cache.size
+    last = sizedist_moment_conversion.get_bin_geometry(np.logspace(2, 3, 5 + cache.size + 9))
+    assert sizedist_moment_conversion.get_bin_geometry(np.logspace(2, 3, 5 + cache.size + 9)) is last
+
+
+def test_conversion_factors_are_cached():
+    bins = np.logspace(2, 3, 11)
+    dist = sizedistribution.SizeDist(pd.DataFrame(np.ones((2, 10))), bins, 'dNdlogDp')
+    factor = sizedist_moment_conversion.get_conversion_factor(dist, 'dVdDp')
+    assert sizedist_moment_conversion.get_conversion_factor(dist, 'dVdDp') is factor
+    with pytest.raises(ValueError):
+        factor[0] = 0
+    centers = (bins[1:] + bins[:-1]) / 2.
+    np.testing.assert_allclose(factor, np.pi / 6. * centers ** 3 / (centers * np.log(10.)), rtol=1e-12)
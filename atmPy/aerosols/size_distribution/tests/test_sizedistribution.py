@@ -0,0 +1,405 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atmPy.aerosols.size_distribution import sizedistribution
+from atmPy.general import timeseries
+
+
+def test_hygro_growth_shift_data_vectorized_equals_per_row(make_size_dist_ts):
+    dist = make_size_dist_ts().convert2numberconcentration()
+    gf = np.random.default_rng(1).uniform(1., 2.5, dist.data.shape[0])
+    gf[3] = np.nan
+    gf[4] = 1.
+    gf[5] = 0.9
+    data = dist.data.values.copy()
+    data[6, 5] = np.nan
+
+    out = dist._hygro_growht_shift_data_vectorized(data, dist.bins, gf)
+
+    reference = dist._hygro_growht_shift_data(data[0], dist.bins, float(np.nanmax(gf)), ignore_data_nan=True)
+    np.testing.assert_allclose(out['bins'], reference['bins'])
+    no_of_bins = reference['data'].shape[0]
+    for row, factor, shifted in zip(data, gf, out['data']):
+        expected = dist._hygro_growht_shift_data(row, dist.bins, factor)['data']
+        expected = np.append(expected, np.zeros(no_of_bins - expected.shape[0]))
+        np.testing.assert_array_equal(np.isnan(shifted), np.isnan(expected))
+        np.testing.assert_allclose(shifted, expected, rtol=1e-10, atol=1e-10 * np.nanmax(data))
+
+
+def test_apply_growth_conserves_number(make_size_dist_ts):
+    dist = make_size_dist_ts()
+    gf = pd.Series(np.linspace(1.1, 2., dist.data.shape[0]), index=dist.data.index)
+    grown = dist.apply_growth(gf)
+    before = dist.convert2numberconcentration().data.sum(axis=1)
+    after = grown.convert2numberconcentration().data.sum(axis=1)
+    np.testing.assert_allclose(after.values, before.values, rtol=1e-10)
+
+
+def test_rebin(make_size_dist_ts):
+    dist = make_size_dist_ts()
+    number = dist.convert2numberconcentration().data
+
+    # same bins give the same distribution
+    same = dist.rebin(dist.bins)
+    np.testing.assert_allclose(same.data.values, dist.data.values, rtol=1e-10)
+
+    # merging pairs of bins sums their number concentrations
+    merged = dist.rebin(dist.bins[::2]).convert2numberconcentration().data
+    np.testing.assert_allclose(merged.values, number.values[:, ::2] + number.values[:, 1::2], rtol=1e-10)
+
+    # number is conserved on arbitrary bins covering the original range
+    new_bins = np.logspace(np.log10(dist.bins[0]), np.log10(dist.bins[-1]), 17)
+    rebinned = dist.rebin(new_bins).convert2numberconcentration().data
+    np.testing.assert_allclose(rebinned.sum(axis=1).values, number.sum(axis=1).values, rtol=1e-10)
+
+    # volume is conserved if requested
+    volume = dist.convert2dVdDp()
+    volume = (volume.data * volume.binwidth).sum(axis=1)
+    rebinned = dist.rebin(new_bins, conserve='volume').convert2dVdDp()
+    rebinned = (rebinned.data * rebinned.binwidth).sum(axis=1)
+    np.testing.assert_allclose(rebinned.values, volume.values, rtol=1e-10)
+
+
+def test_rebin_matrix_cache_is_bounded():
+    cache = sizedistribution._rebin_matrix_cache
+    bins = np.logspace(2, 3, 11)
+    for i in range(cache.size + 10):
+        sizedistribution._get_rebin_matrix(bins, np.logspace(2, 3, 5 + i))
+    assert len(cache) == cache.size
+    hits = cache.hits
+    sizedistribution._get_rebin_matrix(bins, np.logspace(2, 3, 5 + cache.size + 9))
+    assert cache.hits == hits + 1
+
+
+def test_moment_conversion_does_not_alias_parent(make_size_dist_ts):
+    dist = make_size_dist_ts()
+    reference = dist.convert2numberconcentration().data.values.copy()
+
+    # parent handed out its data before the conversion
+    df = dist.data
+    number = dist.convert2numberconcentration()
+    df.iloc[0, 10] = 1e9
+    np.testing.assert_array_equal(number.data.values, reference)
+
+    # parent (itself a lazy conversion) modified after the conversion
+    dist = make_size_dist_ts()
+    natural = dist.convert2dNdDp()
+    number = natural.convert2numberconcentration()
+    assert number._data_view is not None
+    natural.data.iloc[0, 10] = 1e9
+    np.testing.assert_allclose(number.data.values, reference, rtol=1e-12)
+
+    # the conversion is modified, the parent is not
+    natural = dist.convert2dNdDp()
+    number = natural.convert2numberconcentration()
+    number.data.iloc[0, 10] = 1e9
+    np.testing.assert_allclose(natural.convert2numberconcentration().data.values, reference, rtol=1e-12)
+
+
+def test_integrate_moments(make_size_dist_ts):
+    dist = make_size_dist_ts()
+    dist.data.iloc[2, 4] = np.nan
+    dist.physical_property_density = 1.5
+    number = np.nan_to_num(dist.convert2numberconcentration().data.values)
+    d = dist.bincenters
+
+    moments = dist.integrate_moments(['number', 'surface', 'volume', 'mass'])
+    np.testing.assert_allclose(moments['number'].values, number.sum(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(moments['surface'].values, (number * np.pi * d ** 2).sum(axis=1) * 1e-15, rtol=1e-12)
+    volume = (number * np.pi / 6. * d ** 3).sum(axis=1) * 1e-18
+    np.testing.assert_allclose(moments['volume'].values, volume, rtol=1e-12)
+    np.testing.assert_allclose(moments['mass'].values, volume * 1e18 * 1.5e-21 * 1e12, rtol=1e-12)
+    np.testing.assert_allclose(dist.particle_number_concentration.data.iloc[:, 0].values, number.sum(axis=1),
+                               rtol=1e-12)
+
+    # the cached results follow the data
+    dist.data = dist.data * 2
+    np.testing.assert_allclose(dist.integrate_moments('number')['number'].values, 2 * number.sum(axis=1),
+                               rtol=1e-12)
+
+
+def _get_normal_dist_data(params, x):
+    log_x = np.log10(x)
+    data = np.zeros((params.shape[0], x.shape[0]))
+    for row, row_params in zip(data, params):
+        for amp, pos, sigma in row_params:
+            row += amp * np.exp(-(log_x - np.log10(pos)) ** 2 / (2. * sigma ** 2))
+    return data
+
+
+def test_fit_normal_dist_batch():
+    x = np.logspace(np.log10(80), np.log10(3000), 40)
+    params = np.zeros((8, 1, 3))
+    params[:, 0, 0] = np.linspace(500, 800, 8)
+    params[:, 0, 1] = np.linspace(150, 250, 8)
+    params[:, 0, 2] = np.linspace(0.15, 0.2, 8)
+    data = _get_normal_dist_data(params, x)
+    data[3, 5] = np.nan
+
+    result = sizedistribution.fit_normal_dist_batch(x, data, p0=[600, 200, 0.2])
+    assert result['converged'].all()
+    np.testing.assert_allclose(result['params'], params, rtol=1e-6)
+    assert result['covariance'].shape == (8, 3, 3)
+
+    # same result as the per row fit, with and without warm start and in several processes
+    for row, fitted in zip(data, result['params']):
+        amp, pos, sigma = sizedistribution.fit_normal_dist(x, row.copy(), p0=[600, 200, 0.2])[:3]
+        np.testing.assert_allclose([amp, pos, sigma], fitted[0], rtol=1e-6)
+    cold = sizedistribution.fit_normal_dist_batch(x, data, p0=[600, 200, 0.2], warm_start=False)
+    np.testing.assert_allclose(cold['params'], result['params'], rtol=1e-6)
+    parallel = sizedistribution.fit_normal_dist_batch(x, data, p0=[600, 200, 0.2], processes=2)
+    np.testing.assert_allclose(parallel['params'], result['params'], rtol=1e-6)
+
+
+def test_fit_normal_dist_batch_bimodal():
+    x = np.logspace(np.log10(20), np.log10(3000), 60)
+    params = np.array([[[300., 60., 0.12], [500., 400., 0.15]],
+                       [[320., 65., 0.12], [480., 380., 0.15]]])
+    data = _get_normal_dist_data(params, x)
+    result = sizedistribution.fit_normal_dist_batch(x, data, p0=[400, 150, 0.2], no_of_modes=2)
+    assert result['converged'].all()
+    np.testing.assert_allclose(result['params'], params, rtol=1e-6)
+
+
+def test_fit_normal_size_dist_ts():
+    bins = np.logspace(np.log10(80), np.log10(3000), 41)
+    x = (bins[1:] + bins[:-1]) / 2.
+    params = np.array([[[600., 200., 0.18]], [[650., 210., 0.17]], [[700., 220., 0.16]]])
+    index = pd.date_range('2015-01-01', periods=3, freq='10s')
+    dist = sizedistribution.SizeDist_TS(pd.DataFrame(_get_normal_dist_data(params, x), index=index), bins,
+                                        'dNdlogDp')
+    fit = dist.fit_normal(p0=[600, 200, 0.2])
+    assert (fit.index == index).all()
+    np.testing.assert_allclose(fit[['Amp', 'Pos', 'Sigma']].values, params[:, 0], rtol=1e-6)
+    np.testing.assert_allclose(fit['Sigma_high'].values, 10 ** (np.log10(params[:, 0, 1]) + params[:, 0, 2]),
+                               rtol=1e-6)
+
+
+def test_netCDF_round_trip(tmpdir, make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=50)
+    dist.index_of_refraction = 1.5 + 0.01j
+    fname = str(tmpdir.join('archive.nc'))
+    sizedistribution.save_netCDF(dist.zoom_time(end=dist.data.index[29]), fname, chunk_size=8)
+    sizedistribution.save_netCDF(dist.zoom_time(start=dist.data.index[30]), fname, append=True)
+
+    loaded = sizedistribution.load_netCDF(fname)
+    np.testing.assert_array_equal(loaded.data.values, dist.data.values)
+    assert (loaded.data.index == dist.data.index).all()
+    np.testing.assert_array_equal(loaded.bins, dist.bins)
+    assert loaded.distributionType == dist.distributionType
+    assert loaded._data_period == dist._data_period
+    assert loaded.index_of_refraction == dist.index_of_refraction
+
+    index = dist.data.index
+    for start, end in [(index[7], index[23]), (index[8], None), (None, index[0]), (index[3] + pd.Timedelta(1, 's'),
+                                                                                  index[40] - pd.Timedelta(1, 's')),
+                       (index[-1] + pd.Timedelta(1, 's'), None)]:
+        loaded = sizedistribution.load_netCDF(fname, start=start, end=end)
+        expected = dist.data.loc[start:end]
+        np.testing.assert_array_equal(loaded.data.values.reshape(expected.shape), expected.values)
+        assert (loaded.data.index == expected.index).all()
+
+    loaded = sizedistribution.load_netCDF(fname, start=index[5], end=index[20], memmap_directory=str(tmpdir))
+    np.testing.assert_array_equal(loaded.data.values, dist.data.values[5:21])
+
+
+def test_memmap(tmpdir, make_size_dist_ts):
+    directory = str(tmpdir)
+    dist = make_size_dist_ts()
+    in_memory = dist.copy()
+    dist.to_memmap(directory)
+    assert sizedistribution._get_memmap_directory(dist.data.values) == directory
+    np.testing.assert_array_equal(dist.data.values, in_memory.data.values)
+
+    converted = dist.convert2dVdDp()
+    assert sizedistribution._get_memmap_directory(converted.data.values) == directory
+    np.testing.assert_allclose(converted.data.values, in_memory.convert2dVdDp().data.values, rtol=1e-12)
+    np.testing.assert_allclose(dist.particle_number_concentration.data.values,
+                               in_memory.particle_number_concentration.data.values, rtol=1e-12)
+
+    gf = pd.Series(np.linspace(1.1, 2., dist.data.shape[0]), index=dist.data.index)
+    grown = dist.apply_growth(gf)
+    assert sizedistribution._get_memmap_directory(grown.data.values) == directory
+    np.testing.assert_allclose(grown.data.values, in_memory.apply_growth(gf).data.values, rtol=1e-12)
+
+    # copies are independent memmaps
+    copied = dist.copy()
+    copied.data.iloc[0, 0] = -1
+    assert sizedistribution._get_memmap_directory(copied.data.values) == directory
+    assert dist.data.iloc[0, 0] == in_memory.data.iloc[0, 0]
+
+
+def test_size_dist_ts_builder(make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=30)
+    data = dist.data
+    builder = sizedistribution.SizeDist_TS_Builder(dist.bins, 'dNdlogDp', data_period=10, capacity=4)
+    builder.append(data.iloc[:5])
+    for time, record in data.iloc[5:].iterrows():
+        builder.append(record.values, time)
+    assert len(builder) == 30
+
+    built = builder.get_size_distribution()
+    np.testing.assert_array_equal(built.data.values, data.values)
+    assert (built.data.index == data.index).all()
+    moments = dist.integrate_moments(['number', 'surface', 'volume'])
+    np.testing.assert_allclose(builder.moments.values, moments.values, rtol=1e-12)
+    np.testing.assert_allclose(built.integrate_moments(['number', 'surface', 'volume']).values, moments.values,
+                               rtol=1e-12)
+
+    window = builder.window_view('60s')
+    np.testing.assert_array_equal(window.data.values, data.values[-6:])
+    np.testing.assert_array_equal(builder.window_view(4).data.values, data.values[-4:])
+    part = builder.get_size_distribution(start=data.index[3], end=data.index[7])
+    np.testing.assert_array_equal(part.data.values, data.values[3:8])
+
+    # views can not be used to modify the stored records
+    with pytest.raises(ValueError):
+        window.data.iloc[0, 0] = -1
+    with pytest.raises(ValueError):
+        window.data.values[0, 0] = -1
+    with pytest.raises(ValueError):
+        builder.moments.values[0, 0] = -1
+    window.particle_number_concentration.data.values[0, 0] = -1
+    copied = window.copy()
+    copied.data.iloc[0, 0] = -1
+    np.testing.assert_array_equal(builder.get_size_distribution().data.values, data.values)
+    np.testing.assert_allclose(builder.moments.values, moments.values, rtol=1e-12)
+
+    # views stay valid when the storage grows
+    builder.append(data.values[:1] * 2, data.index[-1] + pd.Timedelta(10, 's'))
+    np.testing.assert_array_equal(built.data.values, data.values)
+    assert window.average_overTime('20s').data.shape[0] == 4
+
+    limited = sizedistribution.SizeDist_TS_Builder(dist.bins, 'dNdlogDp', capacity=2, max_records=5)
+    limited.append(data)
+    limited.append(data.values[:1], data.index[-1] + pd.Timedelta(10, 's'))
+    assert len(limited) >= 5
+    np.testing.assert_array_equal(limited.window_view(5).data.values[:4], data.values[-4:])
+
+
+def _layer_means(data, altitude, edges, weights):
+    means = []
+    for bottom, top in zip(edges[:-1], edges[1:]):
+        select = (altitude >= bottom) & (altitude < top)
+        values = data[select]
+        w = weights[select][:, np.newaxis] * ~np.isnan(values)
+        w_sum = w.sum(axis=0)
+        mean = np.full(w_sum.shape, np.nan)
+        mean[w_sum > 0] = np.nansum(values * w, axis=0)[w_sum > 0] / w_sum[w_sum > 0]
+        means.append(mean)
+    return np.array(means)
+
+
+def test_convert2layerseries(make_size_dist_ts):
+    dist = make_size_dist_ts(no_of_rows=40)
+    dist.data.iloc[3, 2] = np.nan
+    altitude = np.linspace(3, 190, 40)
+    hk = timeseries.TimeSeries(pd.DataFrame({'Altitude': altitude, 'weight': np.linspace(1, 2, 40)},
+                                            index=dist.data.index))
+
+    lays = dist.convert2layerseries(hk, layer_thickness=20)
+    edges = np.arange(0, 190, 20)
+    np.testing.assert_array_equal(lays.layerbounderies, np.array([edges[:-1], edges[1:]]).transpose())
+    np.testing.assert_allclose(lays.data.values, _layer_means(dist.data.values, altitude, edges, np.ones(40)),
+                               rtol=1e-12)
+    assert lays.no_of_records.sum() == ((altitude >= 0) & (altitude < 180)).sum()
+
+    weighted = dist.convert2layerseries(hk, layer_thickness=20, weights='weight')
+    np.testing.assert_allclose(weighted.data.values,
+                               _layer_means(dist.data.values, altitude, edges, np.linspace(1, 2, 40)), rtol=1e-12)
+
+    # up and down, only the ascent
+    altitude = np.concatenate((np.linspace(3, 190, 20), np.linspace(185, 10, 20)))
+    hk = timeseries.TimeSeries(pd.DataFrame({'Altitude': altitude}, index=dist.data.index))
+    with pytest.raises(ValueError):
+        dist.convert2layerseries(hk, layer_thickness=20)
+    ascent = dist.convert2layerseries(hk, layer_thickness=20, direction='ascent')
+    weights = (np.gradient(altitude) > 0).astype(float)
+    np.testing.assert_allclose(ascent.data.values, _layer_means(dist.data.values, altitude, edges, weights),
+                               rtol=1e-12)
+
+    # descent only, nothing to select for the ascent
+    hk = timeseries.TimeSeries(pd.DataFrame({'Altitude': np.linspace(190, 3, 40)}, index=dist.data.index))
+    with pytest.raises(ValueError, match='ascent'):
+        dist.convert2layerseries(hk, layer_thickness=20, direction='ascent')
+
+
+def _add_housekeeping(dist):
+    hk = timeseries.TimeSeries(pd.DataFrame({'Altitude': np.linspace(0, 100, dist.data.shape[0])},
+                                            index=dist.data.index))
+    hk._data_period = dist._data_period
+    dist.housekeeping = hk
+    return dist
+
+
+def test_zoom_time_and_copy_are_independent(make_size_dist_ts):
+    dist = _add_housekeeping(make_size_dist_ts())
+    expected = dist.data.values.copy()
+    expected_hk = dist.housekeeping.data.values.copy()
+    index = dist.data.index
+
+    # data handed out before the slice and the copy are taken
+    df = dist.data
+    hk_df = dist.housekeeping.data
+    zoomed = dist.zoom_time(start=index[2], end=index[8])
+    copied = dist.copy()
+    df.iloc[3, 3] = -1
+    hk_df.iloc[3, 0] = -1
+    np.testing.assert_array_equal(zoomed.data.values, expected[2:9])
+    np.testing.assert_array_equal(copied.data.values, expected)
+    np.testing.assert_array_equal(zoomed.housekeeping.data.values, expected_hk[2:9])
+    np.testing.assert_array_equal(copied.housekeeping.data.values, expected_hk)
+
+    # data modified after the slice and the copy are taken
+    dist = _add_housekeeping(make_size_dist_ts()).copy()
+    zoomed = dist.zoom_time(start=index[2], end=index[8])
+    copied = dist.copy()
+    deep_copied = copied.copy()
+    assert zoomed._data_view is not None
+    dist.data.iloc[3, 3] = -1
+    dist.housekeeping.data.iloc[3, 0] = -1
+    copied.data.iloc[4, 4] = -1
+    copied.housekeeping.data.iloc[4, 0] = -1
+    np.testing.assert_array_equal(zoomed.data.values, expected[2:9])
+    np.testing.assert_array_equal(zoomed.housekeeping.data.values, expected_hk[2:9])
+    np.testing.assert_array_equal(deep_copied.data.values, expected)
+    np.testing.assert_array_equal(deep_copied.housekeeping.data.values, expected_hk)
+
+    # modifying the slice does not change the original
+    dist = make_size_dist_ts().copy()
+    zoomed = dist.zoom_time(start=index[2], end=index[8])
+    zoomed.data.iloc[0, 0] = -1
+    np.testing.assert_array_equal(dist.data.values, expected)
+
+
+def test_copy_does_not_share_cached_moments(make_size_dist_ts):
+    dist = make_size_dist_ts()
+    number = dist.particle_number_concentration
+    expected = number.data.values.copy()
+    copied = dist.copy()
+    zoomed = dist.zoom_time(end=dist.data.index[5])
+    number.data.iloc[0, 0] = -1
+    np.testing.assert_array_equal(copied.particle_number_concentration.data.values, expected)
+    np.testing.assert_allclose(zoomed.particle_number_concentration.data.values, expected[:6], rtol=1e-12)
+
+
+class _ParentWatcher(object):
+    """Attribute which records the state of its parent while the parent is copied"""
+    def __init__(self, parent):
+        self.parent = parent
+        self.seen = []
+
+    def __deepcopy__(self, memo):
+        self.seen.append((self.parent._get_data_source()[0] is not None, self.parent.housekeeping is not None))
+        return self
+
+
+def test_copies_do_not_modify_the_original(make_size_dist_ts):
+    dist = _add_housekeeping(make_size_dist_ts())
+    dist.watcher = _ParentWatcher(dist)
+    index = dist.data.index
+    dist.copy()
+    dist.zoom_time(start=index[2], end=index[8])
+    dist.convert2dVdlogDp()
+    assert dist.watcher.seen == [(True, True)] * 3
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from atmPy.general import timeseries
+
+
+def test_merge_interpolates_onto_time_stamps(make_timeseries):
+    ts = make_timeseries()
+    other = make_timeseries(no_of_rows=12, freq='15s', start='2015-01-01 00:00:05', seed=1)
+    other.data.columns = ['c', 'd']
+    other.data.iloc[5, 0] = np.nan
+
+    merged = timeseries.merge(ts, other)
+    assert list(merged.data.columns) == ['a', 'b', 'c', 'd']
+    assert (merged.data.index == ts.data.index).all()
+    np.testing.assert_array_equal(merged.data[['a', 'b']].values, ts.data.values)
+
+    times = ts.data.index.values.astype(np.int64)
+    times_other = other.data.index.values.astype(np.int64)
+    expected = np.interp(times, times_other, other.data['d'].values)
+    inside = (times >= times_other[0]) & (times <= times_other[-1])
+    np.testing.assert_allclose(merged.data['d'].values[inside], expected[inside], rtol=1e-12)
+    assert np.isnan(merged.data['d'].values[~inside]).all()
+
+    # the nan in c leaves a gap of 30 s, which is not larger than max_gap (twice the data period)
+    valid = ~np.isnan(other.data['c'].values)
+    expected = np.interp(times, times_other[valid], other.data['c'].values[valid])
+    np.testing.assert_allclose(merged.data['c'].values[inside], expected[inside], rtol=1e-12)
+    merged = timeseries.merge(ts, other, max_gap=20)
+    gap = (times > times_other[4]) & (times < times_other[6])
+    assert np.isnan(merged.data['c'].values[gap]).all()
+    np.testing.assert_allclose(merged.data['d'].values[inside], np.interp(times, times_other,
+                                                                          other.data['d'].values)[inside])
+
+
+def test_merge_overlapping_columns(make_timeseries):
+    ts = make_timeseries()
+    ts.data.iloc[3, 0] = np.nan
+    other = make_timeseries(seed=1)
+    other.data['c'] = 1.
+
+    # same time stamps
+    merged = timeseries.merge(ts, other)
+    assert list(merged.data.columns) == ['a', 'b', 'c']
+    expected = ts.data['a'].values.copy()
+    expected[3] = other.data['a'].values[3]
+    np.testing.assert_array_equal(merged.data['a'].values, expected)
+    np.testing.assert_array_equal(merged.data['b'].values, ts.data['b'].values)
+
+    # other time stamps
+    other.data.index = other.data.index + pd.Timedelta(5, 's')
+    merged = timeseries.merge(ts, other)
+    assert list(merged.data.columns) == ['a', 'b', 'c']
+    expected[3] = np.mean(other.data['a'].values[2:4])
+    np.testing.assert_allclose(merged.data['a'].values, expected, rtol=1e-12)
+
+
+def test_merge_duplicate_time_stamps_non_numeric(make_timeseries):
+    ts = make_timeseries()
+    index = ts.data.index[[0, 2, 2, 4, 6]]
+    other = timeseries.TimeSeries(pd.DataFrame({'c': [1., 2., 4., 5., 6.], 'flag': ['x', 'y', 'z', 'w', 'v']},
+                                               index=index))
+    merged = timeseries.merge(ts, other, max_gap=100)
+    np.testing.assert_allclose(merged.data['c'].values[:7], [1., 2., 3., 4., 5., 5.5, 6.])
+    assert list(merged.data['flag'].values[[0, 2, 4]]) == ['x', 'y', 'w']
+    assert pd.isnull(merged.data['flag'].values[1])
+
+
+def test_rolling_correlation():
+    rng = np.random.default_rng(2)
+    index = pd.date_range('2015-01-01', periods=200, freq='60s')
+    x = rng.normal(size=200)
+    y = 2 * x + rng.normal(size=200) + 5
+    x[[3, 50, 51, 120]] = np.nan
+    y[[10, 52]] = np.nan
+    data = timeseries.TimeSeries(pd.DataFrame({'x': x}, index=index))
+    data._data_period = 60
+    correlant = timeseries.TimeSeries(pd.DataFrame({'y': y}, index=index))
+    correlant._data_period = 60
+
+    out = timeseries.rolling_correlation(data, correlant, (30, 'm'), verbose=False)
+    assert out.data.shape[0] == 200 - 30 + 1
+    assert out.data['no_of_points'].dtype == np.int64
+    for i in range(0, out.data.shape[0], 7):
+        xw, yw = x[i: i + 30], y[i: i + 30]
+        good = ~np.isnan(xw) & ~np.isnan(yw)
+        regression = stats.linregress(xw[good], yw[good])
+        np.testing.assert_allclose(out.data['pearson_r'].iloc[i], stats.pearsonr(xw[good], yw[good])[0], rtol=1e-10)
+        np.testing.assert_allclose(out.data['slope'].iloc[i], regression.slope, rtol=1e-10)
+        np.testing.assert_allclose(out.data['intercept'].iloc[i], regression.intercept, rtol=1e-10)
+        assert out.data['no_of_points'].iloc[i] == good.sum()
+    assert out.data.index[0] == index[0] + (index[29] - index[0]) / 2
+
+    # without nan values the same as pandas' rolling correlation
+    x, y = rng.normal(size=200), rng.normal(size=200)
+    data.data = pd.DataFrame({'x': x}, index=index)
+    correlant.data = pd.DataFrame({'y': x + y}, index=index)
+    out = timeseries.rolling_correlation(data, correlant, (30, 'm'), verbose=False)
+    expected = pd.Series(x).rolling(30).corr(pd.Series(x + y)).values[29:]
+    np.testing.assert_allclose(out.data['pearson_r'].values, expected, rtol=1e-10)
+
+
+def _close_gaps_loop(data, data_period):
+    """close_gaps as it was implemented before, one pandas.date_range per gap"""
+    data = data.sort_index()
+    index = data.index
+    index_df = pd.DataFrame(index=index)
+    point_dist = (index.values[1:] - index.values[:-1]) / np.timedelta64(1, 's')
+    where = point_dist > 2 * data_period
+    for start, end in zip(index[:-1][where], index[1:][where]):
+        no_periods = round((end - start) / np.timedelta64(1, 's')) / data_period
+        out = pd.date_range(start=start, periods=no_periods, freq='%i s' % data_period)[1:]
+        index_df = pd.concat([index_df, pd.DataFrame(index=out)])
+    index_df.sort_index(inplace=True)
+    return data.reindex(index_df.index)
+
+
+def test_close_gaps(make_timeseries):
+    times = np.concatenate((np.arange(0, 100, 10), [135], np.arange(195, 300, 10), [400, 410, 420]))
+    index = pd.to_datetime('2015-01-01') + pd.to_timedelta(times, unit='s')
+    ts = timeseries.TimeSeries(pd.DataFrame({'a': np.arange(times.shape[0], dtype=float)}, index=index))
+    ts._data_period = 10
+    expected = _close_gaps_loop(ts.data, 10)
+
+    closed = timeseries.close_gaps(ts)
+    assert (closed.data.index == expected.index).all()
+    np.testing.assert_array_equal(closed.data.values, expected.values)
+    assert list(closed.gap_statistics['no_of_points_added']) == [3, 5, 9]
+    assert closed.gap_statistics['no_of_points_added'].sum() == closed.data.shape[0] - ts.data.shape[0]
+
+    # unsorted input
+    shuffled = timeseries.TimeSeries(ts.data.iloc[np.random.default_rng(3).permutation(times.shape[0])])
+    shuffled._data_period = 10
+    closed = timeseries.close_gaps(shuffled)
+    assert (closed.data.index == expected.index).all()
+    np.testing.assert_array_equal(closed.data.values, expected.values)
+
+    # nothing to close
+    ts = make_timeseries()
+    closed = timeseries.close_gaps(ts)
+    assert (closed.data.index == ts.data.index).all()
+    assert closed.gap_statistics.shape[0] == 0
+
+
+def test_copy_and_zoom_time_are_independent(make_timeseries):
+    # data handed out before the copy and the time slice are taken
+    ts = make_timeseries()
+    expected = ts.data.values.copy()
+    df = ts.data
+    copied = ts.copy()
+    zoomed = ts.zoom_time(end=ts.data.index[5])
+    df.iloc[0, 0] = -1
+    np.testing.assert_array_equal(copied.data.values, expected)
+    np.testing.assert_array_equal(zoomed.data.values, expected[:6])
+
+    # data handed out after the copy and the time slice are taken
+    ts = make_timeseries()
+    index = ts.data.index
+    ts = ts.copy()
+    copied = ts.copy()
+    zoomed = ts.zoom_time(end=index[5])
+    df = ts.data
+    df.iloc[0, 0] = -1
+    np.testing.assert_array_equal(copied.data.values, expected)
+    np.testing.assert_array_equal(zoomed.data.values, expected[:6])
+
+    # data frame passed to the setter
+    ts = make_timeseries()
+    df = ts.data.copy()
+    ts.data = df
+    copied = ts.copy()
+    zoomed = ts.zoom_time(start=ts.data.index[0], end=ts.data.index[5])
+    ts.zoom_time(end=ts.data.index[10], copy=False)
+    df.iloc[0, 0] = -1
+    np.testing.assert_array_equal(copied.data.values, expected)
+    np.testing.assert_array_equal(zoomed.data.values, expected[:6])
+    np.testing.assert_array_equal(ts.data.values, expected[:11])
+
+    # modifying the copy or the slice does not change the original
+    ts = make_timeseries().copy()
+    copied = ts.copy()
+    zoomed = ts.zoom_time(end=index[5])
+    copied.data.iloc[1, 1] = -1
+    zoomed.data.iloc[2, 1] = -1
+    np.testing.assert_array_equal(ts.data.values, expected)
+
+
+def test_arithmetic_does_not_copy_operands(make_timeseries):
+    ts = make_timeseries()
+    other = timeseries.TimeSeries(pd.DataFrame({'c': np.arange(10.) + 1},
+                                               index=pd.date_range('2015-01-01', periods=10, freq='20s')))
+    other._data_period = 20.
+    df, df_other = ts.data, other.data
+    expected = df.values.copy()
+
+    added = ts + other
+    divided = ts / other
+    # the operands keep their data frames, nothing is shared with the results
+    assert ts._peek_data() is df and other._peek_data() is df_other
+    assert not ts._data_shared and not other._data_shared
+    np.testing.assert_array_equal(df.values, expected)
+
+    # ts has the shorter data period and is aligned to other
+    aligned = ts.align_to(other).data.values
+    np.testing.assert_allclose(added.data.values, aligned + df_other.values)
+    np.testing.assert_allclose(divided.data.values, aligned / df_other.values)
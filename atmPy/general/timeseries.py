@@ -120,43 +120,67 @@ def load_netCDF(fname):
 
 #### Tools
 def close_gaps(ts, verbose = False):
+    """Closes gaps in the time series by adding time stamps with nan values. A gap is where two consecutive time
+    stamps are more than twice the data period apart. The time stamps (multiples of the data period after the
+    beginning of each gap) of all gaps are generated at once and the data is reindexed once.
+
+    Parameters
+    ----------
+    ts: TimeSeries instance or one of its subclasses, _data_period has to be set
+    verbose: bool
+
+    Returns
+    -------
+    Copy of ts with the gaps closed. The attribute gap_statistics is a pandas.DataFrame with one row per gap
+    (gap_start, gap_end, duration_s, no_of_points_added).
+    """
     ts = ts.copy()
-    ts.data = ts.data.sort_index()
-    if type(ts.data).__name__ == 'Panel':
-        data = ts.data.items.values
-        index = ts.data.items
+    if type(ts._peek_data()).__name__ == 'Panel':
+        index = ts._peek_data().items
     else:
-        data = ts.data.index.values
-        index = ts.data.index
-
-    index_df = _pd.DataFrame(index = index)
+        if not ts._peek_data().index.is_monotonic_increasing:
+            ts._share_data(None, ts._peek_data().sort_index())
+        index = ts._peek_data().index
 
-    dt = data[1:] - data[:-1]
-    dt = dt / _np.timedelta64(1,'s')
+    times = index.values.astype('datetime64[ns]').astype(_np.int64)
+    dt = _np.diff(times) / 1e9
 
     median = _np.median(dt)
 
     if median > (1.1 * ts._data_period) or median < (0.9 * ts._data_period):
         _warnings.warn('There is a periode and median missmatch (%0.1f,%0.1f), this is either due to an error in the assumed period or becuase there are too many gaps in the _timeseries.'%(median,ts._data_period))
 
-    point_dist = (index.values[1:] - index.values[:-1]) / _np.timedelta64(1, 's')
-    where = point_dist > 2 * ts._data_period
-    off_periods = _np.array([index[:-1][where], index[1:][where]]).transpose()
+    where = _np.where(dt > 2 * ts._data_period)[0]
+    gap_start = times[where]
+    # number of time stamps added to each gap, the gap end itself is not added
+    no_added = (_np.round(dt[where]) / ts._data_period).astype(_np.int64) - 1
+    no_added = _np.maximum(no_added, 0)
+    total = no_added.sum()
+
+    # k * data period after the gap start, k = 1 ... no_added, for all gaps at once
+    first_of_gap = _np.cumsum(no_added) - no_added
+    k = _np.arange(total) - _np.repeat(first_of_gap, no_added) + 1
+    period_ns = int(round(ts._data_period * 1e9))
+    new_times = _np.repeat(gap_start, no_added) + k * period_ns
+
+    ts.gap_statistics = _pd.DataFrame({'gap_start': _pd.to_datetime(gap_start),
+                                       'gap_end': _pd.to_datetime(times[where + 1]),
+                                       'duration_s': dt[where],
+                                       'no_of_points_added': no_added},
+                                      columns=['gap_start', 'gap_end', 'duration_s', 'no_of_points_added'])
     if verbose:
-        print('found %i gaps'%(off_periods.shape[0]))
-    for i, op in enumerate(off_periods):
-        no_periods = round((op[1] - op[0])/ _np.timedelta64(1,'s')) / ts._data_period
-        out = _pd.date_range(start = op[0], periods= no_periods, freq= '%i s'%ts._data_period)
-        out = out[1:]
-        out = _pd.DataFrame(index = out)
-        index_df = _pd.concat([index_df, out])
-
-    index_df.sort_index(inplace=True)
-    ts.data = ts.data.reindex(index_df.index)
+        print('found %i gaps, %i time stamps added'%(where.shape[0], total))
+
+    if total:
+        new_index = _np.sort(_np.concatenate((times, new_times)), kind='mergesort')
+        new_index = _pd.DatetimeIndex(new_index.astype('datetime64[ns]'), name=index.name)
+        if getattr(index, 'tz', None) is not None:
+            new_index = new_index.tz_localize('UTC').tz_convert(index.tz)
+        ts._share_data(None, ts._peek_data().reindex(new_index))
     return ts
 
 
-def align_to(ts, ts_other, verbose= False):
+def align_to(ts, ts_other, verbose= False, max_gap = None):
     """
     Align the TimeSeries ts to another time_series by interpolating (linearly). If
     data periods differe by at least a factor of 2 a rolling mean is calculated
@@ -171,21 +195,23 @@ def align_to(ts, ts_other, verbose= False):
     ----------
     ts: original time series
     ts_other: timeseries to align to
+    max_gap: float, optional
+        see merge
 
     Returns
     -------
     timeseries eqivalent to the original but with an index aligned to the other
     """
-    ts = ts.copy()
-    ts_other = ts_other.copy()
     if verbose:
         print('=================================')
         print('=====  perform alignment ========')
+    # ts_other can also be e.g. a SizeDist_TS, its IndexSlicer gives the index without handing out the data
+    index_other = ts_other._get_index_slicer().index
     # if _np.all(ts.data.index == ts_other.data.index):
-    if _np.array_equal(ts.data.index, ts_other.data.index):
+    if _np.array_equal(ts._peek_data().index, index_other):
         if verbose:
             print('indeces are identical, returning original time series.')
-        return ts
+        return ts.copy()
 
     window = ts_other._data_period / ts._data_period
     if window < 0.5:
@@ -196,9 +222,9 @@ def align_to(ts, ts_other, verbose= False):
     if window > 2:
         if verbose:
             print('Data period difference larger than a factor of 2 -> performing rolling mean')
-        roll = ts.data.rolling(window,
-                               min_periods=1,
-                               center=True)
+        roll = ts._peek_data().rolling(window,
+                                       min_periods=1,
+                                       center=True)
         dfrm = roll.mean()
 
         tsrm = TimeSeries(_pd.DataFrame(dfrm))
@@ -208,11 +234,12 @@ def align_to(ts, ts_other, verbose= False):
             print('Data period difference smaller than a factor of 2 -> do nothing')
         tsrm = ts
 
-    ts_other.data = ts_other.data.loc[:,[]]
+    # neither ts nor ts_other are copied, only the time stamps of ts_other are used
+    ts_index = TimeSeries(_pd.DataFrame(index=index_other))
     if verbose:
         print('performing merge with empty index of other time series')
-    ts_t =  merge(ts_other, tsrm, verbose = verbose)
-    tsrm.data = ts_t.data
+    ts_t =  merge(ts_index, tsrm, verbose = verbose, max_gap = max_gap)
+    tsrm = tsrm._copy_with_data(ts_t._peek_data(), None)
     tsrm._data_period = ts_other._data_period
     if verbose:
         print('=====  alignment done ========')
@@ -221,16 +248,26 @@ def align_to(ts, ts_other, verbose= False):
     return tsrm
 
 
-def merge(ts, ts_other, verbose = False):
+def merge(ts, ts_other, verbose = False, max_gap = None):
     """ Merges current with other timeseries. The returned timeseries has the same time-axes as the current
     one (as opposed to the one merged into it). Missing or offset data points are linearly interpolated.
 
+    Each column of the other time series is interpolated directly onto the time stamps of the current one
+    (np.interp on the sorted time stamps). Time stamps are only interpolated if the two neighboring valid (not nan)
+    values of the column are at most max_gap apart, otherwise and outside the range of the other time series the
+    result is nan. Non-numeric columns are only taken where the time stamps match exactly. Duplicate time stamps in
+    the other time series are averaged (non-numeric columns: first valid value). Columns which exist in both time
+    series are not duplicated, instead the nan values of the current one are filled with those of the other one.
+
     Argument
     --------
     ts_orig: the other time series will be merged to this, therefore this timeseries
     will define the time stamps.
     ts: timeseries or one of its subclasses.
         List of TimeSeries objects.
+    max_gap: float, optional
+        Largest gap (in seconds) in the other time series that is interpolated over. Default is twice the data
+        period of the other time series (the median time difference if _data_period is not set).
 
     Returns
     -------
@@ -241,44 +278,86 @@ def merge(ts, ts_other, verbose = False):
         print('=================================')
         print('=====  perform merge ========')
 
-    ts_this = ts.copy()
-
-    # if _np.all(ts_this.data.index == ts_other.data.index):
-    if _np.array_equal(ts_this.data.index, ts_other.data.index):
-        ts_this.data = _pd.concat([ts_this.data, ts_other.data], axis=1)
+    # if _np.all(ts.data.index == ts_other.data.index):
+    if _np.array_equal(ts._peek_data().index, ts_other._peek_data().index):
+        merged = ts_other._peek_data()
 
     else:
-        ts_data_list = [ts_this.data, ts_other.data]
-        # catsortinterp = _pd.concat(ts_data_list).sort_index().interpolate(method='index')
-        # merged = catsortinterp.groupby(catsortinterp.index).mean().reindex(ts_data_list[0].index)
-        # ts_this.data = merged
-
-        # ts_data_list = [data.data, correlant_nocol]
-        catsort = _pd.concat(ts_data_list).sort_index()  # .interpolate(method='index')
-
-        mask = catsort.copy()
-        grp = ((mask.notnull() != mask.shift().notnull()).cumsum())
-        grp['ones'] = 1
-        for i in catsort.columns:
-            mask[i] = (grp.groupby(i)['ones'].transform('count') < 2) | catsort[i].notnull()
+        other = ts_other._peek_data()
+        if not other.index.is_monotonic_increasing:
+            other = other.sort_index(kind='mergesort')
+        if not other.index.is_unique:
+            # average duplicate time stamps, non-numeric columns take the first valid value
+            how = {col: 'mean' if _np.issubdtype(other[col].dtype, _np.number) else 'first' for col in other.columns}
+            other = other.groupby(level=0).agg(how)
+
+        index = ts._peek_data().index
+        times = index.values.astype('datetime64[ns]').astype(_np.int64)
+        times_other = other.index.values.astype('datetime64[ns]').astype(_np.int64)
+
+        if max_gap is None:
+            data_period = getattr(ts_other, '_data_period', None)
+            if data_period:
+                max_gap = 2 * data_period
+            elif times_other.shape[0] > 1:
+                max_gap = 2 * _np.median(_np.diff(times_other)) / 1e9
+            else:
+                max_gap = 0
+        max_gap = max_gap * 1e9
 
-        catsortinterp = catsort.interpolate(method='index')
-        catsortinterpmasked = catsortinterp[mask]
+        columns = {}
+        for col in other.columns:
+            if _np.issubdtype(other[col].dtype, _np.number):
+                columns[col] = _interpolate_column(times, times_other, other[col].values.astype(float), max_gap)
+            else:
+                columns[col] = other[col].reindex(index).values
+        merged = _pd.DataFrame(columns, index=index, columns=other.columns)
 
-        merged = catsortinterpmasked.groupby(catsortinterpmasked.index).mean().reindex(ts_data_list[0].index)
-        ts_this.data = merged
+    ts_this = ts._copy_with_data(_join_columns(ts._peek_data(), merged), None)
 
     if verbose:
         print('=====  merge done ========')
         print('==========================')
     return ts_this
 
+def _join_columns(data, other):
+    """Joins the columns of other (same index as data) to data. Columns which exist in both are not duplicated,
+    the nan values of data are filled with the values of other."""
+    overlap = data.columns.intersection(other.columns)
+    joined = _pd.concat([data, other.drop(columns=overlap)], axis=1)
+    if overlap.shape[0]:
+        joined[overlap] = data[overlap].fillna(other[overlap])
+    return joined
+
+def _interpolate_column(times, times_other, values, max_gap):
+    """Linearly interpolates values given at times_other (int64, sorted, unique) onto times (int64). Points which
+    are not at a valid time stamp are nan if the neighboring valid values are more than max_gap apart or if they are
+    outside the range of the valid values."""
+    out = _np.full(times.shape, _np.nan)
+    valid = ~ _np.isnan(values)
+    xp = times_other[valid]
+    fp = values[valid]
+    if xp.shape[0] == 0:
+        return out
+
+    # relative to the first valid time stamp, so the conversion to float does not lose precision
+    interpolated = _np.interp((times - xp[0]).astype(float), (xp - xp[0]).astype(float), fp)
+
+    right = _np.searchsorted(xp, times, side='left')
+    right_clipped = _np.minimum(right, xp.shape[0] - 1)
+    left_clipped = _np.maximum(right - 1, 0)
+    exact = xp[right_clipped] == times
+    inside = (right > 0) & (right < xp.shape[0])
+    within_gap = inside & ((xp[right_clipped] - xp[left_clipped]) <= max_gap)
+    use = exact | within_gap
+    out[use] = interpolated[use]
+    return out
+
 def concat(ts_list):
     for ts in ts_list:
         if type(ts).__name__ != 'TimeSeries':
             raise TypeError('Currently works only with TimeSeries not with %s'%(type(ts).__name__))
-    ts = ts_list[0].copy()
-    ts.data = _pd.concat([i.data for i in ts_list])
+    ts = ts_list[0]._copy_with_data(_pd.concat([i._peek_data() for i in ts_list]), None)
 
     return ts
 
@@ -305,37 +384,88 @@ def correlate(data,correlant, data_column = False, correlant_column = False, rem
     out._x_label_orig = 'DataTime'
     return out
 
-def rolling_correlation(data, correlant, window, min_good_ratio = 0.67, verbose = True):
-    "time as here: http://docs.scipy.org/doc/numpy/reference/arrays.datetime.html#datetime-units"
+def rolling_correlation(data, correlant, window, min_good_ratio = 0.67, verbose = True, data_column = False,
+                        correlant_column = False, remove_zeros = True):
+    """Rolling Pearson correlation coefficient and linear regression (correlant versus data). The correlant is
+    aligned to data first. All windows are calculated at once from running (cumulative) sums, nan values are
+    excluded from the sums and counted separately.
+
+    Parameters
+    ----------
+    data, correlant: TimeSeries instances
+    window: tuple
+        length of the window, e.g. (1, 'h'), see
+        http://docs.scipy.org/doc/numpy/reference/arrays.datetime.html#datetime-units
+    min_good_ratio: float
+        Windows in which the fraction of time stamps at which neither data nor correlant is nan is smaller than
+        this are nan.
+    data_column, correlant_column: str, optional
+        Column to correlate, default is the first column.
+    remove_zeros: bool
+        If zeros are excluded from the correlation (see atmPy.tools.array_tools.Correlation).
+
+    Returns
+    -------
+    TimeSeries instance with the columns pearson_r, slope, intercept, and no_of_points. The time stamp is the
+    center of each window.
+    """
 
     correlant = correlant.align_to(data) # I do align before merge, because it is more suffisticated!
-    merged = data.copy()
-    merged.data['correlant'] = correlant.data
+    if data_column:
+        x = data.data[data_column].values.astype(float)
+    else:
+        x = data.data.iloc[:, 0].values.astype(float)
+    if correlant_column:
+        y = correlant.data[correlant_column].values.astype(float)
+    else:
+        y = correlant.data.iloc[:, 0].values.astype(float)
 
-    data_period = _np.timedelta64(int(merged._data_period), 's')
+    data_period = _np.timedelta64(int(data._data_period), 's')
     window = _np.timedelta64(window[0], window[1])
     window = int(window/data_period)
     if verbose:
         print('Each window contains %s data points of which at least %s are not nan.'%(window, int(window * min_good_ratio)))
 
     min_good = window * min_good_ratio
-    size = merged.data.shape[0]-window + 1
-    timestamps = _pd.TimeSeries(_pd.to_datetime(_pd.Series(_np.zeros(size))))
-    pear_r = _np.zeros(size)
-    for i in range(size):
-        secment = TimeSeries(merged.data.iloc[i:i+window,:])
-        secment._data_period = merged._data_period
-    #     print(secment.data.dropna().shape[0] < min_good)
-        if secment.data.dropna().shape[0] < min_good:
-            pear_r[i]= _np.nan
-        else:
-            corr = secment.correlate_to(secment, data_column=merged.data.columns[0], correlant_column=merged.data.columns[1])
-            pear_r[i] = corr.pearson_r[0]
-        timestamps.iloc[i] = secment.data.index[0] + ((secment.data.index[-1] - secment.data.index[0])/2.)
-    #     break
-
-    pear_r_ts = TimeSeries(_pd.DataFrame(pear_r, index = timestamps, columns = ['pearson_r']))
-    pear_r_ts._data_period = merged._data_period
+    size = max(x.shape[0] - window + 1, 0)
+
+    good = ~ _np.isnan(x) & ~ _np.isnan(y)
+    use = good.copy()
+    if remove_zeros:
+        use &= (x != 0) & (y != 0)
+    # center the values, this reduces the loss of precision in the running sums
+    x_mean = x[use].mean() if use.any() else 0.
+    y_mean = y[use].mean() if use.any() else 0.
+    x = _np.where(use, x - x_mean, 0.)
+    y = _np.where(use, y - y_mean, 0.)
+
+    def window_sum(values):
+        cumsum = _np.zeros(values.shape[0] + 1)
+        cumsum[1:] = _np.cumsum(values)
+        return cumsum[window:] - cumsum[:size]
+
+    no_good = window_sum(good)
+    n = window_sum(use)
+    sum_x, sum_y = window_sum(x), window_sum(y)
+    with _np.errstate(invalid='ignore', divide='ignore'):
+        cov = window_sum(x * y) - sum_x * sum_y / n
+        var_x = window_sum(x * x) - sum_x ** 2 / n
+        var_y = window_sum(y * y) - sum_y ** 2 / n
+        pear_r = cov / _np.sqrt(var_x * var_y)
+        slope = cov / var_x
+        intercept = (sum_y - slope * sum_x) / n + y_mean - slope * x_mean
+    invalid = (no_good < min_good) | (n < 2)
+    for values in (pear_r, slope, intercept):
+        values[invalid] = _np.nan
+
+    times = data.data.index.values.astype('datetime64[ns]').astype(_np.int64)
+    timestamps = _pd.to_datetime(times[:size] + (times[window - 1:] - times[:size]) // 2)
+
+    out = _pd.DataFrame({'pearson_r': pear_r, 'slope': slope, 'intercept': intercept,
+                         'no_of_points': n.astype(_np.int64)},
+                        index = timestamps, columns = ['pearson_r', 'slope', 'intercept', 'no_of_points'])
+    pear_r_ts = TimeSeries(out)
+    pear_r_ts._data_period = data._data_period
     pear_r_ts._y_label = 'r'
     return pear_r_ts
 
@@ -373,8 +503,6 @@ class TimeSeries(object):
         return self.data.__repr__()
 
     def __truediv__(self,other):
-        self = self.copy()
-        other = other.copy()
         if self._data_period > other._data_period:
             other = other.align_to(self)
             # other._data_period = self._data_period
@@ -382,10 +510,10 @@ class TimeSeries(object):
             self = self.align_to(other)
             # self._data_period = other._data_period
         # return self,other
-        if other.data.shape[1] == 1:
-            out = self.data.divide(other.data.iloc[:,0], axis = 0)
-        elif self.data.shape[1] == 1:
-            out = other.data.divide(self.data.iloc[:,0], axis = 0)
+        if other._peek_data().shape[1] == 1:
+            out = self._peek_data().divide(other._peek_data().iloc[:,0], axis = 0)
+        elif self._peek_data().shape[1] == 1:
+            out = other._peek_data().divide(self._peek_data().iloc[:,0], axis = 0)
             out = 1/out
         else:
             txt = 'at least one of the dataframes have to have one column only'
@@ -396,8 +524,6 @@ class TimeSeries(object):
         return ts
 
     def __add__(self,other):
-        self = self.copy()
-        other = other.copy()
         if self._data_period > other._data_period:
             other = other.align_to(self)
             other._data_period = self._data_period
@@ -405,10 +531,10 @@ class TimeSeries(object):
             self = self.align_to(other)
             self._data_period = other._data_period
 
-        if other.data.shape[1] == 1:
-            out = self.data.add(other.data.iloc[:,0], axis = 0)
-        elif self.data.shape[1] == 1:
-            out = other.data.add(self.data.iloc[:,0], axis = 0)
+        if other._peek_data().shape[1] == 1:
+            out = self._peek_data().add(other._peek_data().iloc[:,0], axis = 0)
+        elif self._peek_data().shape[1] == 1:
+            out = other._peek_data().add(self._peek_data().iloc[:,0], axis = 0)
         else:
             txt = 'at least one of the dataframes have to have one column only'
             raise ValueError(txt)
@@ -418,8 +544,6 @@ class TimeSeries(object):
         return ts
 
     def __sub__(self,other):
-        self = self.copy()
-        other = other.copy()
         if self._data_period > other._data_period:
             other = other.align_to(self)
             other._data_period = self._data_period
@@ -427,10 +551,10 @@ class TimeSeries(object):
             self = self.align_to(other)
             self._data_period = other._data_period
 
-        if other.data.shape[1] == 1:
-            out = self.data.sub(other.data.iloc[:,0], axis = 0)
-        elif self.data.shape[1] == 1:
-            out = other.data.sub(self.data.iloc[:,0], axis = 0)
+        if other._peek_data().shape[1] == 1:
+            out = self._peek_data().sub(other._peek_data().iloc[:,0], axis = 0)
+        elif self._peek_data().shape[1] == 1:
+            out = other._peek_data().sub(self._peek_data().iloc[:,0], axis = 0)
             out = - out
         else:
             txt = 'at least one of the dataframes have to have one column only'
@@ -441,8 +565,6 @@ class TimeSeries(object):
         return ts
 
     def __mul__(self,other):
-        self = self.copy()
-        other = other.copy()
         if self._data_period > other._data_period:
             other = other.align_to(self)
             other._data_period = self._data_period
@@ -450,10 +572,10 @@ class TimeSeries(object):
             self = self.align_to(other)
             self._data_period = other._data_period
 
-        if other.data.shape[1] == 1:
-            out = self.data.multiply(other.data.iloc[:,0], axis = 0)
-        elif self.data.shape[1] == 1:
-            out = other.data.multiply(self.data.iloc[:,0], axis = 0)
+        if other._peek_data().shape[1] == 1:
+            out = self._peek_data().multiply(other._peek_data().iloc[:,0], axis = 0)
+        elif self._peek_data().shape[1] == 1:
+            out = other._peek_data().multiply(self._peek_data().iloc[:,0], axis = 0)
         else:
             txt = 'at least one of the dataframes have to have one column only'
             raise ValueError(txt)
@@ -464,13 +586,76 @@ class TimeSeries(object):
 
     @property
     def data(self):
-        return self.__data
+        """Copies (copy) and time slices (zoom_time) share the data with the instance they were created from
+        until it is accessed through this attribute (copy-on-write). A DataFrame which has been handed out (by this
+        attribute or its setter, this includes the DataFrame passed to __init__) can be modified in place at any
+        time, it is therefore never shared but copied right away."""
+        if self._data_shared:
+            self._data = self._data.copy()
+            self._data_shared = False
+        self._data_exposed = True
+        return self._data
 
     @data.setter
     def data(self, data):
         if not type(data).__name__ == 'DataFrame':
             raise TypeError('Data has to be of type DataFrame. It currently is of type: %s'%(type(data).__name__))
-        self.__data = data
+        self._data = data
+        self._data_shared = False
+        # the caller keeps a reference to data
+        self._data_exposed = True
+
+    def _peek_data(self):
+        """Returns the data without copying it or marking it as handed out (see data). Only for reading, the
+        returned DataFrame must not be modified."""
+        return self._data
+
+    def _share_data(self, ts, data):
+        """Sets the data without copying it. data is the data of ts or a part of it (e.g. a view), both instances
+        are marked as shared and copy the data before it is handed out (see data). If the data of ts has already
+        been handed out, data is copied right away. If ts is None, data is a new DataFrame."""
+        if ts is not None and getattr(ts, '_data_exposed', True):
+            data = data.copy()
+            ts = None
+        if ts is not None:
+            ts._data_shared = True
+        self._data = data
+        self._data_shared = ts is not None
+        self._data_exposed = False
+
+    def _get_index_slicer(self):
+        """IndexSlicer (binary search) of the time stamps, cached as long as the index does not change"""
+        self._index_slicer = _pandas_tools.get_index_slicer(self._peek_data().index,
+                                                            getattr(self, '_index_slicer', None))
+        return self._index_slicer
+
+    def __deepcopy__(self, memo):
+        # the data is shared copy-on-write (see data), the remaining attributes (e.g. info) are small and are
+        # deep-copied. This also applies to TimeSeries which are attributes of other objects (e.g. housekeeping).
+        return self._copy_with_data(self.__dict__.get('_data'), self, self.__dict__.get('_index_slicer'), memo)
+
+    def _copy_with_data(self, data, source, index_slicer=None, memo=None):
+        """Copy of the instance with data as its data, the other attributes are deep-copied. If source is the
+        instance, data is its data or a time slice of it (with its IndexSlicer) and is shared copy-on-write (see
+        _share_data). If source is None, data is a new DataFrame."""
+        if memo is None:
+            memo = {}
+        out = self.__class__.__new__(self.__class__)
+        memo[id(self)] = out
+        has_data = '_data' in self.__dict__
+        shared = ('_data', '_data_shared', '_data_exposed', '_index_slicer')
+        for key, value in self.__dict__.items():
+            if has_data and key in shared:
+                continue
+            out.__dict__[key] = _deepcopy(value, memo)
+        if has_data:
+            out._share_data(source, data)
+            out._index_slicer = index_slicer
+        return out
+
+    def copy(self):
+        """Returns a copy of the instance. The data is not copied until it is accessed (see data)."""
+        return _deepcopy(self)
 
 
 
@@ -497,8 +682,8 @@ class TimeSeries(object):
 
         Arguments
         ---------
-        window: int
-            window over which to average in seconds. For aliases see
+        window: int or str
+            window over which to average in seconds, or an offset alias. For aliases see
             http://pandas.pydata.org/pandas-docs/stable/timeseries.html#offset-aliases
 
         Returns
@@ -507,8 +692,9 @@ class TimeSeries(object):
             copy of current instance with resampled data frame
         """
 
-        ts = self.copy()
-        ts.data = ts.data.resample('%iS'%window, closed='right', label='right')
+        if not isinstance(window, str):
+            window = '%iS'%window
+        ts = self._copy_with_data(self._peek_data().resample(window, closed='right', label='right').mean(), None)
 
         return ts
 
@@ -524,8 +710,6 @@ class TimeSeries(object):
 
     merge = merge
 
-    copy = _deepcopy
-
     def plot(self, ax = None, legend = True, label = None, **kwargs):
         """Plot each parameter separately versus time
         Arguments
@@ -558,7 +742,9 @@ class TimeSeries(object):
         return ax
 
     def zoom_time(self, start=None, end=None, copy=True):
-        """ Selects a strech of time from a housekeeping instance.
+        """ Selects a strech of time from a housekeeping instance. The time stamps are found by binary search
+        (see atmPy.tools.pandas_tools.IndexSlicer), for a sorted index this does not depend on the length of the
+        time series.
 
         Arguments
         ---------
@@ -581,22 +767,15 @@ class TimeSeries(object):
         >>> hk_zoom = zoom_time(hk, start = launch, end= landing)
         """
 
+        # binary search on the time stamps, the slice is a view on the data, it is only copied when it is accessed
+        # (see data)
+        data, index_slicer = self._get_index_slicer().slice(self._peek_data(), start=start, end=end)
         if copy:
-            housek = self.copy()
+            housek = self._copy_with_data(data, self, index_slicer)
         else:
             housek = self
-
-        if start:
-            start = _time_tools.string2timestamp(start)
-        if end:
-            end = _time_tools.string2timestamp(end)
-
-        try:
-            housek.data = housek.data.truncate(before=start, after=end)
-        except KeyError:
-            txt = '''This error is most likely related to the fact that the index of the timeseries is not in order.
-                  Run the sort_index() attribute of the DataFrame'''
-            raise KeyError(txt)
+            housek._share_data(self, data)
+            housek._index_slicer = index_slicer
 
         if copy:
             return housek
@@ -626,8 +805,7 @@ class TimeSeries(object):
         -------
         tuple of timestamps
         """
-        start = self.data.index[0]
-        end = self.data.index[-1]
+        start, end = self._get_index_slicer().get_span()
         print('start: %s' % start.strftime('%Y-%m-%d %H:%M:%S.%f'))
         print('end:   %s' % end.strftime('%Y-%m-%d %H:%M:%S.%f'))
         return start, end
@@ -683,6 +861,9 @@ class TimeSeries_3D(TimeSeries):
             raise TypeError('Data has to be of type DataFrame. It currently is of type: %s'%type(data).__name__)
         self.__data = data
 
+    def _peek_data(self):
+        return self.__data
+
     def plot(self, xaxis = 0, yaxis = 1, sub_set = 0, ax = None, kwargs = {}):
 
         f,a,pc,cb =  _pandas_tools.plot_panel_meshgrid(self.data, xaxis = xaxis,
@@ -4,6 +4,7 @@ from copy import deepcopy as _deepcopy
 
 import atmPy.general.timeseries
 from atmPy.tools import plt_tools
+from atmPy.tools import pandas_tools as _pandas_tools
 
 
 class VerticalProfile(object):
@@ -43,6 +44,31 @@ class VerticalProfile(object):
     def copy(self):
         return _deepcopy(self)
 
+    def _get_index_slicer(self):
+        """IndexSlicer (binary search) of the altitudes, cached as long as the index does not change"""
+        self._index_slicer = _pandas_tools.get_index_slicer(self.data.index, getattr(self, '_index_slicer', None))
+        return self._index_slicer
+
+    def zoom_altitude(self, bottom=None, top=None):
+        """Returns a copy which only contains the altitudes between bottom and top (both included). The altitudes
+        are found by binary search, only the selected part of the data is copied.
+
+        Arguments
+        ---------
+        bottom: float, optional
+        top: float, optional
+        """
+        data, index_slicer = self._get_index_slicer().slice(self.data, start=bottom, end=top)
+        # copy everything but the data
+        out = self.__class__.__new__(self.__class__)
+        memo = {id(self): out}
+        for key, value in self.__dict__.items():
+            if key not in ('data', '_index_slicer'):
+                out.__dict__[key] = _deepcopy(value, memo)
+        out.data = data.copy()
+        out._index_slicer = _pandas_tools.IndexSlicer(out.data.index, is_sorted=index_slicer.is_sorted)
+        return out
+
     def convert2timeseries(self, ts):
         """merges a vertical profile with a timeseries that contains height data
         and returns the a time series where the data of the vertical profile is interpolated
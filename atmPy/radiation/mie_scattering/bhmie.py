@@ -2,6 +2,15 @@
 import numpy as np
 import pandas as pd
 
+try:
+    import numba as _numba
+except ImportError:
+    _numba = None
+
+# If numba is available the Mie series is summed by a compiled kernel, set this to False to use the numpy
+# implementation instead.
+use_compiled = _numba is not None
+
 class bhmie_hagen():
     """ 
         
@@ -19,6 +28,9 @@ class bhmie_hagen():
          input optional:
               diameter - to calculate the crosssections this value is needed, and yes this is really diameter not radius
               I am an idiot
+              angles - array of scattering angles (radians, between 0 and pi) at which S1 and S2 are calculated.
+                       If given, noOfAngles is ignored and S1 and S2 are not mirrored to the range from pi to 2pi.
+                       Use this for high angular resolution in narrow windows (e.g. near forward and backward).
          Returns
          -------
          S1, S2 - funtion which correspond to the (complex) phase functions
@@ -27,9 +39,10 @@ class bhmie_hagen():
          Qback  - backscatter efficiency
          gsca   - asymmetry parameter"""
 
-    def __init__(self, x, refrel, noOfAngles, diameter=False):
+    def __init__(self, x, refrel, noOfAngles, diameter=False, angles=None):
         self.diameter = diameter
         self.noOfAngles = noOfAngles
+        self.angles = angles
         self.sizeParameter = x
         self.indOfRefraction = refrel
 
@@ -38,119 +51,42 @@ class bhmie_hagen():
         # is necessary so the integral of the scattering function is equal to the
         # scattering crossection and the integral over the phase function is 4 pi
 
-        s1_1=np.zeros(self.noOfAngles,dtype=np.complex128)
-        s1_2=np.zeros(self.noOfAngles,dtype=np.complex128)
-        s2_1=np.zeros(self.noOfAngles,dtype=np.complex128)
-        s2_2=np.zeros(self.noOfAngles,dtype=np.complex128)
-        pi=np.zeros(self.noOfAngles,dtype=np.complex128)
-        tau=np.zeros(self.noOfAngles,dtype=np.complex128)
-
-        if (self.noOfAngles > 1000):
-            print ('error: self.noOfAngles > mxself.noOfAngles=1000 in bhmie')
-            return
-
-        # Require NANG>1 in order to calculate scattering intensities
-        if (self.noOfAngles < 2):
-            self.noOfAngles = 2
-
-        pii = 4.*np.arctan(1.)
-
         self.calc_noOfTerms()
 
-        dang = .5*pii/ (self.noOfAngles-1)
-
-        amu=np.arange(0.0,self.noOfAngles,1)
-        amu=np.cos(amu*dang)
-
-        pi0=np.zeros(self.noOfAngles,dtype=np.complex128)
-        pi1=np.ones(self.noOfAngles,dtype=np.complex128)
-        
-        # TODO - get rid of this nonsense!  Why rename?
-        logDeriv = self.get_logDeriv()
-        
-
-
-
-        # Riccati-Bessel functions with real argument X
-        # calculated by upward recurrence
-
-        psi0 = np.cos(self.sizeParameter)
-        psi1 = np.sin(self.sizeParameter)
-        chi0 = -np.sin(self.sizeParameter)
-        chi1 = np.cos(self.sizeParameter)
-        xi1 = psi1-chi1*1j
-        qsca = 0.
-        gsca = 0.
-        p = -1
-
-        for n in range(0, self.noOfTermses[0]):
-            en = n+1.0
-            fn = (2.*en+1.)/(en* (en+1.))
-
-        # for given N, PSI  = psi_n        CHI  = chi_n
-        #              PSI1 = psi_{n-1}    CHI1 = chi_{n-1}
-        #              PSI0 = psi_{n-2}    CHI0 = chi_{n-2}
-        # Calculate psi_n and chi_n
-            psi = (2.*en-1.)*psi1/self.sizeParameter - psi0
-            chi = (2.*en-1.)*chi1/self.sizeParameter - chi0
-            xi = psi-chi*1j
-        # Store previous values of AN and BN for use
-        # in computation of g=<cos(theta)>
-            if (n > 0):
-                an1 = an
-                bn1 = bn
-
-        
-            '''
-            These are the key parameters for the Mie calculations, an and bn,
-            used to comute the amplitudes of the scattering field.
-            '''
-            an = (logDeriv[n]/self.indOfRefraction+en/self.sizeParameter)*psi - psi1
-            an /= ((logDeriv[n]/self.indOfRefraction+en/self.sizeParameter)*xi-xi1)
-            bn = (self.indOfRefraction*logDeriv[n]+en/self.sizeParameter)*psi - psi1
-            bn /= ((self.indOfRefraction*logDeriv[n]+en/self.sizeParameter)*xi-xi1)
-
-        #*** Augment sums for Qsca and g=<cos(theta)>
-            qsca += (2.*en+1.)* (abs(an)**2+abs(bn)**2)
-            gsca += ((2.*en+1.)/ (en* (en+1.)))*( np.real(an)* np.real(bn)+np.imag(an)*np.imag(bn))
-
-            if (n > 0):
-                gsca += ((en-1.)* (en+1.)/en)*( np.real(an1)* np.real(an)+np.imag(an1)*np.imag(an)+np.real(bn1)* np.real(bn)+np.imag(bn1)*np.imag(bn))
-
-
-        #*** Now calculate scattering intensity pattern
-        #    First do angles from 0 to 90
-            pi=0+pi1    # 0+pi1 because we want a hard copy of the values
-            tau=en*amu*pi-(en+1.)*pi0
-            s1_1 += fn* (an*pi+bn*tau)
-            s2_1 += fn* (an*tau+bn*pi)
-        #*** Now do angles greater than 90 using PI and TAU from
-        #    angles less than 90.
-        #    P=1 for N=1,3,...% P=-1 for N=2,4,...
-        #   remember that we have to reverse the order of the elements
-        #   of the second part of s1 and s2 after the calculation
-            p = -p
-            s1_2+= fn*p* (an*pi-bn*tau)
-            s2_2+= fn*p* (bn*pi-an*tau)
-
-            psi0 = psi1
-            psi1 = psi
-            chi0 = chi1
-            chi1 = chi
-            xi1 = psi1-chi1*1j
-
-        #*** Compute pi_n for next value of n
-        #    For each angle J, compute pi_n+1
-        #    from PI = pi_n , PI0 = pi_n-1
-            pi1 = ((2.*en+1.)*amu*pi- (en+1.)*pi0)/ en
-            pi0 = 0+pi   # 0+pi because we want a hard copy of the values
+        if self.angles is None:
+            # Require NANG>1 in order to calculate scattering intensities
+            if (self.noOfAngles < 2):
+                self.noOfAngles = 2
 
-        #*** Have summed sufficient terms.
-        #    Now compute QSCA,QEXT,QBACK,and GSCA
+            pii = 4.*np.arctan(1.)
+            dang = .5*pii/ (self.noOfAngles-1)
 
-        #   we have to reverse the order of the elements of the second part of s1 and s2
-        s1=np.concatenate((s1_1,s1_2[-2::-1]))
-        s2=np.concatenate((s2_1,s2_2[-2::-1]))
+            amu=np.arange(0.0,self.noOfAngles,1)
+            amu=np.cos(amu*dang)
+        else:
+            self.angles = np.asarray(self.angles, dtype=float)
+            self.noOfAngles = self.angles.shape[0]
+            # forward and backward direction are needed for the extinction and backscatter efficiency
+            amu = np.concatenate(([1., -1.], np.cos(self.angles)))
+
+        s1_1, s1_2, s2_1, s2_2, qsca, gsca = _mie_series(np.array([self.sizeParameter], dtype=float),
+                                                          self.indOfRefraction, amu,
+                                                          np.array([self.noOfTermses[0]]),
+                                                          np.array([self.noOfTermses[1]]),
+                                                          mirror=self.angles is None)
+        s1_1, s1_2, s2_1, s2_2, qsca, gsca = s1_1[0], s1_2[0], s2_1[0], s2_2[0], qsca[0], gsca[0]
+
+        if self.angles is None:
+            #   we have to reverse the order of the elements of the second part of s1 and s2
+            s1=np.concatenate((s1_1,s1_2[-2::-1]))
+            s2=np.concatenate((s2_1,s2_2[-2::-1]))
+            self._s1_forward = s1[0]
+            self._s1_backward = s1[-1]
+        else:
+            s1 = s1_1[2:]
+            s2 = s2_1[2:]
+            self._s1_forward = s1_1[0]
+            self._s1_backward = s1_1[1]
         gsca = 2.*gsca/qsca
         qsca = (2./ (self.sizeParameter**2))*qsca
 #        qext = (4./ (self.sizeParameter**2))* real(s1[0])
@@ -229,7 +165,7 @@ class bhmie_hagen():
         
     def calc_qext(self):
         """extinction efficiency. normalized real part of s1 at 0 deg (forward)"""
-        self.qext = (4./ (self.sizeParameter**2))* np.real(self.s1[0])
+        self.qext = (4./ (self.sizeParameter**2))* np.real(self._s1_forward)
         if self.diameter:
             self.cext =  self.qext * self.diameter**2 * np.pi * 0.5**2
         else:
@@ -239,31 +175,36 @@ class bhmie_hagen():
         """ Backscattering efficiency. Looks like it simpy locks for the efficiency 
         at 180 deg... I am surprised why they are not simpy taking the last one?
         -> it is the same!! -> fixed"""
-        self.qback = 4*(abs(self.s1[-1])/self.sizeParameter)**2
+        self.qback = 4*(abs(self._s1_backward)/self.sizeParameter)**2
 
     def get_phase_func(self):
-        """ Returns the phase functions in the interval [0,2*pi).
+        """ Returns the phase functions in the interval [0,2*pi), or at the angles given at initialization.
 
         Note
         ----
         The phase phase function is normalized such that the integrale over the entire sphere is 4pi
         """
-        # out = self.get_angular_scatt_func() * 4 * np.pi/self.csca
-        s2r = self.s2[::-1]
-        s2f = np.append(self.s2, s2r[1:])
-        s2s = np.abs(s2f) ** 2
-        # ang = np.linspace(0, np.pi * 2, len(s2s))
-        # df = pd.DataFrame(s2s, index=ang, columns=['Phase_function_parallel'])
-        # df.index.name = 'Angle'
-
-        s1r = self.s1[::-1]
-        s1f = np.append(self.s1, s1r[1:])
-        s1s = np.abs(s1f) ** 2
+        if self.angles is not None:
+            s1s = np.abs(self.s1) ** 2
+            s2s = np.abs(self.s2) ** 2
+            ang = self.angles
+        else:
+            # out = self.get_angular_scatt_func() * 4 * np.pi/self.csca
+            s2r = self.s2[::-1]
+            s2f = np.append(self.s2, s2r[1:])
+            s2s = np.abs(s2f) ** 2
+            # ang = np.linspace(0, np.pi * 2, len(s2s))
+            # df = pd.DataFrame(s2s, index=ang, columns=['Phase_function_parallel'])
+            # df.index.name = 'Angle'
 
-        s12s = (s1s + s2s) / 2
+            s1r = self.s1[::-1]
+            s1f = np.append(self.s1, s1r[1:])
+            s1s = np.abs(s1f) ** 2
 
+            ang = np.linspace(0, np.pi * 2, len(s1s))
+
+        s12s = (s1s + s2s) / 2
 
-        ang = np.linspace(0, np.pi * 2, len(s1s))
         df = pd.DataFrame(np.array([s1s, s2s, s12s]).transpose(), index=ang,
                           columns=['perpendicular', 'parallel', 'natural'])
         df.index.name = 'angle'
@@ -272,7 +213,8 @@ class bhmie_hagen():
 
     def get_angular_scatt_func(self):
         """
-        Returns the angular scattering function for parallel scattering geometry in the interval [0,2*pi).
+        Returns the angular scattering function for parallel scattering geometry in the interval [0,2*pi), or at the
+        angles given at initialization.
 
         Note
         ----
@@ -345,6 +287,331 @@ class bhmie_hagen():
         return self.s1, self.s2, self.qext, self.qsca, self.qback, self.gsca
 
 
+def _mie_series(x, refrel, amu, nstop, nmx, mirror=True):
+    """Sums the Mie series for the size parameters x. The compiled kernel is used if numba is available and
+    use_compiled is True, otherwise the numpy implementation.
+
+    Parameters
+    ----------
+    x: 1D array
+        size parameters
+    refrel: complex
+        refraction index
+    amu: 1D array
+        cosines of the scattering angles. Any angle between 0 and pi is allowed, if mirror is True angles are
+        usually limited to the range from 0 to pi/2.
+    nstop: 1D int array
+        number of terms of the series for each size parameter
+    nmx: 1D array
+        start of the downward recurrence of the logarithmic derivative for each size parameter
+    mirror: bool, optional
+        If False the mirror images (_2) are not calculated.
+
+    Returns
+    -------
+    s1_1, s1_2, s2_1, s2_2: 2D arrays of shape (len(x), len(amu))
+        S1 and S2 at the angles given by amu (_1) and their mirror images at pi minus those angles (_2). If mirror
+        is False the mirror images have the shape (len(x), 0).
+    qsca, gsca: 1D arrays
+        the sums for the scattering efficiency and the asymmetry parameter (not yet normalized)
+    """
+    if use_compiled and _numba:
+        return _mie_series_compiled(np.asarray(x, dtype=np.float64), complex(refrel),
+                                    np.asarray(amu, dtype=np.float64),
+                                    np.asarray(nstop, dtype=np.int64), np.asarray(nmx, dtype=np.int64), mirror)
+    else:
+        return _mie_series_numpy(x, refrel, amu, nstop, nmx, mirror)
+
+
+def _mie_series_numpy(x, refrel, amu, nstop, nmx, mirror):
+    """numpy implementation of _mie_series, the recurrences are carried out for all size parameters at once"""
+    noOfAngles = amu.shape[0]
+
+    # Logarithmic derivative D(J) calculated by downward recurrence beginning with initial value (0.,0.) at J=NMX.
+    # All size parameters start at the largest NMX, which only adds accuracy for the smaller ones.
+    y = x * refrel
+    nmx = np.max(nmx)
+    nn = int(nmx) - 1
+    logDeriv = np.zeros((nn + 1, x.shape[0]), dtype=np.complex128)
+    for n in range(0, nn):
+        en = nmx - n
+        logDeriv[nn - n - 1] = (en / y) - (1. / (logDeriv[nn - n] + en / y))
+
+    noOfAngles_mirror = noOfAngles if mirror else 0
+    s1_1 = np.zeros((x.shape[0], noOfAngles), dtype=np.complex128)
+    s1_2 = np.zeros((x.shape[0], noOfAngles_mirror), dtype=np.complex128)
+    s2_1 = np.zeros((x.shape[0], noOfAngles), dtype=np.complex128)
+    s2_2 = np.zeros((x.shape[0], noOfAngles_mirror), dtype=np.complex128)
+
+    pi0 = np.zeros(noOfAngles)
+    pi1 = np.ones(noOfAngles)
+
+    # Riccati-Bessel functions with real argument X calculated by upward recurrence
+    psi0 = np.cos(x)
+    psi1 = np.sin(x)
+    chi0 = -np.sin(x)
+    chi1 = np.cos(x)
+    xi1 = psi1 - chi1 * 1j
+    qsca = np.zeros(x.shape)
+    gsca = np.zeros(x.shape)
+    an = np.zeros(x.shape, dtype=np.complex128)
+    bn = np.zeros(x.shape, dtype=np.complex128)
+    p = -1
+
+    # size parameters that need less terms than others are masked once they are done; the recurrence of
+    # those is allowed to run into overflows, which is why the warnings are suppressed
+    with np.errstate(all='ignore'):
+        for n in range(0, nstop.max()):
+            en = n + 1.0
+            fn = (2. * en + 1.) / (en * (en + 1.))
+            active = n < nstop
+
+            psi = (2. * en - 1.) * psi1 / x - psi0
+            chi = (2. * en - 1.) * chi1 / x - chi0
+            xi = psi - chi * 1j
+
+            an1 = an
+            bn1 = bn
+
+            an = (logDeriv[n] / refrel + en / x) * psi - psi1
+            an /= ((logDeriv[n] / refrel + en / x) * xi - xi1)
+            bn = (refrel * logDeriv[n] + en / x) * psi - psi1
+            bn /= ((refrel * logDeriv[n] + en / x) * xi - xi1)
+            an = np.where(active, an, 0)
+            bn = np.where(active, bn, 0)
+
+            # Augment sums for Qsca and g=<cos(theta)>
+            qsca += (2. * en + 1.) * (np.abs(an) ** 2 + np.abs(bn) ** 2)
+            gsca += ((2. * en + 1.) / (en * (en + 1.))) * (np.real(an) * np.real(bn) + np.imag(an) * np.imag(bn))
+            if (n > 0):
+                gsca += ((en - 1.) * (en + 1.) / en) * (np.real(an1) * np.real(an) + np.imag(an1) * np.imag(an) +
+                                                        np.real(bn1) * np.real(bn) + np.imag(bn1) * np.imag(bn))
+
+            # scattering intensity pattern, pi and tau only depend on the angle
+            pi = pi1
+            tau = en * amu * pi - (en + 1.) * pi0
+            an_c = an[:, np.newaxis]
+            bn_c = bn[:, np.newaxis]
+            s1_1 += fn * (an_c * pi + bn_c * tau)
+            s2_1 += fn * (an_c * tau + bn_c * pi)
+            if mirror:
+                p = -p
+                s1_2 += fn * p * (an_c * pi - bn_c * tau)
+                s2_2 += fn * p * (bn_c * pi - an_c * tau)
+
+            psi0 = psi1
+            psi1 = psi
+            chi0 = chi1
+            chi1 = chi
+            xi1 = psi1 - chi1 * 1j
+
+            pi1 = ((2. * en + 1.) * amu * pi - (en + 1.) * pi0) / en
+            pi0 = pi
+
+    return s1_1, s1_2, s2_1, s2_2, qsca, gsca
+
+
+if _numba:
+    @_numba.njit(nogil=True, parallel=True, cache=True)
+    def _mie_series_compiled(x, refrel, amu, nstop, nmx, mirror):
+        """compiled implementation of _mie_series, size parameters are processed in parallel"""
+        noOfAngles = amu.shape[0]
+        noOfAngles_mirror = noOfAngles if mirror else 0
+        s1_1 = np.zeros((x.shape[0], noOfAngles), dtype=np.complex128)
+        s1_2 = np.zeros((x.shape[0], noOfAngles_mirror), dtype=np.complex128)
+        s2_1 = np.zeros((x.shape[0], noOfAngles), dtype=np.complex128)
+        s2_2 = np.zeros((x.shape[0], noOfAngles_mirror), dtype=np.complex128)
+        qsca = np.zeros(x.shape[0])
+        gsca = np.zeros(x.shape[0])
+
+        # as in _mie_series_numpy all size parameters start at the largest NMX
+        nmx_max = nmx.max()
+        for i in _numba.prange(x.shape[0]):
+            # Logarithmic derivative D(J) calculated by downward recurrence beginning with initial value (0.,0.)
+            # at J=NMX
+            y = x[i] * refrel
+            nn = nmx_max - 1
+            logDeriv = np.zeros(nn + 1, dtype=np.complex128)
+            for n in range(0, nn):
+                en = nmx_max - n
+                logDeriv[nn - n - 1] = (en / y) - (1. / (logDeriv[nn - n] + en / y))
+
+            pi0 = np.zeros(noOfAngles)
+            pi1 = np.ones(noOfAngles)
+
+            # Riccati-Bessel functions with real argument X calculated by upward recurrence
+            psi0 = np.cos(x[i])
+            psi1 = np.sin(x[i])
+            chi0 = -np.sin(x[i])
+            chi1 = np.cos(x[i])
+            xi1 = psi1 - chi1 * 1j
+            an = 0j
+            bn = 0j
+            p = -1.
+            for n in range(0, nstop[i]):
+                en = n + 1.0
+                fn = (2. * en + 1.) / (en * (en + 1.))
+
+                psi = (2. * en - 1.) * psi1 / x[i] - psi0
+                chi = (2. * en - 1.) * chi1 / x[i] - chi0
+                xi = psi - chi * 1j
+
+                an1 = an
+                bn1 = bn
+
+                an = (logDeriv[n] / refrel + en / x[i]) * psi - psi1
+                an /= ((logDeriv[n] / refrel + en / x[i]) * xi - xi1)
+                bn = (refrel * logDeriv[n] + en / x[i]) * psi - psi1
+                bn /= ((refrel * logDeriv[n] + en / x[i]) * xi - xi1)
+
+                # Augment sums for Qsca and g=<cos(theta)>
+                qsca[i] += (2. * en + 1.) * (abs(an) ** 2 + abs(bn) ** 2)
+                gsca[i] += ((2. * en + 1.) / (en * (en + 1.))) * (an.real * bn.real + an.imag * bn.imag)
+                if (n > 0):
+                    gsca[i] += ((en - 1.) * (en + 1.) / en) * (an1.real * an.real + an1.imag * an.imag +
+                                                               bn1.real * bn.real + bn1.imag * bn.imag)
+
+                # scattering intensity pattern
+                p = -p
+                for j in range(noOfAngles):
+                    pi = pi1[j]
+                    tau = en * amu[j] * pi - (en + 1.) * pi0[j]
+                    s1_1[i, j] += fn * (an * pi + bn * tau)
+                    s2_1[i, j] += fn * (an * tau + bn * pi)
+                    if mirror:
+                        s1_2[i, j] += fn * p * (an * pi - bn * tau)
+                        s2_2[i, j] += fn * p * (bn * pi - an * tau)
+                    pi1[j] = ((2. * en + 1.) * amu[j] * pi - (en + 1.) * pi0[j]) / en
+                    pi0[j] = pi
+
+                psi0 = psi1
+                psi1 = psi
+                chi0 = chi1
+                chi1 = chi
+                xi1 = psi1 - chi1 * 1j
+
+        return s1_1, s1_2, s2_1, s2_2, qsca, gsca
+
+
+def bhmie_hagen_vectorized(x, refrel, noOfAngles, diameter=None, angles=None):
+    """Vectorized version of bhmie_hagen. Instead of one size parameter an array of size parameters is processed
+    in a single call, the a_n/b_n and pi/tau recurrences are carried out for all size parameters at once (or in
+    parallel by the compiled kernel if numba is available, see _mie_series).
+
+    Parameters
+    ----------
+    x: array-like
+        size parameters = k*radius = 2pi/lambda * radius
+    refrel: complex
+        refraction index (n in complex form for example:  1.5+0.02*i)
+    noOfAngles: int
+        number of angles for S1 and S2 function in range from 0 to pi/2
+    diameter: array-like, optional
+        diameters (same shape as x) needed to calculate the crosssections. Same units as in bhmie_hagen.
+    angles: array-like, optional
+        scattering angles (radians, between 0 and pi) at which S1 and S2 are calculated. If given, noOfAngles is
+        ignored.
+
+    Returns
+    -------
+    dict with 1D arrays (one value per size parameter):
+        'extinction_efficiency', 'scattering_efficiency', 'backscatter_efficiency', 'asymmetry_parameter',
+        'scattering_crosssection', 'extinction_crosssection'
+    and 2D arrays of shape (len(x), 2 * noOfAngles - 1) covering the angles from 0 to pi, or (len(x), len(angles)):
+        's1', 's2'
+    """
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+    if diameter is None:
+        diameter = np.zeros(x.shape)
+    else:
+        diameter = np.atleast_1d(np.asarray(diameter, dtype=float))
+
+    # number of terms, see bhmie_hagen.calc_noOfTerms
+    ymod = np.abs(x * refrel)
+    xstop = x + 4. * x ** 0.3333 + 2.0
+    nmx = np.fix(np.maximum(xstop, ymod) + 15.0)
+    nstop = xstop.astype(int)
+    if nmx.max() > 150000:
+        raise ValueError("error: nmx > nmxx=%f for |m|x=%f" % (150000, ymod.max()))
+
+    if angles is None:
+        noOfAngles = int(noOfAngles)
+        # Require NANG>1 in order to calculate scattering intensities
+        if (noOfAngles < 2):
+            noOfAngles = 2
+
+        dang = .5 * np.pi / (noOfAngles - 1)
+        amu = np.cos(np.arange(0.0, noOfAngles, 1) * dang)
+        s1_1, s1_2, s2_1, s2_2, qsca, gsca = _mie_series(x, refrel, amu, nstop, nmx)
+
+        s1 = np.concatenate((s1_1, s1_2[:, -2::-1]), axis=1)
+        s2 = np.concatenate((s2_1, s2_2[:, -2::-1]), axis=1)
+        s1_forward = s1[:, 0]
+        s1_backward = s1[:, -1]
+    else:
+        # forward and backward direction are needed for the extinction and backscatter efficiency
+        amu = np.concatenate(([1., -1.], np.cos(np.asarray(angles, dtype=float))))
+        s1_1, s1_2, s2_1, s2_2, qsca, gsca = _mie_series(x, refrel, amu, nstop, nmx, mirror=False)
+
+        s1 = s1_1[:, 2:]
+        s2 = s2_1[:, 2:]
+        s1_forward = s1_1[:, 0]
+        s1_backward = s1_1[:, 1]
+
+    gsca = 2. * gsca / qsca
+    qsca = (2. / (x ** 2)) * qsca
+    qext = (4. / (x ** 2)) * np.real(s1_forward)
+    qback = 4 * (np.abs(s1_backward) / x) ** 2
+    geometric_crosssection = diameter ** 2 * np.pi * 0.5 ** 2
+
+    return {'extinction_efficiency': qext,
+            'scattering_efficiency': qsca,
+            'backscatter_efficiency': qback,
+            'asymmetry_parameter': gsca,
+            'scattering_crosssection': qsca * geometric_crosssection,
+            'extinction_crosssection': qext * geometric_crosssection,
+            's1': s1,
+            's2': s2}
+
+
+def angular_scatt_func_vectorized(s1, s2, x, diameter, angles=None):
+    """Angular scattering function ('natural') in the interval [0,2*pi) for the output of bhmie_hagen_vectorized.
+    Equivalent to bhmie_hagen.get_angular_scatt_func().natural, but for all size parameters at once.
+    If angles were passed to bhmie_hagen_vectorized, the same angles have to be passed here; S1 and S2 are then
+    not mirrored.
+
+    Parameters
+    ----------
+    s1, s2: 2D arrays
+        as returned by bhmie_hagen_vectorized
+    x: array
+        size parameters
+    diameter: array
+        diameters
+    angles: array, optional
+        angles at which s1 and s2 were calculated
+
+    Returns
+    -------
+    angles: 1D array
+    natural: 2D array of shape (len(angles), len(x))
+    """
+    if angles is None:
+        s1f = np.concatenate((s1, s1[:, -2::-1]), axis=1)
+        s2f = np.concatenate((s2, s2[:, -2::-1]), axis=1)
+    else:
+        s1f = s1
+        s2f = s2
+    natural = (np.abs(s1f) ** 2 + np.abs(s2f) ** 2) / 2
+    # equivalent to normalizing to the phase function and then multiplying with csca / (4 * pi)
+    natural *= (np.asarray(diameter, dtype=float) ** 2 / (4 * np.asarray(x, dtype=float) ** 2))[:, np.newaxis]
+    if angles is None:
+        angles = np.linspace(0, np.pi * 2, natural.shape[1])
+    else:
+        angles = np.asarray(angles, dtype=float)
+    return angles, natural.transpose()
+
+
 def bhmie(x,refrel,nang):
     """ This file is converted from mie_scattering.m, see http://atol.ucsd.edu/scatlib/index.htm
          Bohren and Huffman originally published the code in their book on light scattering
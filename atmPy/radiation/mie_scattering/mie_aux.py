@@ -19,15 +19,38 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-class Cache(dict):
+from collections import OrderedDict
+
+
+class Cache(OrderedDict):
+    """Dictionary with a maximum number of entries. If the cache is full,
+    the least recently used entry is removed. Lookups via get are counted
+    in the attributes hits and misses.
+    """
     def __init__(self, size=10):
         super(Cache, self).__init__()
         self.size = size
-        self.log = []
+        self.hits = 0
+        self.misses = 0
+
+    def __getitem__(self, key):
+        value = super(Cache, self).__getitem__(key)
+        self.move_to_end(key)
+        return value
 
-    def __setitem___(self, key, value):
+    def __setitem__(self, key, value):
         super(Cache, self).__setitem__(key, value)
-        self.log.append(key)
-        if len(self.log) > self.size:
-            del self[self.log[0]]
-            self.log.pop(0)
+        self.move_to_end(key)
+        while len(self) > self.size:
+            self.popitem(last=False)
+
+    def get(self, key, default=None):
+        if key in self:
+            self.hits += 1
+            return self[key]
+        self.misses += 1
+        return default
+
+    def __repr__(self):
+        return "Cache(size=%i, entries=%i, hits=%i, misses=%i)" % (
+            self.size, len(self), self.hits, self.misses)
@@ -19,11 +19,11 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from atmPy.mie.mie_coeffs import MieCoeffs
-from atmPy.mie.mie_props import mie_props, mie_S12
 from numpy import sqrt
 
-from atmPy.radiation.mie_scattering import Cache
+from atmPy.radiation.mie_scattering.mie_aux import Cache
+from atmPy.radiation.mie_scattering.mie_coeffs import MieCoeffs
+from atmPy.radiation.mie_scattering.mie_props import mie_props, mie_S12
 
 
 class MieScatterProps(object):
@@ -31,14 +31,14 @@ class MieScatterProps(object):
     """
     def __init__(self, params):
         par = dict(zip(("eps","mu","x","y","eps2"),params[:5]))
+        self._props = None
         if par["x"]==0 and par["y"] is None:
             #give valid output for x==0
-            self._coeffs = {"qext":0.0, "qsca":0.0, "qabs":0.0, "qb":0.0,
-                            "0.0":asy, "0.0":qratio}
+            self._coeffs = None
+            self._props = {"qext":0.0, "qsca":0.0, "qabs":0.0, "qb":0.0,
+                           "asy":0.0, "qratio":0.0}
         else:
             self._coeffs = MieCoeffs(par)
-        self._props = None
-        self._S12 = None
         self.size = par["x"] if par["y"]==None else par["y"]
 
     def prop(self, prop_name):
@@ -47,9 +47,9 @@ class MieScatterProps(object):
         return self._props[prop_name]
 
     def S12(self, u):
-        if self._S12 is None:
-            self._S12 = mie_S12(self._coeffs, u)
-        return self._S12
+        if self._coeffs is None:
+            return (0j, 0j)
+        return mie_S12(self._coeffs, u)
 
 
 class Mie(object):
@@ -74,12 +74,16 @@ class Mie(object):
 
     Setting mu together with eps2 and y raises an error.
 
+    The results of the most recent parameter sets are kept in a least recently
+    used cache, its size can be set with the keyword argument cache_size
+    (default 10). Hit and miss statistics are available via Mie._cache.
+
     Any of the above attributes can be given as keyword arguments when
     creating a new Mie instance. For example:
     mie_scattering = Mie(x=1.5,m=complex(1.2,0.1))
     """
     def __init__(self, **kwargs):
-        self._cache = Cache()
+        self._cache = Cache(size=kwargs.get("cache_size", 10))
         self.eps = None
         self.mu = 1.0
         self._x = None
@@ -164,19 +168,21 @@ class Mie(object):
         return self._get_S12(u)
 
 
-    def _get_scatt_prop(self, prop):
+    def _get_scatt_props(self):
         sig = self._params_signature()
-        if sig not in self._cache:
-            self._cache[sig] = MieScatterProps(sig)
-        return self._cache[sig].prop(prop)
+        props = self._cache.get(sig)
+        if props is None:
+            props = MieScatterProps(sig)
+            self._cache[sig] = props
+        return props
+
+    def _get_scatt_prop(self, prop):
+        return self._get_scatt_props().prop(prop)
 
     def _get_S12(self, u):
         if abs(u) > 1:
             raise ValueError("The cosine u must be between -1 and 1.")
-        sig = self._params_signature()
-        if sig not in self._cache:
-            self._cache[sig] = MieScatterProps(sig)
-        return self._cache[sig].S12(u)
+        return self._get_scatt_props().S12(u)
 
 
     def _get_m(self):
@@ -190,7 +196,7 @@ class Mie(object):
 
 
     def _get_m2(self):
-        return sqrt(self.m2)
+        return sqrt(self.eps2)
 
     def _set_m2(self, m2):
         self.eps2 = m2**2
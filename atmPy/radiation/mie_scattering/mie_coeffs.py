@@ -19,6 +19,7 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
+import numpy as np
 from numpy import pi, arange, zeros, hstack, sqrt, sin, cos
 from scipy.special import jv, yv
 
@@ -98,7 +99,7 @@ def single_mie_coeff(eps,mu,x):
     gs1x = p1x-complex(0,1)*ch1x
 
     dnx = zeros(nmx,dtype=complex)
-    for j in xrange(nmx-1,0,-1):
+    for j in range(nmx-1,0,-1):
         r = (j+1.0)/z
         dnx[j-1] = r - 1.0/(dnx[j]+r)
     dn = dnx[:nmax]
@@ -144,7 +145,7 @@ def coated_mie_coeff(eps1,eps2,x,y):
     dnx = zeros(nmx,dtype=complex)
 
     for (z, dn) in zip((u,v,w),(dnu,dnv,dnw)):
-        for j in xrange(nmx-1,0,-1):
+        for j in range(nmx-1,0,-1):
             r = (j+1.0)/z
             dnx[j-1] = r - 1.0/(dnx[j]+r)
         dn[:] = dnx[:nmax]
@@ -181,3 +182,197 @@ def coated_mie_coeff(eps1,eps2,x,y):
     bn = (py*b1-p1y)/(gsy*b1-gs1y)
 
     return (an, bn, nmax)
+
+
+def _log_deriv_vectorized(z, nmx, nmax):
+    """Logarithmic derivative by downward recurrence for all values in z (1D) at once.
+
+    Returns:
+        Array of shape (len(z), nmax).
+    """
+    dn = zeros((z.shape[0], nmax), dtype=complex)
+    dnx = zeros(z.shape[0], dtype=complex)
+    for j in range(nmx-1,0,-1):
+        r = (j+1.0)/z
+        dnx = r - 1.0/(dnx+r)
+        if j-1 < nmax:
+            dn[:,j-1] = dnx
+    return dn
+
+
+def _riccati_bessel_vectorized(z, dn):
+    """Riccati-Bessel functions psi_n(z) and chi_n(z) for n = 1 ... nmax.
+    Instead of evaluating Bessel functions of complex argument, psi_n is
+    obtained from the logarithmic derivative dn (psi_n = psi_n-1/(D_n+n/z))
+    and chi_n by upward recurrence, both of which are stable.
+
+    Args:
+        z: Array of (complex) arguments.
+        dn: The logarithmic derivative, see _log_deriv_vectorized.
+
+    Returns:
+        A tuple (psi, chi) of arrays of shape dn.shape.
+    """
+    psi = zeros(dn.shape, dtype=complex)
+    chi = zeros(dn.shape, dtype=complex)
+    psi0 = sin(z)
+    chi0 = -sin(z)
+    chi1 = cos(z)
+    for j in range(dn.shape[1]):
+        n = j+1.0
+        psi0 = psi0/(dn[:,j]+n/z)
+        psi[:,j] = psi0
+        chi[:,j] = (2*n-1.0)/z*chi1 - chi0
+        chi0 = chi1
+        chi1 = chi[:,j]
+    return (psi, chi)
+
+
+def _pad_coeffs(an, bn, nmax):
+    """Sets the coefficients beyond nmax of each row to zero."""
+    valid = arange(an.shape[1])[np.newaxis,:] < nmax[:,np.newaxis]
+    an = np.where(valid, an, 0)
+    bn = np.where(valid, bn, 0)
+    return (an, bn)
+
+
+def single_mie_coeff_vectorized(eps,mu,x):
+    """Mie coefficients for the single-layered sphere for an array of size
+    parameters.
+
+    Args:
+        eps: The complex relative permittivity.
+        mu: The complex relative permeability.
+        x: Array of size parameters.
+
+    Returns:
+        A tuple containing (an, bn, nmax) where an and bn are arrays of shape
+        (len(x), nmax.max()) with the Mie coefficients of each size parameter
+        padded with zeros, and nmax is the array of the number of coefficients.
+    """
+    x = np.atleast_1d(np.asarray(x, dtype=float))
+    z = sqrt(eps*mu)*x
+    m = sqrt(eps/mu)
+
+    nmax = np.round(2+x+4*x**(1.0/3.0)).astype(int)
+    nmax_max = nmax.max()
+    nmx = int(round(max(nmax_max,np.abs(z).max())+16))
+    n = arange(nmax_max)
+    nu = n+1.5
+    xc = x[:,np.newaxis]
+
+    # orders beyond nmax of a particular x can overflow, they are removed by _pad_coeffs
+    with np.errstate(all='ignore'):
+        sx = sqrt(0.5*pi*xc)
+        px = sx*jv(nu,xc)
+        p1x = hstack((sin(xc), px[:,:nmax_max-1]))
+        chx = -sx*yv(nu,xc)
+        ch1x = hstack((cos(xc), chx[:,:nmax_max-1]))
+        gsx = px-complex(0,1)*chx
+        gs1x = p1x-complex(0,1)*ch1x
+
+        dn = _log_deriv_vectorized(z, nmx, nmax_max)
+        n1 = n+1
+        da = dn/m + n1/xc
+        db = dn*m + n1/xc
+
+        an = (da*px-p1x)/(da*gsx-gs1x)
+        bn = (db*px-p1x)/(db*gsx-gs1x)
+
+    (an, bn) = _pad_coeffs(an, bn, nmax)
+    return (an, bn, nmax)
+
+
+def coated_mie_coeff_vectorized(eps1,eps2,x,y):
+    """Mie coefficients for the dual-layered (coated) sphere for arrays of
+    core and shell size parameters.
+
+       Args:
+          eps1: The complex relative permittivity of the core.
+          eps2: The complex relative permittivity of the shell.
+          x: Array of size parameters of the core.
+          y: Array of size parameters of the shell (same shape as x).
+
+       Returns:
+          A tuple containing (an, bn, nmax) where an and bn are arrays of
+          shape (len(y), nmax.max()) with the Mie coefficients padded with
+          zeros, and nmax is the array of the number of coefficients.
+          Particles without core (x == 0) or without shell (x == y) are
+          calculated as homogeneous spheres.
+    """
+    (x, y) = np.broadcast_arrays(np.atleast_1d(np.asarray(x, dtype=float)),
+                                 np.atleast_1d(np.asarray(y, dtype=float)))
+    if np.any(y < x):
+        raise ValueError("The size y cannot be smaller than x.")
+
+    m1 = sqrt(eps1)
+    m2 = sqrt(eps2)
+    m = m2/m1
+
+    nmax = np.round(2+y+4*y**(1.0/3.0)).astype(int)
+    nmax_max = nmax.max()
+    an = zeros((y.shape[0], nmax_max), dtype=complex)
+    bn = zeros((y.shape[0], nmax_max), dtype=complex)
+
+    # Do not use the coated version if it is not necessary
+    no_core = x == 0
+    no_shell = (x == y) & ~no_core
+    coated = ~(no_core | no_shell)
+    for (sel, eps) in ((no_core, eps2), (no_shell, eps1)):
+        if sel.any():
+            (an_s, bn_s, nmax_s) = single_mie_coeff_vectorized(eps, 1.0, y[sel])
+            an[sel,:an_s.shape[1]] = an_s
+            bn[sel,:bn_s.shape[1]] = bn_s
+    if not coated.any():
+        return (an, bn, nmax)
+
+    x = x[coated]
+    y = y[coated]
+    nmax_c = nmax[coated]
+    nmax_c_max = nmax_c.max()
+    u = m1*x
+    v = m2*x
+    w = m2*y
+
+    mx = np.maximum(np.abs(m1*y),np.abs(w)).max()
+    nmx = int(round(max(nmax_c_max,mx)+16))
+    n = arange(nmax_c_max)
+
+    with np.errstate(all='ignore'):
+        (dnu, dnv, dnw) = [_log_deriv_vectorized(z, nmx, nmax_c_max) for z in (u,v,w)]
+
+        dny = _log_deriv_vectorized(y+0j, nmx, nmax_c_max)
+        # psi and chi of all three arguments (v, w and y) come from the recurrences, no Bessel function calls
+        vwy = [v[:,np.newaxis],w[:,np.newaxis],y[:,np.newaxis]]
+        ((pv,chv),(pw,chw),(py,chy)) = [_riccati_bessel_vectorized(z, dn)
+            for (z,dn) in ((v,dnv),(w,dnw),(y+0j,dny))]
+        p1y = hstack((sin(vwy[2]), py[:,:nmax_c_max-1]))
+        ch1y = hstack((cos(vwy[2]), chy[:,:nmax_c_max-1]))
+        gsy = py-complex(0,1)*chy
+        gs1y = p1y-complex(0,1)*ch1y
+
+        uu = m*dnu-dnv
+        vv = dnu/m-dnv
+        fv = pv/chv
+        fw = pw/chw
+        ku1 = uu*fv/pw
+        kv1 = vv*fv/pw
+        pt = pw-chw*fv
+        prat = pw/pv/chv
+        ku2 = uu*pt+prat
+        kv2 = vv*pt+prat
+        dns1 = ku1/ku2
+        gns1 = kv1/kv2
+
+        dns = dns1+dnw
+        gns = gns1+dnw
+        nrat = (n+1)/vwy[2]
+        a1 = dns/m2+nrat
+        b1 = m2*gns+nrat
+        an_c = (py*a1-p1y)/(gsy*a1-gs1y)
+        bn_c = (py*b1-p1y)/(gsy*b1-gs1y)
+
+    (an_c, bn_c) = _pad_coeffs(an_c, bn_c, nmax_c)
+    an[coated,:nmax_c_max] = an_c
+    bn[coated,:nmax_c_max] = bn_c
+    return (an, bn, nmax)
@@ -0,0 +1,183 @@
+"""Persistent on-disk lookup table for Mie calculations.
+
+Results of the Mie calculations for a particular combination of wavelength, refractive index, diameter grid and
+number of angles are stored as numpy .npz files in a cache directory. Since bin grids and refractive indices
+repeat across many files (e.g. a season of UHSAS or POPS data) the Mie calculations only have to be done once.
+The files are written atomically, so multiple processes can share the same directory.
+
+Example
+-------
+>>> from atmPy.radiation.mie_scattering import mie_lookup
+>>> mie_lookup.enable('/data/mie_cache', max_size_mb = 1000)
+>>> opt = dist.calculate_optical_properties(550, n = 1.5) # this will now use the lookup table
+"""
+import hashlib as _hashlib
+import os as _os
+import tempfile as _tempfile
+
+import numpy as _np
+
+# increase this number when the content of the stored tables changes, this will invalidate old files
+_version = 1
+
+default_table = None
+
+
+class MieLookupTable(object):
+    """Content-addressed cache of Mie calculation results with a size cap on disk.
+
+    Parameters
+    ----------
+    path: str, optional
+        Directory in which the tables are stored. Default is ~/.atmPy/mie_lookup_table.
+    max_size_mb: float, optional
+        Maximum size of the directory in MB. If exceeded, the least recently used tables are removed.
+    scan_interval: int, optional
+        The size of the directory is tracked by a running total of the written tables. Every scan_interval writes
+        (and whenever the running total exceeds max_size_mb) the directory is scanned, which also accounts for
+        tables written by other processes.
+    """
+    def __init__(self, path=None, max_size_mb=500, scan_interval=100):
+        if not path:
+            path = _os.path.join(_os.path.expanduser('~'), '.atmPy', 'mie_lookup_table')
+        self.path = path
+        self.max_size_mb = max_size_mb
+        self.scan_interval = scan_interval
+        self.hits = 0
+        self.misses = 0
+        # running total of the size of the directory in bytes, None until the directory is scanned (limit_size)
+        self._size = None
+        self._writes_since_scan = 0
+        _os.makedirs(self.path, exist_ok=True)
+
+    def __repr__(self):
+        return 'MieLookupTable(path = %s, max_size_mb = %s, hits = %i, misses = %i)' % (self.path, self.max_size_mb,
+                                                                                        self.hits, self.misses)
+
+    @staticmethod
+    def get_key(*args):
+        """Generates the key for a set of parameters. Arrays are hashed by their content.
+
+        Parameters
+        ----------
+        args: float, complex, str, or array-like
+            e.g. diameter grid, wavelength, refractive index, number of angles
+        """
+        sha = _hashlib.sha1()
+        sha.update(('atmPy_mie_v%i' % _version).encode())
+        for arg in args:
+            arg = _np.ascontiguousarray(arg)
+            sha.update(str(arg.dtype).encode())
+            sha.update(str(arg.shape).encode())
+            sha.update(arg.tobytes())
+        return sha.hexdigest()
+
+    def _get_fname(self, key):
+        return _os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """Returns the stored arrays as dict or None if key does not exist"""
+        fname = self._get_fname(key)
+        try:
+            with _np.load(fname) as npz:
+                out = {k: npz[k] for k in npz.files}
+        except (IOError, ValueError):
+            # file does not exist or is corrupt (e.g. another process is just writing it)
+            self.misses += 1
+            return None
+
+        # access time is tracked via the modification time since atime is often disabled
+        try:
+            _os.utime(fname, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return out
+
+    def put(self, key, values):
+        """Stores the arrays in values (dict) under key"""
+        fname = self._get_fname(key)
+        try:
+            old_size = _os.stat(fname).st_size
+        except OSError:
+            old_size = 0
+        fd, tmp_name = _tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with _os.fdopen(fd, 'wb') as tmp:
+                _np.savez(tmp, **values)
+            size = _os.stat(tmp_name).st_size
+            _os.replace(tmp_name, fname)
+        finally:
+            if _os.path.exists(tmp_name):
+                _os.remove(tmp_name)
+
+        self._writes_since_scan += 1
+        if self._size is None or self._writes_since_scan >= self.scan_interval:
+            self.limit_size()
+            return
+        self._size += size - old_size
+        if self._size > self.max_size_mb * 1e6:
+            self.limit_size()
+
+    def get_size_mb(self):
+        return sum([i[2] for i in self._list_tables()]) / 1e6
+
+    def _list_tables(self):
+        out = []
+        for fname in _os.listdir(self.path):
+            if not fname.endswith('.npz'):
+                continue
+            fname = _os.path.join(self.path, fname)
+            try:
+                stat = _os.stat(fname)
+            except OSError:
+                continue
+            out.append((stat.st_mtime, fname, stat.st_size))
+        return out
+
+    def limit_size(self):
+        """If the size exceeds max_size_mb, the least recently used tables are removed until the size is below
+        90 % of max_size_mb (so the cleanup does not run again on the next write)."""
+        tables = sorted(self._list_tables())
+        size = sum([i[2] for i in tables])
+        max_size = self.max_size_mb * 1e6
+        if size <= max_size:
+            tables = []
+        for mtime, fname, fsize in tables:
+            if size <= 0.9 * max_size:
+                break
+            try:
+                _os.remove(fname)
+            except OSError:
+                pass
+            size -= fsize
+        self._size = size
+        self._writes_since_scan = 0
+
+    def clear(self):
+        """Removes all tables"""
+        for mtime, fname, fsize in self._list_tables():
+            try:
+                _os.remove(fname)
+            except OSError:
+                pass
+        self._size = 0
+        self._writes_since_scan = 0
+
+
+def enable(path=None, max_size_mb=500):
+    """Enables the lookup table for all Mie calculations done by the optical_properties module.
+    See MieLookupTable for a description of the arguments.
+
+    Returns
+    -------
+    MieLookupTable instance
+    """
+    global default_table
+    default_table = MieLookupTable(path=path, max_size_mb=max_size_mb)
+    return default_table
+
+
+def disable():
+    global default_table
+    default_table = None
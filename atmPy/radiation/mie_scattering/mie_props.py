@@ -19,165 +19,119 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 """
 
-from numpy import pi, arange, zeros, hstack, sqrt, sin, cos
-from scipy.special import jv, yv
+import numpy as np
+from numpy import arange, zeros
 
 
-class MieCoeffs(object):
-    """Wrapper for the Mie coefficients.
-    """
-    def __init__(self, par):
-        (self.an, self.bn, self.nmax) = mie_coeffs(par)
+def mie_props(coeffs,y):
+    """The scattering properties.
 
+    Args:
+        coeffs: A MieCoeffs instance (or any object with the attributes an,
+            bn). The coefficients can be 1D, or 2D with one row per particle
+            (as returned by the vectorized coefficient functions).
+        y: The size parameter (of the outer layer), scalar or array with one
+            value per row of the coefficients.
 
-def mie_coeffs(params):
-    """Input validation and function selection for the Mie coefficients.
+    Returns:
+        A dictionary with the keys "qext", "qsca", "qabs", "qb", "asy" and
+        "qratio". The values are scalars or arrays, depending on the shape of
+        the coefficients.
     """
+    an = np.asarray(coeffs.an)
+    bn = np.asarray(coeffs.bn)
+    y = np.asarray(y, dtype=float)
+    anp = an.real
+    anpp = an.imag
+    bnp = bn.real
+    bnpp = bn.imag
+    nmax = an.shape[-1]
+
+    n = arange(1,nmax+1,dtype=float)
+    cn = 2*n+1
+    c1n = n*(n+2)/(n+1)
+    c2n = cn/n/(n+1)
+    y2 = y**2
+
+    dn = cn*(anp+bnp)
+    q = dn.sum(axis=-1)
+    qext = 2*q/y2
+
+    en = cn*(anp**2+anpp**2+bnp**2+bnpp**2)
+    q = en.sum(axis=-1)
+    qsca = 2*q/y2
+    qabs = qext-qsca
+
+    fn = (an-bn)*cn
+    gn = (-1)**n
+    q = (fn*gn).sum(axis=-1)
+    qb = (q*q.conj()).real/y2
+
+    # coefficients of the next order, zero beyond nmax
+    g1 = [zeros(an.shape) for i in range(4)]
+    g1[0][...,:-1] = anp[...,1:]
+    g1[1][...,:-1] = anpp[...,1:]
+    g1[2][...,:-1] = bnp[...,1:]
+    g1[3][...,:-1] = bnpp[...,1:]
+
+    asy1 = c1n*(anp*g1[0]+anpp*g1[1]+bnp*g1[2]+bnpp*g1[3])
+    asy2 = c2n*(anp*bnp+anpp*bnpp)
+
+    asy = 4/y2*(asy1+asy2).sum(axis=-1)/qsca
+    qratio = qb/qsca
+
+    return {"qext":qext, "qsca":qsca, "qabs":qabs, "qb":qb, "asy":asy,
+        "qratio":qratio}
+
+
+def mie_S12(coeffs,u):
+    """The amplitude scattering matrix.
 
-    eps = complex(params["eps"]) if params["eps"] is not None else None
-    x = float(params["x"]) if params["x"] is not None else None
-
-    if (x==None) or (eps==None):
-        raise ValueError("Must specify x and either eps or m.")
-
-    mu = complex(params["mu"]) if params["mu"] is not None else complex(1.0)
-
-    y = float(params["y"]) if params["y"] is not None else None
-    eps2 = complex(params["eps2"]) if params["eps2"] is not None else None
-
-    coated = (y is not None)
-    if coated == (eps2 is None):
-        raise ValueError("Must specify both y and m2 for coated particles.")
-
-    if coated and mu!=complex(1.0):
-        raise ValueError("Multilayer calculations for magnetic particles " + \
-            "are not currently supported.")
-
-    if not coated:
-        y = x
-        eps2 = eps
+    Args:
+        coeffs: A MieCoeffs instance (or any object with the attributes an,
+            bn), 1D or 2D (one row per particle).
+        u: The cosine of the scattering angle, scalar or array.
 
-    # Do not use the coated version if it is not necessary
-    if x==y or eps==eps2:
-        coeffs = single_mie_coeff(eps,mu,y)
-    elif x==0:
-        coeffs = single_mie_coeff(eps2,mu,y)
-    else:
-        coeffs = coated_mie_coeff(eps,eps2,x,y)
+    Returns:
+        A tuple (S1, S2). The shape is the shape of the coefficients without
+        the last axis followed by the shape of u.
+    """
+    an = np.asarray(coeffs.an)
+    bn = np.asarray(coeffs.bn)
+    nmax = an.shape[-1]
+    (pin,tin) = mie_pt(u,nmax)
+    n = arange(1,nmax+1,dtype=float)
+    n2 = ((2*n+1)/(n*(n+1))).reshape((nmax,) + (1,)*(pin.ndim-1))
+    pin *= n2
+    tin *= n2
 
-    return coeffs
+    S1 = np.tensordot(an,pin,axes=(-1,0))+np.tensordot(bn,tin,axes=(-1,0))
+    S2 = np.tensordot(an,tin,axes=(-1,0))+np.tensordot(bn,pin,axes=(-1,0))
+    return (S1, S2)
 
 
-def single_mie_coeff(eps,mu,x):
-    """Mie coefficients for the single-layered sphere.
+def mie_pt(u,nmax):
+    """The angular functions pi_n and tau_n for n = 1 ... nmax.
 
     Args:
-        eps: The complex relative permittivity.
-        mu: The complex relative permeability.
-        x: The size parameter.
+        u: The cosine of the scattering angle, scalar or array.
+        nmax: The number of orders.
 
     Returns:
-        A tuple containing (an, bn, nmax) where an and bn are the Mie
-        coefficients and nmax is the maximum number of coefficients.
-    """
-    z = sqrt(eps*mu)*x
-    m = sqrt(eps/mu)
-
-    nmax = int(round(2+x+4*x**(1.0/3.0)))
-    nmax1 = nmax-1
-    nmx = int(round(max(nmax,abs(z))+16))
-    n = arange(nmax)
-    nu = n+1.5
-
-    sx = sqrt(0.5*pi*x)
-    px = sx*jv(nu,x)
-    p1x = hstack((sin(x), px[:nmax1]))
-    chx = -sx*yv(nu,x)
-    ch1x = hstack((cos(x), chx[:nmax1]))
-    gsx = px-complex(0,1)*chx
-    gs1x = p1x-complex(0,1)*ch1x
-
-    dnx = zeros(nmx,dtype=complex)
-    for j in xrange(nmx-1,0,-1):
-        r = (j+1.0)/z
-        dnx[j-1] = r - 1.0/(dnx[j]+r)
-    dn = dnx[:nmax]
-    n1 = n+1
-    da = dn/m + n1/x
-    db = dn*m + n1/x
-
-    an = (da*px-p1x)/(da*gsx-gs1x)
-    bn = (db*px-p1x)/(db*gsx-gs1x)
-
-    return (an, bn, nmax)
-
-
-def coated_mie_coeff(eps1,eps2,x,y):
-    """Mie coefficients for the dual-layered (coated) sphere.
-
-       Args:
-          eps: The complex relative permittivity of the core.
-          eps2: The complex relative permittivity of the shell.
-          x: The size parameter of the core.
-          y: The size parameter of the shell.
-
-       Returns:
-          A tuple containing (an, bn, nmax) where an and bn are the Mie
-          coefficients and nmax is the maximum number of coefficients.
+        A tuple (pi, tau) of arrays with the shape (nmax,) + shape of u.
     """
-    m1 = sqrt(eps1)
-    m2 = sqrt(eps2)
-    m = m2/m1
-    u = m1*x
-    v = m2*x
-    w = m2*y
-
-    nmax = int(round(2+y+4*y**(1.0/3.0)))
-    mx = max(abs(m1*y),abs(w))
-    nmx = int(round(max(nmax,mx)+16))
-    nmax1 = nmax-1
-    n = arange(nmax)
-
-    dnu = zeros(nmax,dtype=complex)
-    dnv = zeros(nmax,dtype=complex)
-    dnw = zeros(nmax,dtype=complex)
-    dnx = zeros(nmx,dtype=complex)
-
-    for (z, dn) in zip((u,v,w),(dnu,dnv,dnw)):
-        for j in xrange(nmx-1,0,-1):
-            r = (j+1.0)/z
-            dnx[j-1] = r - 1.0/(dnx[j]+r)
-        dn[:] = dnx[:nmax]
-
-    nu = n+1.5
-    vwy = [v,w,y]
-    sx = [sqrt(0.5*pi*xx) for xx in vwy]
-    (pv,pw,py) = [s*jv(nu,xx) for (s,xx) in zip(sx,vwy)]
-    (chv,chw,chy) = [-s*yv(nu,xx) for (s,xx) in zip(sx,vwy)]
-    p1y = hstack((sin(y), py[:nmax1]))
-    ch1y = hstack((cos(y), chy[:nmax1]))
-    gsy = py-complex(0,1)*chy
-    gs1y = p1y-complex(0,1)*ch1y
-
-    uu = m*dnu-dnv
-    vv = dnu/m-dnv
-    fv = pv/chv
-    fw = pw/chw
-    ku1 = uu*fv/pw
-    kv1 = vv*fv/pw
-    pt = pw-chw*fv
-    prat = pw/pv/chv
-    ku2 = uu*pt+prat
-    kv2 = vv*pt+prat
-    dns1 = ku1/ku2
-    gns1 = kv1/kv2
-
-    dns = dns1+dnw
-    gns = gns1+dnw
-    nrat = (n+1)/y
-    a1 = dns/m2+nrat
-    b1 = m2*gns+nrat
-    an = (py*a1-p1y)/(gsy*a1-gs1y)
-    bn = (py*b1-p1y)/(gsy*b1-gs1y)
-
-    return (an, bn, nmax)
+    u = np.asarray(u, dtype=float)
+    p = zeros((nmax,)+u.shape)
+    t = zeros((nmax,)+u.shape)
+    p[0] = 1
+    t[0] = u
+    if nmax > 1:
+        p[1] = 3*u
+        t[1] = 6*u**2 - 3
+    for n in range(2,nmax):
+        p[n] = (2*n+1.0)/n*p[n-1]*u - (n+1.0)/n*p[n-2]
+    if nmax > 2:
+        nn = arange(2,nmax,dtype=float).reshape((nmax-2,) + (1,)*u.ndim)
+        t[2:] = (nn+1)*u*p[2:] - (nn+2)*p[1:-1]
+
+    return (p,t)
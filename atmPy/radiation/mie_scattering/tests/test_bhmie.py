@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from atmPy.radiation.mie_scattering import bhmie
+
+# qext, qsca, qback, gsca, s1[4], s2[13] of the original (per size parameter) bhmie_hagen for n = 1.5+0.01j and
+# 10 angles
+reference = {0.5: (0.02586518090593195, 0.014559923037315946, 0.019369527205217184, 0.04889078349033264,
+                   0.0016051188188405086 - 0.03853457896231799j, -0.000977619468124007 + 0.022561620637093407j),
+             3.0: (3.363057192301983, 3.2265803555211505, 0.4395887483293871, 0.7411610487464685,
+                   4.3426803209393094 - 1.576685209030705j, -0.8517266701904725 - 0.5746197053605903j),
+             12.5: (2.3828608882610625, 1.9050258422018147, 1.4934225700101846, 0.8178370261520825,
+                    9.449543098725533 - 5.740212578423598j, 2.231121762862669 + 1.2588938842186486j)}
+
+
+@pytest.fixture
+def numpy_kernel(monkeypatch):
+    monkeypatch.setattr(bhmie, 'use_compiled', False)
+
+
+def test_bhmie_hagen_reference(numpy_kernel):
+    for x, (qext, qsca, qback, gsca, s1, s2) in reference.items():
+        mie = bhmie.bhmie_hagen(x, 1.5 + 0.01j, 10, diameter=0.2)
+        np.testing.assert_allclose([mie.qext, mie.qsca, mie.qback, mie.gsca], [qext, qsca, qback, gsca], rtol=1e-10)
+        np.testing.assert_allclose([mie.s1[4], mie.s2[13]], [s1, s2], rtol=1e-10)
+
+
+def test_vectorized_equals_scalar(numpy_kernel):
+    x = np.array(sorted(reference))
+    diameter = x * 0.1
+    values = bhmie.bhmie_hagen_vectorized(x, 1.5 + 0.01j, 10, diameter=diameter)
+    angles, natural = bhmie.angular_scatt_func_vectorized(values['s1'], values['s2'], x, diameter)
+    for e, (xi, di) in enumerate(zip(x, diameter)):
+        mie = bhmie.bhmie_hagen(xi, 1.5 + 0.01j, 10, diameter=di)
+        scalar = mie.return_Values_as_dict()
+        for key in ['extinction_efficiency', 'scattering_efficiency', 'backscatter_efficiency',
+                    'asymmetry_parameter', 'scattering_crosssection', 'extinction_crosssection']:
+            np.testing.assert_allclose(values[key][e], scalar[key], rtol=1e-10)
+        np.testing.assert_allclose(values['s1'][e], mie.s1, rtol=1e-10)
+        np.testing.assert_allclose(values['s2'][e], mie.s2, rtol=1e-10)
+        np.testing.assert_allclose(natural[:, e], mie.get_angular_scatt_func().natural.values, rtol=1e-10)
+
+
+def test_compiled_kernel_equals_numpy(monkeypatch):
+    pytest.importorskip('numba')
+    x = np.array([0.1, 2., 15., 60.])
+    monkeypatch.setattr(bhmie, 'use_compiled', False)
+    ref = bhmie.bhmie_hagen_vectorized(x, 1.55 + 0.02j, 25, diameter=x)
+    ref_angles = bhmie.bhmie_hagen_vectorized(x, 1.55 + 0.02j, 25, diameter=x, angles=np.linspace(0, np.pi, 7))
+    monkeypatch.setattr(bhmie, 'use_compiled', True)
+    out = bhmie.bhmie_hagen_vectorized(x, 1.55 + 0.02j, 25, diameter=x)
+    out_angles = bhmie.bhmie_hagen_vectorized(x, 1.55 + 0.02j, 25, diameter=x, angles=np.linspace(0, np.pi, 7))
+    for key in ref:
+        np.testing.assert_allclose(out[key], ref[key], rtol=1e-10)
+        np.testing.assert_allclose(out_angles[key], ref_angles[key], rtol=1e-10)
+
+
+def test_arbitrary_angles(numpy_kernel):
+    x = np.array([0.5, 3., 12.5])
+    default = bhmie.bhmie_hagen_vectorized(x, 1.5 + 0.01j, 10)
+    angles = np.linspace(0, np.pi, 19)
+    out = bhmie.bhmie_hagen_vectorized(x, 1.5 + 0.01j, 10, angles=angles)
+    np.testing.assert_allclose(out['s1'], default['s1'], rtol=1e-8, atol=1e-12)
+    np.testing.assert_allclose(out['s2'], default['s2'], rtol=1e-8, atol=1e-12)
+    for key in ['extinction_efficiency', 'scattering_efficiency', 'backscatter_efficiency', 'asymmetry_parameter']:
+        np.testing.assert_allclose(out[key], default[key], rtol=1e-10)
+
+    # more than 1000 angles are possible
+    out = bhmie.bhmie_hagen_vectorized(x, 1.5 + 0.01j, 1500)
+    assert out['s1'].shape == (3, 2999)
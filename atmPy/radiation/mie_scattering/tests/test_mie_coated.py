@@ -0,0 +1,77 @@
+import numpy as np
+
+from atmPy.radiation.mie_scattering import bhmie, mie_aux, mie_coated, mie_coeffs
+
+
+def test_homogeneous_equals_bhmie():
+    for x in (0.5, 3., 12.5):
+        mie = mie_coated.Mie(x=x, m=1.5 + 0.01j)
+        ref = bhmie.bhmie_hagen(x, 1.5 + 0.01j, 10)
+        np.testing.assert_allclose([mie.qext(), mie.qsca(), mie.asy()], [ref.qext, ref.qsca, ref.gsca], rtol=1e-8)
+
+
+def test_coated_with_equal_materials_equals_homogeneous():
+    for y in (0.5, 3., 12.5):
+        coated = mie_coated.Mie(x=0.6 * y, y=y, m=1.5 + 0.01j, m2=1.5 + 0.01j)
+        homogeneous = mie_coated.Mie(x=y, m=1.5 + 0.01j)
+        np.testing.assert_allclose([coated.qext(), coated.qsca(), coated.qb()],
+                                   [homogeneous.qext(), homogeneous.qsca(), homogeneous.qb()], rtol=1e-8)
+
+
+def test_vectorized_coefficients():
+    y = np.array([0.5, 3., 12.5])
+    x = y * 0.7
+    eps1, eps2 = (1.7 + 0.3j) ** 2, (1.4 + 0.001j) ** 2
+    an, bn, nmax = mie_coeffs.coated_mie_coeff_vectorized(eps1, eps2, x, y)
+    for e in range(y.shape[0]):
+        an_single, bn_single, nmax_single = mie_coeffs.coated_mie_coeff(eps1, eps2, x[e], y[e])
+        np.testing.assert_allclose(an[e, :nmax_single], an_single, rtol=1e-8, atol=1e-14)
+        np.testing.assert_allclose(bn[e, :nmax_single], bn_single, rtol=1e-8, atol=1e-14)
+        assert np.all(an[e, nmax_single:] == 0)
+
+
+def test_single_vectorized_equals_scalar():
+    x = np.array([0.05, 0.5, 3., 12.5, 40.])
+    for eps in ((1.5 + 0.01j) ** 2, (1.33 + 0.j) ** 2, (1.7 + 0.5j) ** 2):
+        an, bn, nmax = mie_coeffs.single_mie_coeff_vectorized(eps, 1.0, x)
+        for e in range(x.shape[0]):
+            an_single, bn_single, nmax_single = mie_coeffs.single_mie_coeff(eps, 1.0, x[e])
+            assert nmax[e] == nmax_single
+            np.testing.assert_allclose(an[e, :nmax_single], an_single, rtol=1e-10, atol=1e-16)
+            np.testing.assert_allclose(bn[e, :nmax_single], bn_single, rtol=1e-10, atol=1e-16)
+            assert np.all(an[e, nmax_single:] == 0) and np.all(bn[e, nmax_single:] == 0)
+
+
+def test_coated_without_core():
+    y = np.array([0.5, 3., 12.5])
+    x = np.array([0., 2., 0.])
+    eps1, eps2 = (1.7 + 0.3j) ** 2, (1.4 + 0.001j) ** 2
+    an, bn, nmax = mie_coeffs.coated_mie_coeff_vectorized(eps1, eps2, x, y)
+    for e in (0, 2):
+        an_single, bn_single, nmax_single = mie_coeffs.single_mie_coeff(eps2, 1.0, y[e])
+        assert nmax[e] == nmax_single
+        np.testing.assert_allclose(an[e, :nmax_single], an_single, rtol=1e-10, atol=1e-16)
+        np.testing.assert_allclose(bn[e, :nmax_single], bn_single, rtol=1e-10, atol=1e-16)
+    an_coated, bn_coated, nmax_coated = mie_coeffs.coated_mie_coeff(eps1, eps2, x[1], y[1])
+    np.testing.assert_allclose(an[1, :nmax_coated], an_coated, rtol=1e-8, atol=1e-14)
+
+    coated = mie_coated.Mie(x=0., y=3., m=1.7 + 0.3j, m2=1.4 + 0.001j)
+    homogeneous = mie_coated.Mie(x=3., m=1.4 + 0.001j)
+    np.testing.assert_allclose([coated.qext(), coated.qsca(), coated.asy()],
+                               [homogeneous.qext(), homogeneous.qsca(), homogeneous.asy()], rtol=1e-12)
+
+
+def test_cache():
+    cache = mie_aux.Cache(size=2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert list(cache) == ['a', 'c']
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    mie = mie_coated.Mie(x=2., m=1.5)
+    mie.qext()
+    mie.qsca()
+    assert mie._cache.hits >= 1
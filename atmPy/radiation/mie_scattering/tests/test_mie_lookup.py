@@ -0,0 +1,47 @@
+import numpy as np
+
+from atmPy.aerosols.physics import optical_properties
+from atmPy.radiation.mie_scattering import mie_lookup
+
+
+def test_round_trip(tmp_path):
+    table = mie_lookup.MieLookupTable(path=str(tmp_path))
+    key = table.get_key(np.array([0.1, 0.2]), 0.55, 1.5 + 0.01j, 100)
+    assert table.get(key) is None
+    values = {'a': np.arange(5.), 'b': np.ones((2, 3), dtype=complex)}
+    table.put(key, values)
+    out = table.get(key)
+    assert set(out) == set(values)
+    for k in values:
+        np.testing.assert_array_equal(out[k], values[k])
+    assert (table.hits, table.misses) == (1, 1)
+    assert key != table.get_key(np.array([0.1, 0.2]), 0.55, 1.5 + 0.02j, 100)
+
+
+def test_perform_Miecalculations_with_lookup_table(tmp_path):
+    diam = np.array([0.1, 0.5, 1.])
+    reference = optical_properties._perform_Miecalculations(diam, 0.55, 1.5 + 0.01j, noOfAngles=30)
+    table = mie_lookup.enable(str(tmp_path))
+    try:
+        for i in range(2):
+            out = optical_properties._perform_Miecalculations(diam, 0.55, 1.5 + 0.01j, noOfAngles=30)
+            for df, df_ref in zip(out, reference):
+                np.testing.assert_array_equal(df.values, df_ref.values)
+                np.testing.assert_array_equal(df.index.values, df_ref.index.values)
+    finally:
+        mie_lookup.disable()
+    assert (table.hits, table.misses) == (1, 1)
+
+
+def test_limit_size(tmp_path, monkeypatch):
+    table = mie_lookup.MieLookupTable(path=str(tmp_path), max_size_mb=0.5, scan_interval=20)
+    scans = []
+    list_tables = table._list_tables
+    monkeypatch.setattr(table, '_list_tables', lambda: scans.append(1) or list_tables())
+    values = {'a': np.random.rand(1000)}
+    for i in range(100):
+        table.put(table.get_key(i), values)
+        assert table.get_size_mb() <= table.max_size_mb
+    # the directory is not scanned on every write
+    assert len(scans) - 100 < 30
+    assert 0 < len(table._list_tables()) < 100
@@ -1,4 +1,7 @@
+from copy import deepcopy
+
 import numpy as np
+import pandas as pd
 import matplotlib.pylab as plt
 
 
@@ -110,4 +113,90 @@ def plot_panel_meshgrid(panel, xaxis = 0, yaxis = 1, sub_set = 0, ax = None, kwa
     a.set_ylabel(panel.major_axis.name)
     cb.set_label(panel.minor_axis[sub_set])
     pc.set_clim(z[~ np.isnan(z)].min(), z[~ np.isnan(z)].max())
-    return f,a,pc,cb
\ No newline at end of file
+    return f,a,pc,cb
+
+class IndexSlicer(object):
+    """Binary search (numpy.searchsorted) based slicing of DataFrames along their index, e.g. the time stamps of a
+    TimeSeries or the altitudes of a VerticalProfile. Whether the index is sorted is checked only once, when the
+    instance is created. Slicing a sorted index takes O(log n) and returns a view on the DataFrame. If the index
+    is not sorted a boolean mask is used instead (O(n), returns a copy).
+
+    Since pandas indices are immutable an instance can be kept as long as the index of the DataFrame is the same
+    object (see get_index_slicer).
+
+    Parameters
+    ----------
+    index: pandas.Index
+        DatetimeIndex or numeric index.
+    is_sorted: bool, optional
+        If the index is already known to be sorted in ascending order (e.g. because it is a slice of a sorted
+        index), the check is skipped.
+    """
+    def __init__(self, index, is_sorted=None):
+        self.index = index
+        self.is_datetime = isinstance(index, pd.DatetimeIndex)
+        if self.is_datetime:
+            # nanoseconds since epoch (UTC), no copy
+            self.values = index.asi8
+        else:
+            self.values = np.asarray(index.values)
+        if is_sorted is None:
+            is_sorted = bool(index.is_monotonic_increasing)
+        self.is_sorted = is_sorted
+
+    def __deepcopy__(self, memo):
+        # values is a view on the index, only the index has to be copied
+        return IndexSlicer(deepcopy(self.index, memo), is_sorted=self.is_sorted)
+
+    def _get_key(self, value):
+        if self.is_datetime:
+            value = pd.Timestamp(value)
+            if self.index.tz is not None and value.tzinfo is None:
+                value = value.tz_localize(self.index.tz)
+            elif self.index.tz is None and value.tzinfo is not None:
+                value = value.tz_convert(None)
+            return value.value
+        return value
+
+    def get_positions(self, start=None, end=None):
+        """Returns the positions i_start, i_end of the index values between start and end (both included), so
+        that index[i_start:i_end] is the selected part. Only for sorted indices."""
+        if not self.is_sorted:
+            raise ValueError('Index is not sorted, positions are not defined.')
+        i_start = 0 if start is None else self.values.searchsorted(self._get_key(start), side='left')
+        i_end = self.values.shape[0] if end is None else self.values.searchsorted(self._get_key(end), side='right')
+        return int(i_start), int(max(i_start, i_end))
+
+    def slice(self, data, start=None, end=None):
+        """Returns the part of data (DataFrame with this index) between start and end (both included).
+
+        Returns
+        -------
+        tuple: (DataFrame, IndexSlicer of the returned DataFrame)
+            If the index is sorted the DataFrame is a view on data, otherwise a copy.
+        """
+        if self.is_sorted:
+            i_start, i_end = self.get_positions(start, end)
+            out = data.iloc[i_start:i_end]
+            return out, IndexSlicer(out.index, is_sorted=True)
+        mask = np.ones(self.values.shape, dtype=bool)
+        if start is not None:
+            mask &= self.values >= self._get_key(start)
+        if end is not None:
+            mask &= self.values <= self._get_key(end)
+        out = data.iloc[mask]
+        return out, IndexSlicer(out.index)
+
+    def get_span(self):
+        """Returns the first and the last (smallest and largest) value of the index"""
+        if self.is_sorted:
+            return self.index[0], self.index[-1]
+        return self.index.min(), self.index.max()
+
+
+def get_index_slicer(index, slicer=None):
+    """Returns slicer if it belongs to index, else a new IndexSlicer for index. Used to cache the IndexSlicer of
+    the data of an instance, e.g. self._index_slicer = get_index_slicer(self.data.index, self._index_slicer)"""
+    if slicer is not None and slicer.index is index:
+        return slicer
+    return IndexSlicer(index)
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from atmPy.general import vertical_profile
+from atmPy.tools import pandas_tools
+
+
+def test_index_slicer_equals_loc():
+    index = pd.date_range('2015-01-01', periods=100, freq='7s')
+    data = pd.DataFrame({'a': np.arange(100.)}, index=index)
+    slicer = pandas_tools.IndexSlicer(data.index)
+    assert slicer.is_sorted
+    bounds = [(None, None), ('2015-01-01 00:01:00', '2015-01-01 00:05:00'), (index[10], index[10]),
+              (None, index[3]), (index[95], None), ('2014-12-31', '2015-01-01 00:00:20'),
+              ('2015-01-02', None), (index[50], index[40])]
+    for start, end in bounds:
+        out, out_slicer = slicer.slice(data, start=start, end=end)
+        expected = data.loc[start:end] if start is None or end is None or pd.Timestamp(start) <= pd.Timestamp(end) \
+            else data.iloc[:0]
+        assert out.equals(expected)
+        assert out_slicer.index is out.index
+
+    # the slice of a sorted index is a view
+    out = slicer.slice(data, start=index[10], end=index[20])[0]
+    assert np.shares_memory(out.values, data.values)
+
+    # time zone aware index
+    data_tz = data.tz_localize('UTC')
+    out = pandas_tools.IndexSlicer(data_tz.index).slice(data_tz, start='2015-01-01 00:01:00', end=index[20])[0]
+    assert out.equals(data_tz.iloc[9:21])
+
+
+def test_index_slicer_unsorted():
+    rng = np.random.default_rng(0)
+    altitude = rng.permutation(np.arange(50.)) * 10
+    data = pd.DataFrame({'a': np.arange(50.)}, index=altitude)
+    slicer = pandas_tools.IndexSlicer(data.index)
+    assert not slicer.is_sorted
+    out = slicer.slice(data, start=100, end=250)[0]
+    assert out.equals(data[(data.index >= 100) & (data.index <= 250)])
+    assert slicer.get_span() == (0, 490)
+
+
+def test_get_index_slicer_is_cached():
+    data = pd.DataFrame({'a': np.arange(10.)}, index=np.arange(10.))
+    slicer = pandas_tools.get_index_slicer(data.index)
+    assert pandas_tools.get_index_slicer(data.index, slicer) is slicer
+    assert pandas_tools.get_index_slicer(data.index.copy(), slicer) is not slicer
+
+
+def test_vertical_profile_zoom_altitude():
+    data = pd.DataFrame({'a': np.arange(50.)}, index=np.arange(50.)[::-1] * 10)
+    profile = vertical_profile.VerticalProfile(data)
+    zoomed = profile.zoom_altitude(bottom=95, top=200)
+    assert zoomed.data.equals(profile.data.loc[95:200])
+    zoomed.data.iloc[0, 0] = -1
+    assert profile.data.loc[100, 'a'] == 39
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from atmPy.aerosols.size_distribution import sizedistribution
+from atmPy.general import timeseries
+
+
+def _make_size_dist_ts(no_of_rows=20, no_of_bins=30, seed=0):
+    rng = np.random.default_rng(seed)
+    bins = np.logspace(np.log10(100), np.log10(3000), no_of_bins + 1)
+    centers = (bins[1:] + bins[:-1]) / 2.
+    modes = 200 + 50 * np.sin(np.linspace(0, 6, no_of_rows))
+    data = np.array([1000 * np.exp(-(np.log10(centers) - np.log10(m)) ** 2 / (2 * 0.15 ** 2)) for m in modes])
+    data *= rng.uniform(0.9, 1.1, data.shape)
+    index = pd.date_range('2015-01-01', periods=no_of_rows, freq='10s')
+    dist = sizedistribution.SizeDist_TS(pd.DataFrame(data, index=index), bins, 'dNdlogDp')
+    dist._data_period = 10
+    return dist
+
+
+def _make_timeseries(no_of_rows=20, freq='10s', start='2015-01-01', seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range(start, periods=no_of_rows, freq=freq)
+    ts = timeseries.TimeSeries(pd.DataFrame({'a': rng.normal(size=no_of_rows), 'b': rng.normal(size=no_of_rows)},
+                                            index=index))
+    ts._data_period = pd.Timedelta(freq).total_seconds()
+    return ts
+
+
+@pytest.fixture
+def make_size_dist_ts():
+    """Returns a function which creates a SizeDist_TS (dNdlogDp, 10 s data period) with a slowly moving mode"""
+    return _make_size_dist_ts
+
+
+@pytest.fixture
+def make_timeseries():
+    """Returns a function which creates a TimeSeries with the random columns a and b"""
+    return _make_timeseries